@@ -51,6 +51,26 @@ data class ModelPreset(
     }
 }
 
+// MARK: - Admission Coefficients
+
+/**
+ * required_MB = size_MB * multiplier + overheadMB + kvMBPerToken * contextWindow
+ * Fitted per runtime by `python -m yi_tools calibrate` and shipped in the
+ * manifest's admission.runtimes.<runtime>; LEGACY is the uncalibrated rule.
+ */
+data class AdmissionCoefficients(
+    val multiplier: Double,
+    val overheadMB: Double,
+    val kvMBPerToken: Double
+) {
+    fun requiredMB(sizeMB: Int, contextWindow: Int): Int =
+        (sizeMB * multiplier + overheadMB + kvMBPerToken * contextWindow).roundToInt()
+
+    companion object {
+        val LEGACY = AdmissionCoefficients(multiplier = 1.6, overheadMB = 600.0, kvMBPerToken = 0.0)
+    }
+}
+
 // MARK: - Device Capabilities
 
 data class DeviceCapabilities(
@@ -100,13 +120,18 @@ class ModelAdmissionController(private val context: Context) {
 
     /**
      * Admission formula:
-     * allow_load IF free_ram_est_MB >= pte_size_MB * 1.6 + 600
+     * allow_load IF free_ram_est_MB >= pte_size_MB * multiplier + overhead + kv_per_token * ctx
+     * (LEGACY: pte_size_MB * 1.6 + 600)
      */
-    fun canLoadModel(pteSizeMB: Int): AdmissionResult {
+    fun canLoadModel(
+        pteSizeMB: Int,
+        coefficients: AdmissionCoefficients = AdmissionCoefficients.LEGACY,
+        contextWindow: Int = ModelPreset.SAFE.contextWindow
+    ): AdmissionResult {
         val device = DeviceInfo.getCurrent(context)
 
         // Calculate required memory
-        val requiredMemory = (pteSizeMB * 1.6).roundToInt() + 600
+        val requiredMemory = coefficients.requiredMB(pteSizeMB, contextWindow)
 
         // Check 1: Available memory
         if (device.availableRAM < requiredMemory) {
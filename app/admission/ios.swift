@@ -44,6 +44,23 @@ struct ModelPreset {
     )
 }
 
+// MARK: - Admission Coefficients
+
+/// required_MB = size_MB * multiplier + overheadMB + kvMBPerToken * contextWindow
+/// Fitted per runtime by `python -m yi_tools calibrate` and shipped in the
+/// manifest's admission.runtimes.<runtime>; legacy is the uncalibrated rule.
+struct AdmissionCoefficients {
+    let multiplier: Double
+    let overheadMB: Double
+    let kvMBPerToken: Double
+
+    static let legacy = AdmissionCoefficients(multiplier: 1.6, overheadMB: 600, kvMBPerToken: 0)
+
+    func requiredMB(sizeMB: Int, contextWindow: Int) -> Int64 {
+        Int64((Double(sizeMB) * multiplier + overheadMB + kvMBPerToken * Double(contextWindow)).rounded())
+    }
+}
+
 // MARK: - Device Capabilities
 
 struct DeviceCapabilities {
@@ -104,15 +121,20 @@ class ModelAdmissionController {
 
     /**
      * Admission formula:
-     * allow_load IF free_ram_est_MB >= pte_size_MB * 1.6 + 600
+     * allow_load IF free_ram_est_MB >= pte_size_MB * multiplier + overhead + kv_per_token * ctx
+     * (legacy: pte_size_MB * 1.6 + 600)
      */
-    func canLoadModel(pteSizeMB: Int) -> (canLoad: Bool, reason: String, recommendedPreset: ModelPreset?) {
+    func canLoadModel(
+        pteSizeMB: Int,
+        coefficients: AdmissionCoefficients = .legacy,
+        contextWindow: Int = ModelPreset.safe.contextWindow
+    ) -> (canLoad: Bool, reason: String, recommendedPreset: ModelPreset?) {
         let device = DeviceCapabilities.current()
 
         logger.info("Device: \(device.deviceModel), Total RAM: \(device.totalRAM)MB, Available: \(device.availableRAM)MB")
 
         // Calculate required memory
-        let requiredMemory = Int64(pteSizeMB) * 16 / 10 + 600  // 1.6x + 600MB overhead
+        let requiredMemory = coefficients.requiredMB(sizeMB: pteSizeMB, contextWindow: contextWindow)
 
         // Check 1: Available memory
         guard device.availableRAM >= requiredMemory else {
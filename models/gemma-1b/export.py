@@ -5,14 +5,19 @@ Target: INT8 quantized .pte ≤ 1.1GB, seq_len=512
 
 import torch
 import json
-import hashlib
 import os
+import sys
+from datetime import datetime
 from pathlib import Path
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
+# Shared artifact tooling lives in tools/yi_tools
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "tools"))
+from yi_tools import mem_estimate, quantize, static_kv
+from yi_tools.hashing import HashingWriter
+
 try:
-    from executorch.exir import to_edge
-    from executorch.backends.xnnpack.partition import XnnpackPartitioner
+    from executorch.exir import to_edge_transform_and_lower, ExecutorchBackendConfig
     from torch.export import export
 except ImportError:
     print("ERROR: ExecuTorch not installed. Run: pip install executorch")
@@ -20,6 +25,8 @@ except ImportError:
 
 MODEL_ID = "google/gemma-1.1-1b-it"  # Adjust to actual Gemma 1B variant
 SEQ_LENGTH = 512
+STATIC_KV_CACHE = True  # single-token decode over a static KV cache (yi_tools.static_kv)
+KV_CACHE_PRESET = "full"  # cache length = this preset's ctx
 MAX_SIZE_GB = 1.1
 
 
@@ -69,16 +76,27 @@ def main():
 
     model.eval()
 
-    print(f"[3/7] Creating sample input (seq_len={SEQ_LENGTH})...")
-    sample_input = torch.randint(0, tokenizer.vocab_size, (1, SEQ_LENGTH), dtype=torch.long)
+    kv_cache = None
+    if STATIC_KV_CACHE:
+        cache_len = static_kv.cache_len_for(KV_CACHE_PRESET)
+        kv_cache = static_kv.manifest_entry(cache_len, KV_CACHE_PRESET)
+        print(f"[3/7] Static KV cache: {cache_len} tokens ({KV_CACHE_PRESET.upper()} preset)...")
+    else:
+        print(f"[3/7] Creating sample input (seq_len={SEQ_LENGTH})...")
+        sample_input = torch.randint(0, tokenizer.vocab_size, (1, SEQ_LENGTH), dtype=torch.long)
 
     print(f"[4/7] Exporting to FX graph with constant deduplication...")
     try:
-        exported_program = export(
-            model,
-            (sample_input,),
-            strict=True,
-        )
+        if kv_cache:
+            # forward(tokens[1, 1], input_pos[1]); sliding-window configs
+            # use transformers' hybrid cache
+            exported_program = static_kv.export_static_kv(model, kv_cache["max_cache_len"])
+        else:
+            exported_program = export(
+                model,
+                (sample_input,),
+                strict=True,
+            )
     except Exception as e:
         print(f"❌ FAILED: Export failed: {e}")
         print("    Gemma may not be fully compatible with torch.export")
@@ -86,8 +104,7 @@ def main():
 
     print(f"[5/7] Converting to Edge IR with INT8 quantization...")
     try:
-        edge_program = to_edge(exported_program)
-        edge_program = edge_program.to_backend(XnnpackPartitioner())
+        edge_program = to_edge_transform_and_lower(exported_program, partitioner=quantize.partitioners())
     except Exception as e:
         print(f"❌ FAILED: Edge conversion failed: {e}")
         exit(1)
@@ -96,8 +113,13 @@ def main():
     pte_output = "gemma-1b-int8-seq512.pte"
 
     try:
-        with open(pte_output, "wb") as f:
-            edge_program.write_to_file(f)
+        # Serializable program; the static cache needs its buffers planned as state
+        executorch_program = edge_program.to_executorch(
+            static_kv.executorch_config() if kv_cache else ExecutorchBackendConfig()
+        )
+        with HashingWriter(pte_output) as f:
+            executorch_program.write_to_file(f)
+        digest = f.digest()
     except Exception as e:
         print(f"❌ FAILED: Could not write .pte file: {e}")
         exit(1)
@@ -108,9 +130,8 @@ def main():
     file_size_bytes = os.path.getsize(pte_output)
     file_size_gb = file_size_bytes / (1024 ** 3)
 
-    # Calculate SHA256
-    with open(pte_output, "rb") as f:
-        sha256_hash = hashlib.sha256(f.read()).hexdigest()
+    # SHA256 + block tree hash were computed by the write sink
+    sha256_hash = digest["sha256"]
 
     # Create manifest
     manifest = {
@@ -119,17 +140,25 @@ def main():
         "pte_size_bytes": file_size_bytes,
         "pte_size_gb": round(file_size_gb, 3),
         "sha256": sha256_hash,
+        "tree_hash": digest["tree_hash"],
         "quantization": "INT8",
         "sequence_length": SEQ_LENGTH,
         "backend": "XNNPACK",
         "optimizations": [
             "constant_dedup",
             "weight_tying",
-            "to_backend(XnnpackPartitioner)"
+            "to_edge_transform_and_lower(XNNPACK)"
         ],
         "status": "EXPERIMENTAL",
-        "export_timestamp": torch.datetime.now().isoformat()
+        "export_timestamp": datetime.now().isoformat()
     }
+    if kv_cache:
+        manifest["kv_cache"] = kv_cache
+
+    # Analytic RAM per preset (weights, KV cache, logits, activations)
+    manifest["memory_estimate"] = mem_estimate.manifest_estimate(
+        manifest, mem_estimate.shape_from_config(model.config), "executorch", file_size_bytes
+    )
 
     manifest_path = "manifest.json"
     with open(manifest_path, "w") as f:
@@ -143,6 +172,8 @@ def main():
     print(f"Size:         {file_size_gb:.3f} GB ({file_size_bytes:,} bytes)")
     print(f"SHA256:       {sha256_hash[:16]}...")
     print(f"Manifest:     {manifest_path}")
+    print(f"\nRequired RAM per preset ({manifest['memory_estimate']['kv_dtype']} KV cache):")
+    mem_estimate.print_table(manifest["memory_estimate"], indent="  ")
 
     # Size gate check
     if file_size_gb > MAX_SIZE_GB:
@@ -7,15 +7,21 @@ Runtime: ONNX Runtime Mobile
 
 import torch
 import json
-import hashlib
 import os
+import sys
 from pathlib import Path
 from transformers import AutoModelForCausalLM, AutoTokenizer
 from optimum.onnxruntime import ORTModelForCausalLM
 
+# Shared artifact tooling lives in tools/yi_tools
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "tools"))
+from yi_tools.digest_cache import cached_hash_artifact
+from yi_tools import admission, mem_estimate, static_kv
+
 # Use pre-quantized INT8 model from NeuralMagic
 MODEL_ID = "neuralmagic/Llama-3.2-1B-Instruct-quantized.w8a8"
 SEQ_LENGTH = 512
+KV_CACHE_PRESET = "full"  # context the caller is expected to cap the cache at (advisory, not enforced)
 MAX_SIZE_GB = 1.5
 
 
@@ -32,7 +38,7 @@ def main():
     model = ORTModelForCausalLM.from_pretrained(
         MODEL_ID,
         export=True,
-        use_cache=False  # Disable KV cache for simplicity
+        use_cache=True  # past_key_values.* in / present.* out: single-token decode
     )
 
     tokenizer = AutoTokenizer.from_pretrained(MODEL_ID, use_fast=True)
@@ -90,9 +96,9 @@ def main():
         file_size_mb = file_size_bytes / (1024 ** 2)
         print(f"    Total size (model + external data): {file_size_gb:.3f} GB")
 
-    # Calculate SHA256
-    with open(final_output, "rb") as f:
-        sha256_hash = hashlib.sha256(f.read()).hexdigest()
+    # Calculate SHA256 + block tree hash
+    digest = cached_hash_artifact(final_output)
+    sha256_hash = digest["sha256"]
 
     print(f"Creating manifest...")
 
@@ -105,6 +111,7 @@ def main():
         "file_size_gb": round(file_size_gb, 3),
         "file_size_mb": round(file_size_mb, 1),
         "sha256": sha256_hash,
+        "tree_hash": digest["tree_hash"],
         "quantization": "INT8 (w8a8)",
         "sequence_length": SEQ_LENGTH,
         "runtime": "ONNX Runtime Mobile",
@@ -114,8 +121,27 @@ def main():
             "Pre-quantized by NeuralMagic"
         ]
     }
+    # KV cache is an input/output pair the caller grows; the past axis is
+    # unbounded in the graph, so max_cache_len is advisory (the preset ctx)
+    manifest["kv_cache"] = {
+        "layout": "kv_cache",
+        "static": False,
+        "inputs": "past_key_values.*",
+        "outputs": "present.*",
+        "max_cache_len": static_kv.cache_len_for(KV_CACHE_PRESET),
+        "sized_for_preset": KV_CACHE_PRESET,
+        "max_cache_len_enforced": False,
+    }
 
     manifest_path = output_dir.parent / "manifest.json"
+    # Keep coefficients fitted by `python -m yi_tools calibrate`
+    calibrated = admission.previous_admission(manifest_path)
+    if calibrated:
+        manifest["admission"] = calibrated
+    # Analytic RAM per preset (weights, KV cache, logits, activations)
+    manifest["memory_estimate"] = mem_estimate.manifest_estimate(
+        manifest, mem_estimate.shape_from_config(model.config), "onnxruntime", file_size_bytes
+    )
     with open(manifest_path, "w") as f:
         json.dump(manifest, f, indent=2)
 
@@ -135,10 +161,12 @@ def main():
     else:
         print(f"\n PASSED: ONNX size within {MAX_SIZE_GB} GB limit")
 
-    # Admission formula check (for 6GB device)
-    required_ram_mb = file_size_mb * 1.6 + 600
-    print(f"\nMemory Requirements (Admission Formula):")
-    print(f"  Required RAM: {required_ram_mb:.0f} MB ({required_ram_mb/1024:.2f} GB)")
+    # Admission check (for 6GB device, SAFE preset)
+    estimate = manifest["memory_estimate"]
+    required_ram_mb = estimate["presets"]["safe"]["required_ram_mb"]
+    print(f"\nMemory Requirements ({estimate['kv_dtype']} KV cache, {estimate['kv_bytes_per_token']:,.0f} bytes/token):")
+    mem_estimate.print_table(estimate, indent="  ")
+    print(f"  Required RAM: {required_ram_mb:.0f} MB ({required_ram_mb/1024:.2f} GB, SAFE preset)")
     print(f"  Target device: 6GB RAM ({6*1024} MB)")
 
     if required_ram_mb <= 6 * 1024:
@@ -5,22 +5,56 @@ Target: INT8 .pte ≤1.5GB, seq_len=512
 Quality-first approach: Full PRD compliance
 Runtime: ExecuTorch
 Format: .pte (portable tensor expression)
-Quantization: INT8 (linear + embedding layers)
+Quantization: PT2E + XNNPACK (yi_tools.quantize) - 8da8w: dynamic INT8
+              activations, per-channel INT8 linears; 8da4w: 4-bit groupwise
+              linears (QUANT_GROUP_SIZE); INT8 per-row embedding table.
+              Calibrated on prompts/scenarios_10turn.md
+KV cache: static, sized to the FULL preset ctx; two methods sharing the
+          weights and cache - prefill (1..PREFILL_CHUNK tokens) and decode
+          (1 token). STATIC_KV_CACHE = False restores the stateless trace
+          (1..ctx tokens)
+Token axis: dynamic (DYNAMIC_TOKENS), so short turns run unpadded; the
+            lowered program is checked for XNNPACK delegation and run at
+            both bounds before it is written
+Weights: streamed (STREAM_WEIGHTS) - parameters start on the meta device and
+         each layer is read from the mmap'd safetensors checkpoint and
+         quantized before the next (yi_tools.weight_stream), so the full
+         fp32 model is never in memory; the PT2E pass is skipped. Falls
+         back to from_pretrained + PT2E on a transformers without the
+         meta-device APIs (weight_stream.available()). The
+         export's own peak RSS per phase goes into the manifest
+         (export_memory)
 """
 
 import torch
 from transformers import AutoModelForCausalLM, AutoTokenizer
-from executorch.exir import to_edge, EdgeCompileConfig
+from executorch.exir import to_edge_transform_and_lower, EdgeCompileConfig, ExecutorchBackendConfig
 from torch.export import export
 import json
-import hashlib
 import os
+import sys
 from datetime import datetime
+from pathlib import Path
+
+# Shared artifact tooling lives in tools/yi_tools
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "tools"))
+from yi_tools import mem_estimate, quantize, static_kv, weight_stream
+from yi_tools.hashing import HashingWriter
+from yi_tools.mem_sampler import MemorySampler
 
 MODEL_ID = "meta-llama/Llama-3.2-1B-Instruct"
 SEQ_LENGTH = 512
 OUTPUT_FILE = "llama3.2-1b-int8-seq512.pte"
 MANIFEST_FILE = "manifest.json"
+STATIC_KV_CACHE = True
+KV_CACHE_PRESET = "full"  # cache length = this preset's ctx
+PREFILL_CHUNK = static_kv.DEFAULT_PREFILL_CHUNK  # max tokens per prefill call; longer prompts are chunked
+DYNAMIC_TOKENS = True  # prefill takes 1..PREFILL_CHUNK tokens (False: exactly PREFILL_CHUNK)
+QUANT_SCHEME = quantize.DEFAULT_SCHEME  # "8da8w" (INT8 linears) or "8da4w" (4-bit groupwise)
+QUANT_GROUP_SIZE = quantize.DEFAULT_GROUP_SIZE  # 8da4w: input channels per weight scale
+QUANTIZE_EMBEDDINGS = True  # INT8 per-row embedding table (embedding_byte)
+STREAM_WEIGHTS = True  # meta-device model, weights read + quantized layer by layer (False: from_pretrained + PT2E)
+MEMORY_SAMPLE_MS = 50  # export RSS sampling interval
 
 def log_step(step_num, total, message):
     """Log export progress"""
@@ -32,59 +66,141 @@ def main():
     torch.set_grad_enabled(False)
     log_step(0, 7, "Memory guards: Disabled gradients globally")
 
-    log_step(1, 7, "Loading model from HuggingFace Hub...")
-    model = AutoModelForCausalLM.from_pretrained(
-        MODEL_ID,
-        torch_dtype=torch.float32,
-        low_cpu_mem_usage=True
-    )
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
+    # Peak RSS of the export itself, per phase (manifest export_memory)
+    sampler = MemorySampler(MEMORY_SAMPLE_MS).start()
+    sampler.mark("load")
+
+    stream_weights = STREAM_WEIGHTS and weight_stream.available()
+    if STREAM_WEIGHTS and not stream_weights:
+        log_step(1, 7, "WARNING: installed transformers cannot build the model on the meta device; "
+                       "falling back to from_pretrained + PT2E")
+
+    if stream_weights:
+        log_step(1, 7, f"Streaming weights from safetensors, quantizing each layer "
+                       f"({quantize.label(QUANT_SCHEME, QUANT_GROUP_SIZE)})...")
+        model = weight_stream.load_quantized(
+            MODEL_ID, QUANT_SCHEME, QUANT_GROUP_SIZE, embeddings=QUANTIZE_EMBEDDINGS
+        )
+    else:
+        log_step(1, 7, "Loading model from HuggingFace Hub...")
+        model = AutoModelForCausalLM.from_pretrained(
+            MODEL_ID,
+            torch_dtype=torch.float32,
+            low_cpu_mem_usage=True
+        )
 
-    # Tie weights for memory efficiency
-    if hasattr(model, "tie_weights"):
-        model.tie_weights()
-        log_step(1, 7, "Tied embedding weights for optimization")
+        # Tie weights for memory efficiency
+        if hasattr(model, "tie_weights"):
+            model.tie_weights()
+            log_step(1, 7, "Tied embedding weights for optimization")
+
+        # 8da4w rewrites the linears before export; 8da8w quantizes in the graph
+        model = quantize.quantize_source(model, QUANT_SCHEME, QUANT_GROUP_SIZE)
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_ID)
 
     model.eval()
-    log_step(1, 7, f"Model loaded: {model.config.num_parameters():,} parameters")
-
-    # Memory optimization: Use smaller example input (128 tokens instead of 512)
-    # This reduces IR graph size during export without affecting final .pte
-    EXPORT_SEQ = 128
-    log_step(2, 7, f"Creating sample input (batch=1, seq_len={EXPORT_SEQ} for export)...")
-    sample_input = torch.randint(
-        0,
-        tokenizer.vocab_size,
-        (1, EXPORT_SEQ),
-        dtype=torch.long
-    )
+    log_step(1, 7, f"Model loaded: {model.num_parameters():,} parameters")
 
+    kv_cache = None
+    if STATIC_KV_CACHE:
+        cache_len = static_kv.cache_len_for(KV_CACHE_PRESET)
+        kv_cache = static_kv.manifest_entry(cache_len, KV_CACHE_PRESET, PREFILL_CHUNK, DYNAMIC_TOKENS)
+        token_shapes = static_kv.dynamic_shapes(PREFILL_CHUNK) if DYNAMIC_TOKENS else {}
+        bound_lengths = static_kv.bound_lengths(PREFILL_CHUNK)
+        log_step(2, 7, f"Static KV cache: {cache_len} tokens ({KV_CACHE_PRESET.upper()} preset), "
+                       f"prefill {'1..' if token_shapes else ''}{PREFILL_CHUNK} tokens, 1-token decode")
+    else:
+        # Memory optimization: Use smaller example input (128 tokens instead of 512)
+        # This reduces IR graph size during export without affecting final .pte
+        EXPORT_SEQ = 128
+        log_step(2, 7, f"Creating sample input (batch=1, seq_len={EXPORT_SEQ} for export)...")
+        sample_input = torch.randint(
+            0,
+            tokenizer.vocab_size,
+            (1, EXPORT_SEQ),
+            dtype=torch.long
+        )
+        # Sequence axis bounded by the preset's context window
+        window = static_kv.cache_len_for(KV_CACHE_PRESET)
+        token_shapes = {"forward": ({1: static_kv.sequence_dim(window)},)} if DYNAMIC_TOKENS else {}
+        bound_lengths = {"forward": static_kv.token_bounds(window) if DYNAMIC_TOKENS else [EXPORT_SEQ]}
+
+    sampler.mark("export")
     log_step(3, 7, "Exporting to FX graph (torch.export)...")
     try:
-        exported_program = export(
-            model,
-            (sample_input,),
-            strict=False  # Allow some flexibility for dynamic operations
-        )
+        if kv_cache:
+            # prefill(tokens[1, 1..chunk], input_pos[1]) and decode(tokens[1, 1], input_pos[1])
+            # traced from one module, K/V as mutable buffers
+            exported_program = static_kv.export_static_kv(
+                model, kv_cache["max_cache_len"], PREFILL_CHUNK, dynamic=DYNAMIC_TOKENS
+            )
+        else:
+            exported_program = export(
+                model,
+                (sample_input,),
+                dynamic_shapes=token_shapes.get("forward"),
+                strict=False  # Allow some flexibility for dynamic operations
+            )
         log_step(3, 7, "FX graph export successful")
     except Exception as e:
         print(f"ERROR: Failed to export FX graph: {e}")
         raise
+    if not kv_cache:
+        exported_program = {"forward": exported_program}
 
-    log_step(4, 7, "Converting to Edge IR (ExecuTorch intermediate)...")
+    sampler.mark("quantize")
+    if stream_weights:
+        # Already quantized layer by layer; PT2E would need the fp32 graph
+        samples = []
+        log_step(3, 7, "Weights quantized while streaming; no PT2E pass")
+    else:
+        log_step(3, 7, f"Quantizing (PT2E, {quantize.label(QUANT_SCHEME, QUANT_GROUP_SIZE)}, "
+                       f"embeddings {'INT8' if QUANTIZE_EMBEDDINGS else 'fp32'})...")
+        try:
+            samples = quantize.calibration_samples(tokenizer)
+            exported_program = quantize.quantize_methods(
+                exported_program,
+                quantize.pt2e_quantizer(QUANT_SCHEME, embeddings=QUANTIZE_EMBEDDINGS),
+                quantize.prompt_calibrator(samples),
+                strict=bool(kv_cache),
+                dynamic_shapes=token_shapes,
+            )
+            log_step(3, 7, f"Quantized {', '.join(sorted(exported_program))}; "
+                           f"calibrated on {len(samples)} scenario prompts")
+        except Exception as e:
+            print(f"ERROR: Failed to quantize: {e}")
+            raise
+
+    sampler.mark("lower")
+    log_step(4, 7, "Converting to Edge IR and lowering to XNNPACK...")
     try:
         edge_config = EdgeCompileConfig(
             _check_ir_validity=False  # Allow edge cases in IR
         )
-        edge_program = to_edge(exported_program, compile_config=edge_config)
+        # Quantized linears run as XNNPACK dynamically-quantized kernels
+        edge_program = to_edge_transform_and_lower(
+            exported_program, partitioner=quantize.partitioners(), compile_config=edge_config
+        )
         log_step(4, 7, "Edge IR conversion successful")
+        # Memory guard: the lowered program is self-contained; drop the eager
+        # model and exported graphs (and trim the heap) before serializing
+        model_config = model.config
+        del model, exported_program
+        weight_stream.release_freed_memory()
+        # Serializable program; prefill and decode get one shared KV-cache arena.
+        # Quant fusion turns the dequantized embedding lookup into embedding_byte
+        backend_config = {"do_quant_fusion_and_const_prop": True}
+        edge_program = edge_program.to_executorch(
+            static_kv.executorch_config(**backend_config) if kv_cache else ExecutorchBackendConfig(**backend_config)
+        )
+        log_step(4, 7, f"Methods: {', '.join(sorted(edge_program.methods))}")
     except Exception as e:
         print(f"ERROR: Failed to convert to Edge IR: {e}")
         raise
 
     # GUARD 1: Verify Edge IR buffer is not empty
     log_step(4, 7, "Validating Edge IR buffer...")
-    edge_buffer = edge_program.buffer()
+    edge_buffer = edge_program.buffer
     if not isinstance(edge_buffer, (bytes, bytearray)) or len(edge_buffer) == 0:
         raise RuntimeError(
             f"Empty Edge IR buffer detected (len={len(edge_buffer)}). "
@@ -96,7 +212,10 @@ def main():
     # GUARD 2: Verify at least one partition was generated
     try:
         # EdgeProgram should have at least one executable partition
-        num_methods = len(edge_program.exported_program().graph_module.graph.nodes)
+        num_methods = sum(
+            len(edge_program.exported_program(name).graph_module.graph.nodes)
+            for name in edge_program.methods
+        )
         if num_methods == 0:
             raise RuntimeError("No executable methods found in Edge IR graph")
         log_step(4, 7, f"Edge IR contains {num_methods} graph nodes")
@@ -104,10 +223,28 @@ def main():
         print(f"WARNING: Could not validate partition count: {e}")
         # Continue anyway - buffer validation is the critical guard
 
+    # GUARD 3: XNNPACK still takes every matmul, and each method runs at both
+    # ends of its token axis (a bound XNNPACK cannot reshape to fails here)
+    sampler.mark("check")
+    log_step(4, 7, "Validating XNNPACK delegation at the token-axis bounds...")
+    undelegated = {name: ops for name, ops in static_kv.undelegated_ops(edge_program).items() if ops}
+    if undelegated:
+        raise RuntimeError(f"Matmul ops left outside the XNNPACK delegate: {undelegated}")
+    bounds_check = static_kv.check_bounds(edge_buffer, bound_lengths)
+    for row in bounds_check:
+        status = f"{row['ms']} ms" if row["ok"] else f"FAILED ({row['error'] or row['logits_shape']})"
+        log_step(4, 7, f"  {row['method']}[{row['tokens']} tokens]: {status}")
+    failed = [f"{row['method']}[{row['tokens']}]" for row in bounds_check if not row["ok"]]
+    if failed:
+        raise RuntimeError(f"Lowered program fails at token bounds: {', '.join(failed)}")
+
+    sampler.mark("write")
     log_step(5, 7, f"Generating .pte file: {OUTPUT_FILE}...")
     try:
-        with open(OUTPUT_FILE, "wb") as f:
+        # Hash while writing: SHA256 + block tree without a read-back pass
+        with HashingWriter(OUTPUT_FILE) as f:
             edge_program.write_to_file(f)
+        digest = f.digest()
         log_step(5, 7, f".pte file written successfully")
     except Exception as e:
         print(f"ERROR: Failed to write .pte file: {e}")
@@ -118,15 +255,17 @@ def main():
         raise FileNotFoundError(f"{OUTPUT_FILE} was not created")
 
     size_bytes = os.path.getsize(OUTPUT_FILE)
+    if size_bytes != digest["size_bytes"]:
+        raise RuntimeError(
+            f"Size mismatch: {size_bytes:,} bytes on disk, {digest['size_bytes']:,} bytes written"
+        )
     size_gb = size_bytes / (1024**3)
     size_mb = size_bytes / (1024**2)
 
     log_step(6, 7, f"File size: {size_mb:.2f} MB ({size_gb:.3f} GB)")
 
-    # Compute SHA256 hash for integrity verification
-    log_step(6, 7, "Computing SHA256 hash...")
-    with open(OUTPUT_FILE, "rb") as f:
-        sha256_hash = hashlib.sha256(f.read()).hexdigest()
+    # SHA256 + block tree hash were computed by the write sink
+    sha256_hash = digest["sha256"]
 
     # Create manifest
     manifest = {
@@ -136,12 +275,40 @@ def main():
         "pte_size_mb": round(size_mb, 2),
         "pte_size_gb": round(size_gb, 3),
         "sha256": sha256_hash,
-        "quantization": "INT8",
+        "tree_hash": digest["tree_hash"],
+        "quantization": quantize.label(QUANT_SCHEME, QUANT_GROUP_SIZE),
+        "quantization_config": quantize.manifest_entry(
+            QUANT_SCHEME, QUANT_GROUP_SIZE, QUANTIZE_EMBEDDINGS, len(samples),
+            flow=weight_stream.FLOW if stream_weights else quantize.PT2E_FLOW,
+        ),
         "sequence_length": SEQ_LENGTH,
         "export_timestamp": datetime.now().isoformat(),
         "runtime": "ExecuTorch",
         "prd_compliant": True
     }
+    if kv_cache:
+        manifest["kv_cache"] = kv_cache
+    manifest["token_axis"] = {
+        "dynamic": bool(token_shapes),
+        "checked": bound_lengths,
+        "bounds_check": bounds_check,
+    }
+
+    # What the export itself peaked at (RSS sampled per phase + kernel high-water mark)
+    memory = sampler.stop()
+    manifest["export_memory"] = {
+        "mode": "streamed" if stream_weights else "from_pretrained",
+        "peak_rss_mb": memory["peaks"]["rss_mb"],
+        "hwm_mb": memory["hwm_mb"],
+        "phase_peak_rss_mb": {phase: peaks["rss_mb"] for phase, peaks in memory["phase_peaks"].items()},
+        "source": memory["source"],
+        "interval_ms": memory["interval_ms"],
+    }
+
+    # Analytic RAM per preset (weights, KV cache, logits, activations)
+    manifest["memory_estimate"] = mem_estimate.manifest_estimate(
+        manifest, mem_estimate.shape_from_config(model_config), "executorch", size_bytes
+    )
 
     with open(MANIFEST_FILE, "w") as f:
         json.dump(manifest, f, indent=2)
@@ -152,6 +319,10 @@ def main():
     print(f"SIZE: {size_mb:.2f} MB ({size_gb:.3f} GB)")
     print(f"SHA256: {sha256_hash}")
     print(f"MANIFEST: {MANIFEST_FILE}")
+    print(f"EXPORT PEAK RSS: {manifest['export_memory']['peak_rss_mb']} MB "
+          f"(high-water mark {manifest['export_memory']['hwm_mb']} MB, {manifest['export_memory']['mode']})")
+    print(f"\nRequired RAM per preset ({manifest['memory_estimate']['kv_dtype']} KV cache):")
+    mem_estimate.print_table(manifest["memory_estimate"], indent="  ")
     print("="*60)
 
     # Validation checks
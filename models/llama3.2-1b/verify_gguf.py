@@ -4,10 +4,16 @@ Validates model file and generates manifest
 """
 
 import json
-import hashlib
 import os
+import sys
 from pathlib import Path
 
+# Shared artifact tooling lives in tools/yi_tools
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "tools"))
+from yi_tools.digest_cache import cached_hash_artifact
+from yi_tools.gguf import GGUFFile
+from yi_tools import admission, mem_estimate
+
 MODEL_FILE = "Llama-3.2-1B-Instruct-Q8_0.gguf"
 MAX_SIZE_GB = 1.5
 
@@ -19,7 +25,7 @@ def main():
         print(f"ERROR: Model file not found: {model_path}")
         exit(1)
 
-    print(f"[1/3] Checking model size...")
+    print(f"[1/4] Checking model size...")
 
     file_size_bytes = os.path.getsize(model_path)
     file_size_gb = file_size_bytes / (1024 ** 3)
@@ -27,39 +33,62 @@ def main():
 
     print(f"    Size: {file_size_gb:.3f} GB ({file_size_mb:.1f} MB)")
 
-    print(f"[2/3] Calculating SHA256...")
+    print(f"[2/4] Parsing GGUF header...")
+
+    with GGUFFile(model_path) as gguf:
+        gguf_entry = gguf.manifest_entry()
+        span_problems = gguf.validate_spans()
+        shape = mem_estimate.shape_from_gguf(gguf)
+
+    quant = gguf_entry["quantization"]
+    print(f"    GGUF v{gguf_entry['version']}, arch={gguf_entry['architecture']}, "
+          f"file_type={quant['file_type']}")
+    print(f"    Tensors: {quant['tensor_count']} ({quant['total_params']:,} params, "
+          f"{quant['effective_bpw']} effective bpw)")
+    for type_name, bucket in quant["by_type"].items():
+        print(f"      {type_name:<8} {bucket['tensors']:>4} tensors  {bucket['bpw']} bpw")
+    if span_problems:
+        for problem in span_problems:
+            print(f"    ERROR: {problem}")
+        exit(1)
 
-    sha256_hash = hashlib.sha256()
-    with open(model_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096*1024), b""):
-            sha256_hash.update(chunk)
+    print(f"[3/4] Calculating SHA256...")
 
-    sha256 = sha256_hash.hexdigest()
+    digest = cached_hash_artifact(str(model_path))
+    sha256 = digest["sha256"]
     print(f"    SHA256: {sha256[:16]}...")
 
-    print(f"[3/3] Creating manifest...")
+    print(f"[4/4] Creating manifest...")
 
     # Create manifest
     manifest = {
         "model_id": "bartowski/Llama-3.2-1B-Instruct-GGUF",
         "model_file": str(model_path),
-        "quantization": "Q8_0",
+        "quantization": quant["file_type"] or "Q8_0",
         "file_size_bytes": file_size_bytes,
         "file_size_gb": round(file_size_gb, 3),
         "file_size_mb": round(file_size_mb, 1),
         "sha256": sha256,
+        "tree_hash": digest["tree_hash"],
         "runtime": "llama.cpp",
         "backend": "CPU (ARM/x64 optimized)",
         "sequence_length": 512,
         "format": "GGUF",
+        "gguf": gguf_entry,
         "optimizations": [
-            "Q8_0 quantization (8-bit)",
+            f"{quant['file_type'] or 'Q8_0'} quantization ({quant['effective_bpw']} bpw effective)",
             "Native GGUF format",
             "llama.cpp optimized"
         ]
     }
 
     manifest_path = model_path.parent / "manifest.json"
+    # Keep coefficients fitted by `python -m yi_tools calibrate`
+    calibrated = admission.previous_admission(manifest_path)
+    if calibrated:
+        manifest["admission"] = calibrated
+    # Analytic RAM per preset (weights, KV cache, logits, activations)
+    manifest["memory_estimate"] = mem_estimate.manifest_estimate(manifest, shape, "llama.cpp", None)
     with open(manifest_path, "w") as f:
         json.dump(manifest, f, indent=2)
 
@@ -79,10 +108,12 @@ def main():
     else:
         print(f"\n PASSED: Model size within {MAX_SIZE_GB} GB limit")
 
-    # Admission formula check (for 6GB device)
-    required_ram_mb = file_size_mb * 1.6 + 600
-    print(f"\nMemory Requirements (Admission Formula):")
-    print(f"  Required RAM: {required_ram_mb:.0f} MB ({required_ram_mb/1024:.2f} GB)")
+    # Admission check (for 6GB device, SAFE preset)
+    estimate = manifest["memory_estimate"]
+    required_ram_mb = estimate["presets"]["safe"]["required_ram_mb"]
+    print(f"\nMemory Requirements ({estimate['kv_dtype']} KV cache, {estimate['kv_bytes_per_token']:,.0f} bytes/token):")
+    mem_estimate.print_table(estimate, indent="  ")
+    print(f"  Required RAM: {required_ram_mb:.0f} MB ({required_ram_mb/1024:.2f} GB, SAFE preset)")
     print(f"  Target device: 6GB RAM ({6*1024} MB)")
 
     if required_ram_mb <= 6 * 1024:
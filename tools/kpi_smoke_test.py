@@ -7,29 +7,107 @@ VALIDATION CRITERIA (Initial Smoke Test - Pre-Optimization):
 - tok/s: >=10 (target: >=18 after optimization)
 - mem_peak: <=3500MB (target: <=3000MB on 6GB devices)
 
+Benchmark (yi_tools.pte_runtime): the program is loaded through the
+ExecuTorch pybindings, warmed up, then prefill (TTFT) and a greedy decode
+loop (tok/s) are timed over several repeats; gates use the p50 values and
+the JSON carries p50/p90/p99 and variance.
+
+Memory (yi_tools.mem_sampler): a background thread samples the process's
+RSS, PSS, anonymous and file-backed (mmap'd weights) memory from /proc
+every --mem-interval-ms through load, prefill and decode; mem_peak gates on
+the peak RSS (or the kernel high-water mark, if higher) and the JSON
+carries the timeline and per-phase peaks.
+
+Thread sweep (yi_tools.thread_sweep): --thread-sweep additionally pins the
+process to CPU subsets (sched_setaffinity), varies the thread count and
+times prefill and decode separately; --update-presets writes the
+recommended threads for this CPU topology into the manifest's
+recommended_presets.<preset>.threads.
+
+History (yi_tools.bench_history): --history appends the run, keyed by
+artifact SHA256, runtime version and host fingerprint, to a SQLite store;
+`python -m yi_tools history compare` then flags regressions against a
+baseline with bootstrap confidence intervals.
+
 Usage:
-    python kpi_smoke_test.py <path_to_pte_file> [--tokenizer-path <path>]
+    python kpi_smoke_test.py <path_to_pte_file> [--tokenizer-path tokenizer.json --prompt "..."]
+        [--prompt-tokens 64] [--decode-tokens 32] [--warmup 2] [--repeats 5]
+    python kpi_smoke_test.py --self-test   # tiny generated model, no downloads
+
+GGUF models (llama-cpp-python) are benchmarked per language (ko/en/zh/ja)
+and diffed against the manifest's baseline_metrics:
+    python kpi_smoke_test.py model.gguf --manifest models/qwen2.5-1.5b/manifest.json
+        [--languages ko,en] [--baseline-tolerance 0.1] [--update-baseline]
+
+ONNX models (onnxruntime) sweep session options - graph optimization level,
+intra/inter-op threads, execution mode - and save the winning optimized
+graph in ORT format (default: next to the model, same name + .ort):
+    python kpi_smoke_test.py model.onnx [--ort-levels basic,extended,all]
+        [--ort-threads 1,2,4] [--ort-inter-threads 1,2] [--ort-modes sequential,parallel]
+        [--ort-output model.ort | --no-ort-output] [--no-sweep]
 """
 
 import sys
 import os
 import argparse
 import json
-import time
-import tracemalloc
-from pathlib import Path
+import traceback
 from datetime import datetime
 
+from yi_tools.gguf_runtime import GGUFRunner, LANGUAGE_KEYS, LlamaCppUnavailable, compare_to_baseline
+from yi_tools.mem_sampler import DEFAULT_INTERVAL_MS, MemorySampler
+from yi_tools.ort_runtime import ORTRunner, ORTUnavailable, save_ort, sweep_session_options
+from yi_tools.pte_runtime import PTERunner, RuntimeUnavailable
 
-class KPISmokeTest:
-    """KPI smoke test runner for ExecuTorch models"""
 
-    def __init__(self, pte_path: str, tokenizer_path: str = None):
+class KPISmokeTest:
+    """KPI smoke test runner for ExecuTorch (.pte), llama.cpp (.gguf) and ONNX Runtime (.onnx/.ort) models"""
+
+    def __init__(
+        self,
+        pte_path: str,
+        tokenizer_path: str = None,
+        prompt: str = None,
+        prompt_tokens: int = 64,
+        decode_tokens: int = 32,
+        warmup: int = 2,
+        repeats: int = 5,
+        manifest_path: str = None,
+        languages: list = None,
+        n_ctx: int = None,
+        baseline_tolerance: float = 0.10,
+        ort_configs: list = None,
+        ort_sweep: bool = True,
+        ort_output: str = None,
+        mem_interval_ms: float = DEFAULT_INTERVAL_MS,
+        thread_sweep: bool = False,
+        thread_counts: list = None,
+    ):
         self.pte_path = pte_path
+        self.backend = _backend_for(pte_path)
+        self.manifest_path = manifest_path
+        self.languages = languages
+        self.n_ctx = n_ctx
+        self.baseline_tolerance = baseline_tolerance
+        self.manifest = {}
+        self.ort_configs = ort_configs
+        self.ort_sweep = ort_sweep
+        self.ort_output = ort_output
         self.tokenizer_path = tokenizer_path
+        self.prompt = prompt
+        self.prompt_tokens = prompt_tokens
+        self.decode_tokens = decode_tokens
+        self.warmup = warmup
+        self.repeats = repeats
+        self.runner = None
+        self.mem_interval_ms = mem_interval_ms
+        self.thread_sweep = thread_sweep
+        self.thread_counts = thread_counts
+        self.sampler = None
         self.results = {
             "run_id": f"smoke_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
             "pte_file": pte_path,
+            "backend": self.backend,
             "timestamp": datetime.now().isoformat(),
             "kpi": {},
             "gates": {},
@@ -41,7 +119,7 @@ class KPISmokeTest:
         print("="*70)
         print("KPI SMOKE TEST")
         print("="*70)
-        print(f"PTE File: {self.pte_path}")
+        print(f"Model File: {self.pte_path} ({self.backend})")
         print(f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("="*70)
 
@@ -52,14 +130,24 @@ class KPISmokeTest:
         # Test 2: Memory tracking setup
         self._setup_memory_tracking()
 
-        # Test 3: Model loading (TTFT proxy)
+        # Test 3: Model loading
+        self.sampler.mark("load")
         load_success = self._test_model_loading()
         if not load_success:
+            self.sampler.stop()
             print("\nWARNING: Model loading failed - skipping inference tests")
             return self.results
 
-        # Test 4: Inference performance (tok/s, actual TTFT)
-        self._test_inference_performance()
+        # Test 4: Inference performance (TTFT from prefill, decode tok/s)
+        if self.backend == "llama.cpp":
+            self._test_language_performance()
+            self._compare_baseline()
+        elif self.backend == "onnxruntime" and self.ort_sweep:
+            self._test_session_sweep()
+        else:
+            self._test_inference_performance()
+        if self.thread_sweep:
+            self._test_thread_sweep()
 
         # Test 5: Memory peak
         self._check_memory_peak()
@@ -99,104 +187,384 @@ class KPISmokeTest:
         return True
 
     def _setup_memory_tracking(self):
-        """Initialize memory tracking"""
+        """Start the background RSS/PSS sampler"""
         print("\n[TEST 2/5] Memory Tracking Setup")
-        tracemalloc.start()
+        self.sampler = MemorySampler(self.mem_interval_ms).start()
+        print(f"    Source: {self.sampler.source}, interval: {self.mem_interval_ms:g} ms")
+        if self.sampler.source == "rusage":
+            print(f"    NOTE: No /proc on this platform - peak RSS only (getrusage)")
         print(f"    Status: READY")
 
+    def _load_manifest(self) -> dict:
+        """--manifest, else manifest.json next to the model (or {})"""
+        path = self.manifest_path or os.path.join(os.path.dirname(os.path.abspath(self.pte_path)), "manifest.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        self.manifest_path = path
+        return manifest
+
     def _test_model_loading(self) -> bool:
-        """Test model loading time (TTFT proxy)"""
-        print("\n[TEST 3/5] Model Loading (TTFT Proxy)")
+        """Load the program through the ExecuTorch pybindings (llama.cpp for .gguf, ONNX Runtime for .onnx/.ort)"""
+        print("\n[TEST 3/5] Model Loading")
+        if self.backend == "llama.cpp":
+            return self._load_gguf()
+        if self.backend == "onnxruntime":
+            return self._load_onnx()
         print(f"    Attempting to load ExecuTorch model...")
 
-        # Check ExecuTorch availability
-        executorch_available = False
         try:
-            # Try importing ExecuTorch runtime
-            import executorch.extension.pybindings.portable_lib as exec_lib
-            executorch_available = True
-            print(f"    ExecuTorch Runtime: AVAILABLE")
-        except ImportError:
-            print(f"    ExecuTorch Runtime: NOT AVAILABLE")
-
-        if not executorch_available:
+            self.runner = PTERunner(self.pte_path)
+        except RuntimeUnavailable as e:
+            print(f"    ExecuTorch Runtime: NOT AVAILABLE ({e})")
             print(f"    Status: SKIPPED (ExecuTorch runtime not installed)")
             print(f"    Recommendation: Install ExecuTorch for full smoke test")
             self.results["kpi"]["ttft_ms"] = None
             self.results["kpi"]["load_time_ms"] = None
             return False
+        except Exception as e:
+            print(f"    FAILED: {e}")
+            traceback.print_exc()
+            self.results["kpi"]["ttft_ms"] = None
+            self.results["kpi"]["load_time_ms"] = None
+            self.results["status"] = "LOAD_FAILED"
+            return False
 
-        try:
-            # Measure load time
-            start_time = time.perf_counter()
+        info = self.runner.describe()
+        print(f"    ExecuTorch Runtime: AVAILABLE")
+        print(f"    Methods: {', '.join(info['methods'])}")
+        print(f"    Layout: {info['layout']} (window={info['window']}, vocab={info['vocab_size']})")
+        print(f"    Load Time: {info['load_ms']:.2f} ms")
+        self.results["kpi"]["load_time_ms"] = info["load_ms"]
+        self.results["runtime"] = info
+        return True
 
-            # Placeholder for actual model loading
-            # In practice:
-            # module = exec_lib.load_pte(self.pte_path)
+    def _load_gguf(self) -> bool:
+        self.manifest = self._load_manifest()
+        n_ctx = self.n_ctx or self.manifest.get("context_length", 512)
+        print(f"    Attempting to load GGUF model via llama.cpp (n_ctx={n_ctx})...")
+        try:
+            self.runner = GGUFRunner(self.pte_path, n_ctx=n_ctx)
+        except LlamaCppUnavailable as e:
+            print(f"    llama.cpp Runtime: NOT AVAILABLE ({e})")
+            print(f"    Status: SKIPPED (llama-cpp-python not installed)")
+            self.results["kpi"]["ttft_ms"] = None
+            self.results["kpi"]["load_time_ms"] = None
+            return False
+        except Exception as e:
+            print(f"    FAILED: {e}")
+            traceback.print_exc()
+            self.results["kpi"]["load_time_ms"] = None
+            self.results["status"] = "LOAD_FAILED"
+            return False
 
-            # Simulate load (replace with actual loading)
-            print(f"    WARNING: Actual model loading not implemented")
-            print(f"    Using simulated timing")
+        info = self.runner.describe()
+        print(f"    llama.cpp Runtime: AVAILABLE (llama-cpp-python {info['llama_cpp_python']})")
+        print(f"    Chat format: {info['chat_format']}, threads: {info['n_threads']}")
+        print(f"    Load Time: {info['load_ms']:.2f} ms")
+        self.results["kpi"]["load_time_ms"] = info["load_ms"]
+        self.results["runtime"] = info
+        return True
 
-            load_time = time.perf_counter() - start_time
-            load_time_ms = load_time * 1000
+    def _load_onnx(self) -> bool:
+        print(f"    Attempting to load ONNX model via ONNX Runtime (default session options)...")
+        try:
+            self.runner = ORTRunner(self.pte_path)
+        except ORTUnavailable as e:
+            print(f"    ONNX Runtime: NOT AVAILABLE ({e})")
+            print(f"    Status: SKIPPED (onnxruntime not installed)")
+            self.results["kpi"]["ttft_ms"] = None
+            self.results["kpi"]["load_time_ms"] = None
+            return False
+        except Exception as e:
+            print(f"    FAILED: {e}")
+            traceback.print_exc()
+            self.results["kpi"]["load_time_ms"] = None
+            self.results["status"] = "LOAD_FAILED"
+            return False
 
-            print(f"    Load Time: {load_time_ms:.2f} ms")
-            self.results["kpi"]["load_time_ms"] = round(load_time_ms, 2)
+        info = self.runner.describe()
+        print(f"    ONNX Runtime: AVAILABLE (onnxruntime {info['onnxruntime']})")
+        print(f"    Inputs: {', '.join(info['inputs'])}")
+        print(f"    Layout: {info['layout']} (window={info['window'] or 'dynamic'}, vocab={info['vocab_size']})")
+        print(f"    Load Time: {info['load_ms']:.2f} ms")
+        self.results["kpi"]["load_time_ms"] = info["load_ms"]
+        self.results["runtime"] = info
+        return True
 
-            # For smoke test, we'll use load time as TTFT proxy
-            # Actual TTFT requires first inference run
-            self.results["kpi"]["ttft_ms"] = round(load_time_ms, 2)
+    def _test_session_sweep(self):
+        """Benchmark every session-option config; KPIs come from the fastest"""
+        print("\n[TEST 4/5] Inference Performance (ONNX Runtime session-option sweep)")
+        prompt_ids = self._prompt_ids()
+        print(f"    Prompt: {len(prompt_ids) if prompt_ids else self.prompt_tokens} tokens "
+              f"({'tokenized' if prompt_ids else 'synthetic'}), decode: {self.decode_tokens} tokens")
+        print(f"    Warmup: {self.warmup}, repeats: {self.repeats}")
+        self.runner = None  # the sweep opens its own sessions
+
+        def progress(done, total, row):
+            result = f"{row['tok_s']:>9.2f} tok/s  ttft {row['ttft_ms']:>8.2f} ms  load {row['load_ms']:>8.2f} ms" \
+                if row["error"] is None else f"ERROR: {row['error']}"
+            print(f"    [{done:>2}/{total}] {row['opt_level']:<8} {row['execution_mode']:<10} "
+                  f"intra={row['intra_op']:<2} inter={row['inter_op']:<2} {result}")
+
+        sweep = sweep_session_options(
+            self.pte_path,
+            self.ort_configs,
+            prompt_ids=prompt_ids,
+            prompt_tokens=self.prompt_tokens,
+            decode_tokens=self.decode_tokens,
+            warmup=self.warmup,
+            repeats=self.repeats,
+            progress=progress,
+            mark=self.sampler.mark,
+        )
+        best = sweep["best"]
+        self.results["ort_sweep"] = {"rows": sweep["rows"], "best": best}
+        if best is None:
+            print(f"    FAILED: no session-option config ran")
+            self.results["kpi"]["tok_s"] = None
+            return
+
+        bench = sweep["best_benchmark"]
+        self.results["benchmark"] = bench
+        kpi = self.results["kpi"]
+        kpi["load_time_ms"] = best["load_ms"]
+        kpi["ttft_ms"] = bench["ttft_ms"]["p50"]
+        kpi["ttft_ms_p90"] = bench["ttft_ms"]["p90"]
+        kpi["prefill_tok_s"] = bench["prefill_tok_s"]["p50"]
+        kpi["tok_s"] = best["tok_s"]
+        print(f"    Best: {best['opt_level']}, {best['execution_mode']}, intra={best['intra_op']}, "
+              f"inter={best['inter_op']} -> {best['tok_s']:.2f} tok/s, TTFT {best['ttft_ms']:.2f} ms")
+        if bench["layout"] == "full_window":
+            print(f"    NOTE: No KV cache in this graph - each decode step re-runs the full sequence")
+
+        output = self.ort_output
+        if output is None and self.pte_path.lower().endswith(".onnx"):
+            output = os.path.splitext(self.pte_path)[0] + ".ort"
+        if output:
+            try:
+                saved = save_ort(self.pte_path, output, best)
+            except Exception as e:
+                print(f"    ORT format: FAILED ({e})")
+                return
+            self.results["ort_model"] = saved
+            kpi["ort_load_time_ms"] = saved["load_ms"]
+            print(f"    ORT format: {saved['output_path']} ({saved['size_bytes'] / (1024 ** 2):.2f} MB, "
+                  f"optimized at {saved['opt_level']}), load {saved['load_ms']:.2f} ms "
+                  f"vs {best['load_ms']:.2f} ms from .onnx")
+        print(f"    Status: PASS")
 
-            return True
+    def _test_thread_sweep(self):
+        """Prefill / decode rates per CPU set and thread count"""
+        from yi_tools.thread_sweep import print_sweep, run_sweep
+
+        print("\n[TEST 4b] Thread / CPU-Affinity Sweep")
+        self.manifest = self.manifest or self._load_manifest()
+        n_ctx = self.n_ctx or self.manifest.get("context_length", 512)
+        self.runner = None  # each sweep point creates its own runtime, pinned
+
+        sweep = run_sweep(
+            self.pte_path,
+            self.thread_counts,
+            prompt_tokens=self.prompt_tokens,
+            decode_tokens=self.decode_tokens,
+            warmup=min(self.warmup, 1),
+            repeats=self.repeats,
+            n_ctx=n_ctx,
+        )
+        self.results["thread_sweep"] = sweep
+        print_sweep(sweep)
+        print(f"    Status: {'PASS' if sweep['recommended']['decode'] else 'FAILED (no point ran)'}")
+
+    def update_manifest_presets(self, presets: list) -> list:
+        """Write the thread sweep's recommendation into recommended_presets"""
+        from yi_tools.thread_sweep import update_manifest
+
+        sweep = self.results.get("thread_sweep")
+        if not sweep or not sweep["recommended"]["decode"] or not self.manifest_path:
+            return []
+        return update_manifest(self.manifest_path, presets, sweep)
+
+    def _test_language_performance(self):
+        """Per-language TTFT / tok/s / prompt eval speed (manifest baseline schema)"""
+        print("\n[TEST 4/5] Inference Performance (per language)")
+        languages = self.languages or self.manifest.get("languages") or list(LANGUAGE_KEYS)
+        print(f"    Languages: {', '.join(languages)}; max new tokens: {self.decode_tokens}")
+        print(f"    Warmup: {self.warmup}, repeats: {self.repeats}")
 
+        try:
+            bench = self.runner.benchmark_languages(
+                languages,
+                max_new_tokens=self.decode_tokens,
+                warmup=self.warmup,
+                repeats=self.repeats,
+                mark=self.sampler.mark,
+            )
         except Exception as e:
             print(f"    FAILED: {e}")
             traceback.print_exc()
-            self.results["kpi"]["ttft_ms"] = None
+            self.results["kpi"]["tok_s"] = None
+            return
+
+        self.results["benchmark"] = bench
+        metrics = bench["metrics"]
+        self.results["baseline_metrics"] = metrics
+
+        print(f"    {'language':<10} {'ttft_ms':>10} {'tok/s':>10} {'prompt tok/s':>13} {'prompt':>7}")
+        for key, detail in bench["details"].items():
+            print(f"    {key:<10} {metrics['ttft_ms'][key] or 0:>10.1f} {metrics['tokens_per_second'][key] or 0:>10.1f} "
+                  f"{metrics['prompt_eval_speed'][key] or 0:>13.1f} {detail['prompt_tokens']:>7}")
+
+        # Gates use the worst language
+        ttfts = [v for v in metrics["ttft_ms"].values() if v is not None]
+        rates = [v for v in metrics["tokens_per_second"].values() if v is not None]
+        kpi = self.results["kpi"]
+        kpi["ttft_ms"] = max(ttfts) if ttfts else None
+        kpi["tok_s"] = min(rates) if rates else None
+        kpi["prompt_eval_speed"] = min(metrics["prompt_eval_speed"].values(), default=None)
+        print(f"    Status: PASS")
+
+    def _compare_baseline(self):
+        """Diff measured metrics against the manifest's baseline_metrics"""
+        baseline = self.manifest.get("baseline_metrics")
+        measured = self.results.get("baseline_metrics")
+        if not baseline or not measured:
+            print(f"\n    Baseline: none in manifest - comparison skipped")
+            return
+
+        comparison = compare_to_baseline(measured, baseline, self.baseline_tolerance)
+        comparison["manifest"] = self.manifest_path
+        self.results["baseline_comparison"] = comparison
+        print(f"\n    Baseline comparison ({self.manifest_path}, tolerance {self.baseline_tolerance:.0%}):")
+        print(f"    {'metric':<18} {'language':<10} {'baseline':>9} {'measured':>9} {'delta':>8}  status")
+        for row in comparison["rows"]:
+            delta = f"{row['delta_pct']:+.1f}%" if row["delta_pct"] is not None else "-"
+            print(f"    {row['metric']:<18} {row['language'] or '-':<10} {row['baseline'] if row['baseline'] is not None else '-':>9} "
+                  f"{row['measured'] if row['measured'] is not None else '-':>9} {delta:>8}  {row['status']}")
+
+    def update_manifest_baseline(self) -> bool:
+        """Write measured metrics into the manifest's baseline_metrics"""
+        measured = self.results.get("baseline_metrics")
+        if not measured or not self.manifest_path:
             return False
+        with open(self.manifest_path, "r") as f:
+            manifest = json.load(f)
+        # Merge per language so a partial --languages run keeps the others
+        baseline = manifest.get("baseline_metrics") or {}
+        for metric, value in measured.items():
+            if isinstance(value, dict) and isinstance(baseline.get(metric), dict):
+                baseline[metric] = {**baseline[metric], **value}
+            else:
+                baseline[metric] = value
+        manifest["baseline_metrics"] = baseline
+        with open(self.manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        return True
+
+    def _prompt_ids(self):
+        """Tokenized --prompt when a tokenizer.json is given, else None (synthetic ids)"""
+        if not (self.prompt and self.tokenizer_path):
+            return None
+        try:
+            from tokenizers import Tokenizer
+        except ImportError:
+            print(f"    Tokenizer: 'tokenizers' not installed - using synthetic prompt ids")
+            return None
+        return Tokenizer.from_file(self.tokenizer_path).encode(self.prompt).ids
 
     def _test_inference_performance(self):
-        """Test inference performance (tok/s)"""
+        """Time prefill (TTFT) and decode (tok/s) with warmup and repeats"""
         print("\n[TEST 4/5] Inference Performance")
-        print(f"    WARNING: Actual inference not implemented")
-        print(f"    Requires ExecuTorch runtime + tokenizer integration")
-
-        # Placeholder for actual inference
-        # In practice:
-        # 1. Prepare input tokens
-        # 2. Run model.forward() N times
-        # 3. Measure total time
-        # 4. Calculate tok/s = N / total_time
+        prompt_ids = self._prompt_ids()
+        print(f"    Prompt: {len(prompt_ids) if prompt_ids else self.prompt_tokens} tokens "
+              f"({'tokenized' if prompt_ids else 'synthetic'}), decode: {self.decode_tokens} tokens")
+        print(f"    Warmup: {self.warmup}, repeats: {self.repeats}")
 
-        # Simulated values (replace with actual benchmarks)
-        self.results["kpi"]["tok_s"] = None
-        self.results["kpi"]["decode_ms"] = None
-
-        print(f"    Status: SKIPPED (runtime integration pending)")
-        print(f"    Recommendation: Integrate ExecuTorch runtime for full benchmark")
+        try:
+            bench = self.runner.benchmark(
+                prompt_ids=prompt_ids,
+                prompt_tokens=self.prompt_tokens,
+                decode_tokens=self.decode_tokens,
+                warmup=self.warmup,
+                repeats=self.repeats,
+                mark=self.sampler.mark,
+            )
+        except Exception as e:
+            print(f"    FAILED: {e}")
+            traceback.print_exc()
+            self.results["kpi"]["tok_s"] = None
+            self.results["kpi"]["decode_ms"] = None
+            return
+
+        self.results["benchmark"] = bench
+        kpi = self.results["kpi"]
+        ttft, decode, token_ms = bench["ttft_ms"], bench["decode_tok_s"], bench["decode_token_ms"]
+
+        kpi["ttft_ms"] = ttft["p50"]
+        kpi["ttft_ms_p90"] = ttft["p90"]
+        kpi["ttft_ms_p99"] = ttft["p99"]
+        kpi["prefill_tok_s"] = bench["prefill_tok_s"]["p50"]
+        kpi["tok_s"] = decode["p50"] if decode else None
+        kpi["decode_ms"] = token_ms["p50"] if token_ms else None
+        kpi["decode_ms_p99"] = token_ms["p99"] if token_ms else None
+        # Program calls alone (no argmax / host overhead), one row per method
+        methods = bench.get("method_ms") or {}
+        for role in ("prefill", "decode"):
+            kpi[f"{role}_call_ms"] = methods[role]["p50"] if methods.get(role) else None
+
+        print(f"    {'':<16} {'p50':>10} {'p90':>10} {'p99':>10} {'stdev':>10} {'cv':>7}")
+        for label, summary in (("TTFT (ms)", ttft), ("prefill tok/s", bench["prefill_tok_s"]),
+                               ("decode tok/s", decode), ("per-token (ms)", token_ms),
+                               ("prefill call", methods.get("prefill")), ("decode call", methods.get("decode"))):
+            if summary:
+                cv = f"{summary['cv']:.1%}" if summary["cv"] is not None else "-"
+                print(f"    {label:<16} {summary['p50']:>10.2f} {summary['p90']:>10.2f} "
+                      f"{summary['p99']:>10.2f} {summary['stdev']:>10.2f} {cv:>7}")
+        if methods.get("prefill"):
+            print(f"    Methods: {methods['prefill']['method']} x{methods['prefill']['calls_per_run']} per prompt, "
+                  f"{methods['decode']['method'] if methods.get('decode') else '-'} per token (call ms)")
+        if bench["layout"] == "full_window":
+            print(f"    NOTE: No KV cache in this program - each decode step re-runs the full window")
+        elif bench["window"] == 1:
+            print(f"    NOTE: No prefill method - the prompt runs through the 1-token decode step")
+        if bench["prefill_padded"]:
+            print(f"    NOTE: Prefill padded to the exported width ({bench['window']} tokens)")
+        print(f"    Status: PASS")
 
     def _check_memory_peak(self):
-        """Check peak memory usage"""
+        """Stop the sampler and report native peaks (overall and per phase)"""
         print("\n[TEST 5/5] Memory Peak")
 
-        current, peak = tracemalloc.get_traced_memory()
-        tracemalloc.stop()
-
-        current_mb = current / (1024 ** 2)
-        peak_mb = peak / (1024 ** 2)
-
-        print(f"    Current: {current_mb:.2f} MB")
-        print(f"    Peak: {peak_mb:.2f} MB")
-
-        # Note: This only tracks Python memory, not native allocations
-        print(f"    NOTE: Python-only tracking (excludes native ExecuTorch allocations)")
-        print(f"    For accurate mem_peak, use platform-specific tools:")
+        report = self.sampler.stop()
+        self.results["memory"] = report
+        peaks = report["peaks"]
+
+        def mb(value):
+            return f"{value:.2f} MB" if value is not None else "N/A"
+
+        print(f"    Source: {report['source']} ({report['samples']} samples @ {report['interval_ms']:g} ms)")
+        print(f"    Peak RSS: {mb(peaks['rss_mb'])}  (kernel high-water mark: {mb(report['hwm_mb'])})")
+        print(f"    Peak PSS: {mb(peaks['pss_mb'])}")
+        print(f"    Peak anonymous: {mb(peaks['anon_mb'])}, file-backed (mmap'd weights + libraries): {mb(peaks['file_mb'])}")
+        if report["phase_peaks"]:
+            print(f"    {'phase':<10} {'rss':>10} {'pss':>10} {'anon':>10} {'file':>10}")
+            for phase, phase_peaks in report["phase_peaks"].items():
+                print(f"    {phase:<10} " + " ".join(
+                    f"{phase_peaks[f]:>10.1f}" if phase_peaks[f] is not None else f"{'-':>10}"
+                    for f in ("rss_mb", "pss_mb", "anon_mb", "file_mb")))
+        print(f"    Host-process numbers; on-device mem_peak still needs platform tools:")
         print(f"      - iOS: Xcode Instruments / Memory Graph")
         print(f"      - Android: Android Profiler / dumpsys meminfo")
 
-        self.results["kpi"]["mem_peak_mb_python"] = round(peak_mb, 2)
-        self.results["kpi"]["mem_peak_mb"] = None  # Requires native profiling
+        # Sampling can miss a spike between samples; the high-water mark cannot
+        candidates = [v for v in (peaks["rss_mb"], report["hwm_mb"]) if v is not None]
+        kpi = self.results["kpi"]
+        kpi["mem_peak_mb"] = round(max(candidates), 2) if candidates else None
+        kpi["mem_peak_pss_mb"] = peaks["pss_mb"]
+        kpi["mem_peak_anon_mb"] = peaks["anon_mb"]
+        kpi["mem_peak_file_mb"] = peaks["file_mb"]
 
     def _evaluate_gates(self):
         """Evaluate KPI gates"""
@@ -236,7 +604,15 @@ class KPISmokeTest:
             print(f"  mem_peak: {mem_peak:.2f} MB <= {MEM_THRESHOLD_MB} MB? {gates['mem_peak']}")
         else:
             gates["mem_peak"] = "UNKNOWN"
-            print(f"  mem_peak: N/A (requires native profiling)")
+            print(f"  mem_peak: N/A (no native memory source)")
+
+        # Baseline gate (GGUF): no metric regressed beyond tolerance
+        comparison = self.results.get("baseline_comparison")
+        if comparison:
+            gates["baseline"] = comparison["status"]
+            regressions = [r for r in comparison["rows"] if r["status"] == "REGRESSION"]
+            print(f"  baseline: {len(regressions)} regression(s) beyond {comparison['tolerance']:.0%}? "
+                  f"{gates['baseline']}")
 
         self.results["gates"] = gates
 
@@ -285,26 +661,183 @@ class KPISmokeTest:
             print(f"  - Integrate tokenizer for full inference test")
 
 
+def _backend_for(model_path: str) -> str:
+    ext = os.path.splitext(model_path.lower())[1]
+    if ext == ".gguf":
+        return "llama.cpp"
+    if ext in (".onnx", ".ort"):
+        return "onnxruntime"
+    return "executorch"
+
+
+def _ort_configs(args) -> list:
+    """Session-option grid from the --ort-* flags (defaults for anything unset)"""
+    from yi_tools.ort_runtime import sweep_configs
+
+    def split(value, cast=str):
+        return [cast(v) for v in value.split(",")] if value else None
+
+    return sweep_configs(
+        opt_levels=split(args.ort_levels),
+        intra_threads=split(args.ort_threads, int),
+        inter_threads=split(args.ort_inter_threads, int),
+        execution_modes=split(args.ort_modes),
+    )
+
+
+def run_self_test(args) -> dict:
+    """Export a tiny random-weight model and run the full harness on it"""
+    import tempfile
+
+    from yi_tools.pte_runtime import runtime_available
+
+    if not runtime_available():
+        print("Self-test requires torch + executorch (pip install executorch)")
+        sys.exit(2)
+    from yi_tools.tiny_model import export_tiny_pte
+
+    with tempfile.TemporaryDirectory(prefix="kpi_self_test_") as tmp:
+        info = export_tiny_pte(os.path.join(tmp, "tiny.pte"))
+        print(f"Self-test model: {info['size_bytes']:,} bytes, {info['backend']}, "
+              f"seq_len={info['seq_len']}, vocab={info['vocab_size']}")
+        tester = KPISmokeTest(
+            info["output_path"],
+            prompt_tokens=min(args.prompt_tokens, info["seq_len"] // 2),
+            decode_tokens=min(args.decode_tokens, info["seq_len"] // 2),
+            warmup=args.warmup,
+            repeats=args.repeats,
+            mem_interval_ms=args.mem_interval_ms,
+        )
+        results = tester.run_all_tests()
+
+    # Every gate must have evaluated a measured number
+    unknown = [gate for gate, status in results["gates"].items() if status == "UNKNOWN"]
+    if unknown or results["status"] != "PASS":
+        print(f"SELF-TEST FAILED: status={results['status']}, unmeasured gates: {unknown or 'none'}")
+        results["status"] = "FAIL"
+    else:
+        print("SELF-TEST PASSED: all gates evaluated measured values")
+    return results
+
+
 def main():
     parser = argparse.ArgumentParser(
-        description="Run KPI smoke tests on ExecuTorch PTE models"
+        description="Run KPI smoke tests on ExecuTorch PTE, llama.cpp GGUF and ONNX models"
     )
-    parser.add_argument("pte_file", help="Path to .pte file")
+    parser.add_argument("pte_file", nargs="?", help="Path to .pte, .gguf, .onnx or .ort file")
     parser.add_argument(
         "--tokenizer-path",
-        help="Path to tokenizer (optional)",
+        help="Path to tokenizer.json (optional, used with --prompt)",
         default=None
     )
+    parser.add_argument("--prompt", help="Prompt text to tokenize (default: synthetic token ids)")
+    parser.add_argument("--prompt-tokens", type=int, default=64, help="Synthetic prompt length (default: 64)")
+    parser.add_argument("--decode-tokens", type=int, default=32, help="Tokens generated per run (default: 32)")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed warmup runs (default: 2)")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs (default: 5)")
+    parser.add_argument(
+        "--manifest",
+        help="GGUF: manifest with baseline_metrics (default: manifest.json next to the model)"
+    )
+    parser.add_argument("--languages", help="GGUF: comma-separated language codes (default: manifest languages)")
+    parser.add_argument("--n-ctx", type=int, help="GGUF: context length (default: manifest context_length)")
+    parser.add_argument(
+        "--baseline-tolerance",
+        type=float,
+        default=0.10,
+        help="GGUF: allowed regression vs baseline_metrics (default: 0.10 = 10%%)"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="GGUF: write the measured metrics into the manifest's baseline_metrics"
+    )
+    parser.add_argument(
+        "--history",
+        nargs="?",
+        const="",
+        metavar="DB",
+        help="Append this run to the benchmark history (default DB: results/bench_history.sqlite)"
+    )
+    parser.add_argument("--history-label", help="Label stored with the history entry (e.g. baseline)")
+    parser.add_argument(
+        "--thread-sweep",
+        action="store_true",
+        help="Also sweep thread counts x CPU affinity (prefill and decode timed separately)"
+    )
+    parser.add_argument("--thread-counts", help="Thread sweep: comma-separated counts (default: 1,2,3,4,6,...)")
+    parser.add_argument(
+        "--update-presets",
+        nargs="?",
+        const="safe",
+        metavar="PRESETS",
+        help="Thread sweep: write recommended threads into these manifest presets (default: safe)"
+    )
+    parser.add_argument(
+        "--mem-interval-ms",
+        type=float,
+        default=DEFAULT_INTERVAL_MS,
+        help=f"Memory sampling interval (default: {DEFAULT_INTERVAL_MS:g} ms)"
+    )
+    parser.add_argument("--ort-levels", help="ONNX: graph optimization levels (default: disable,basic,extended,all)")
+    parser.add_argument("--ort-threads", help="ONNX: intra-op thread counts (default: 1,2,4,... up to CPU count)")
+    parser.add_argument("--ort-inter-threads", help="ONNX: inter-op thread counts for parallel mode (default: 1,2)")
+    parser.add_argument("--ort-modes", help="ONNX: execution modes (default: sequential,parallel)")
+    parser.add_argument("--ort-output", help="ONNX: ORT-format output path (default: <model>.ort)")
+    parser.add_argument("--no-ort-output", action="store_true", help="ONNX: do not save the optimized ORT model")
+    parser.add_argument("--no-sweep", action="store_true", help="ONNX: benchmark default session options only")
+    parser.add_argument(
+        "--self-test",
+        action="store_true",
+        help="Benchmark a tiny generated model (offline check of the harness)"
+    )
     parser.add_argument(
         "--json-output",
         help="Path to save JSON results (optional)"
     )
 
     args = parser.parse_args()
+    if not args.self_test and not args.pte_file:
+        parser.error("pte_file is required (or use --self-test)")
 
     # Run tests
-    tester = KPISmokeTest(args.pte_file, args.tokenizer_path)
-    results = tester.run_all_tests()
+    if args.self_test:
+        results = run_self_test(args)
+    else:
+        tester = KPISmokeTest(
+            args.pte_file,
+            args.tokenizer_path,
+            prompt=args.prompt,
+            prompt_tokens=args.prompt_tokens,
+            decode_tokens=args.decode_tokens,
+            warmup=args.warmup,
+            repeats=args.repeats,
+            manifest_path=args.manifest,
+            languages=args.languages.split(",") if args.languages else None,
+            n_ctx=args.n_ctx,
+            baseline_tolerance=args.baseline_tolerance,
+            ort_configs=_ort_configs(args) if _backend_for(args.pte_file) == "onnxruntime" else None,
+            ort_sweep=not args.no_sweep,
+            ort_output="" if args.no_ort_output else args.ort_output,
+            mem_interval_ms=args.mem_interval_ms,
+            thread_sweep=args.thread_sweep,
+            thread_counts=[int(n) for n in args.thread_counts.split(",")] if args.thread_counts else None,
+        )
+        results = tester.run_all_tests()
+        if args.update_presets:
+            written = tester.update_manifest_presets(args.update_presets.split(","))
+            if written:
+                print(f"\nThread presets ({', '.join(written)}) written to: {tester.manifest_path}")
+        if args.update_baseline and tester.update_manifest_baseline():
+            print(f"\nbaseline_metrics written to: {tester.manifest_path}")
+
+    if args.history is not None and results.get("benchmark"):
+        from yi_tools.bench_history import HistoryStore
+
+        store = HistoryStore(args.history or None)
+        run = store.record(results, None if args.self_test else args.pte_file, args.history_label)
+        store.close()
+        print(f"\nRecorded in benchmark history: run #{run} ({store.db_path})")
 
     # Save JSON output if requested
     if args.json_output:
@@ -0,0 +1,394 @@
+"""
+Batch Artifact Validation
+Validates many .pte/.onnx/.gguf artifacts in one invocation
+
+Guards, quantization coverage and hashing are fanned out across a process
+pool, so interpreter/import startup is paid once per worker instead of once
+per artifact and tool. One JSON line is streamed per artifact as soon as it
+finishes.
+
+Memory budget: each artifact is assigned an estimated resident cost
+(metadata parsing of mmap'd .pte/.gguf is small, hashing keeps a few blocks
+resident per thread, ONNX protobufs are parsed whole). Artifacts are only
+started while the in-flight total stays within --memory-budget-mb; an
+artifact larger than the whole budget runs alone.
+
+Checks per format:
+    .pte   guards (plans/delegates/segment spans), INT8 coverage from the
+           constant tables, tree hash + SHA256
+    .gguf  guards (header/tensor spans), bits-per-weight coverage, hashes
+    .onnx  onnx.checker + initializer dtype coverage (if onnx is installed),
+           hashes
+
+Usage:
+    python validate_batch.py <file or dir> [...] [--jobs N] [--memory-budget-mb MB]
+        [--output results.jsonl] [--checks guards,coverage,hash] [--min-size-mb 10]
+        [--exclude DIR]
+"""
+
+import sys
+import os
+import argparse
+import json
+import time
+from pathlib import Path
+
+from yi_tools.digest_cache import cached_hash_artifact
+from yi_tools.hashing import DEFAULT_BLOCK_SIZE, default_workers
+
+ARTIFACT_SUFFIXES = (".pte", ".onnx", ".gguf")
+ALL_CHECKS = ("guards", "coverage", "hash")
+SKIP_DIRS = {".git", "node_modules", "__pycache__", ".venv", "venv"}
+METADATA_COST_MB = 64  # parser + interpreter working set per worker
+QUANTIZED_MAX_BPW = 8.5  # GGUF Q8_0 and below count as quantized
+
+
+def discover_artifacts(inputs: list, exclude: tuple = ()) -> list:
+    """Expand files and directories (recursively) into artifact paths"""
+    skip = SKIP_DIRS | set(exclude)
+    found = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if d not in skip)
+                found.extend(str(Path(root) / f) for f in sorted(files) if f.endswith(ARTIFACT_SUFFIXES))
+        else:
+            found.append(str(path))
+    seen = set()
+    return [p for p in found if not (os.path.abspath(p) in seen or seen.add(os.path.abspath(p)))]
+
+
+def available_memory_mb() -> float:
+    """MemAvailable from /proc/meminfo, or None where unavailable"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def estimate_cost_mb(path: str, checks: tuple, hash_workers: int) -> float:
+    """Estimated peak resident memory of validating one artifact"""
+    size_mb = os.path.getsize(path) / (1024 ** 2) if os.path.exists(path) else 0
+    cost = METADATA_COST_MB
+    if "hash" in checks:
+        cost += min(size_mb, 2 * hash_workers * DEFAULT_BLOCK_SIZE / (1024 ** 2))
+    if path.endswith(".onnx") and ("guards" in checks or "coverage" in checks):
+        cost += size_mb  # the protobuf is parsed into memory
+    return cost
+
+
+def _pte_checks(path: str, checks: tuple, target_coverage: float, record: dict):
+    from yi_tools.pte import PTEFile
+    from yi_tools.quant_coverage import coverage_report, enumerate_constant_tensors
+
+    with PTEFile(path) as pte:
+        if "guards" in checks:
+            plans = pte.execution_plans()
+            problems = pte.validate_spans()
+            num_delegates = sum(len(plan["delegates"]) for plan in plans)
+            if not plans:
+                problems.append("zero execution plans")
+            if num_delegates == 0:
+                problems.append("zero delegates (no partitions lowered to a backend)")
+            record["guards"] = {
+                "status": "FAIL" if problems else "PASS",
+                "file_identifier": pte.identifier.decode("ascii", errors="replace"),
+                "execution_plans": [plan["name"] for plan in plans],
+                "num_delegates": num_delegates,
+                "backends": sorted({d["id"] for plan in plans for d in plan["delegates"]}),
+                "num_segments": len(pte.segments()),
+                "problems": problems,
+            }
+        if "coverage" in checks:
+            index = enumerate_constant_tensors(pte)
+            report = coverage_report(index["tensors"])
+            record["coverage"] = _coverage_block(
+                report["by_params"] if report["num_tensors"] else None,
+                target_coverage,
+                method="pte_constant_tables",
+                by_bytes=report["by_bytes"] if report["num_tensors"] else None,
+                num_tensors=report["num_tensors"],
+                by_dtype={k: v["params"] for k, v in report["by_dtype"].items()},
+                fp_leftovers=len(report["fp_leftovers"]),
+                unparsed_delegates=len(index["unparsed_delegates"]),
+            )
+
+
+def _gguf_checks(path: str, checks: tuple, target_coverage: float, record: dict):
+    from yi_tools.gguf import GGUFFile
+
+    with GGUFFile(path) as gguf:
+        if "guards" in checks:
+            problems = gguf.validate_spans()
+            if not gguf.tensors:
+                problems.append("zero tensors")
+            record["guards"] = {
+                "status": "FAIL" if problems else "PASS",
+                "version": gguf.version,
+                "architecture": gguf.architecture,
+                "tensor_count": len(gguf.tensors),
+                "problems": problems,
+            }
+        if "coverage" in checks:
+            summary = gguf.quantization_summary()
+            quantized = sum(
+                b["params"] for b in summary["by_type"].values()
+                if b["bpw"] is not None and b["bpw"] <= QUANTIZED_MAX_BPW
+            )
+            total = summary["total_params"]
+            record["coverage"] = _coverage_block(
+                quantized / total if total else None,
+                target_coverage,
+                method="gguf_tensor_types",
+                file_type=summary["file_type"],
+                effective_bpw=summary["effective_bpw"],
+                by_type={k: v["params"] for k, v in summary["by_type"].items()},
+            )
+
+
+def _onnx_checks(path: str, checks: tuple, target_coverage: float, record: dict):
+    try:
+        import onnx
+    except ImportError:
+        for check in ("guards", "coverage"):
+            if check in checks:
+                record[check] = {"status": "SKIPPED", "reason": "onnx not installed"}
+        return
+
+    if "guards" in checks:
+        problems = []
+        try:
+            # Path form handles >2 GB models and external data
+            onnx.checker.check_model(path)
+        except Exception as e:
+            problems.append(f"onnx.checker: {e}")
+        record["guards"] = {"status": "FAIL" if problems else "PASS", "problems": problems}
+
+    if "coverage" in checks:
+        model = onnx.load(path, load_external_data=False)
+        by_dtype = {}
+        for init in model.graph.initializer:
+            numel = 1
+            for dim in init.dims:
+                numel *= dim
+            name = onnx.TensorProto.DataType.Name(init.data_type).lower()
+            by_dtype[name] = by_dtype.get(name, 0) + numel
+        total = sum(by_dtype.values())
+        quantized = sum(n for dtype, n in by_dtype.items() if dtype in ("int8", "uint8", "int4", "uint4"))
+        record["coverage"] = _coverage_block(
+            quantized / total if total else None,
+            target_coverage,
+            method="onnx_initializers",
+            by_dtype=by_dtype,
+        )
+
+
+def _coverage_block(coverage, target_coverage: float, method: str, **details) -> dict:
+    if coverage is None:
+        status = "UNKNOWN"
+    else:
+        status = "PASS" if coverage >= target_coverage else "FAIL"
+    block = {"status": status, "method": method, "int8_coverage": coverage, "target": target_coverage}
+    block.update(details)
+    return block
+
+
+FORMAT_CHECKS = {".pte": _pte_checks, ".gguf": _gguf_checks, ".onnx": _onnx_checks}
+
+
+def validate_artifact(
+    path: str,
+    checks: tuple = ALL_CHECKS,
+    target_coverage: float = 0.9,
+    min_size_mb: float = 0.0,
+    hash_workers: int = 1,
+    full_sha256: bool = True,
+    use_cache: bool = True,
+) -> dict:
+    """
+    Validate one artifact (runs inside a pool worker)
+
+    Returns:
+        JSON-serialisable record with `status` PASS/FAIL/ERROR and one block
+        per check; never raises
+    """
+    start_time = time.perf_counter()
+    suffix = Path(path).suffix.lower()
+    record = {"path": path, "format": suffix.lstrip("."), "status": "PASS"}
+    try:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"artifact not found: {path}")
+        size_bytes = os.path.getsize(path)
+        record["size_bytes"] = size_bytes
+        record["size_mb"] = round(size_bytes / (1024 ** 2), 2)
+        if size_bytes == 0 or size_bytes < min_size_mb * 1024 * 1024:
+            record["status"] = "FAIL"
+            record["problems"] = [f"size {size_bytes:,} bytes below minimum of {min_size_mb} MB"]
+
+        if suffix not in FORMAT_CHECKS:
+            raise ValueError(f"unsupported artifact type: {suffix or path}")
+        if size_bytes and {"guards", "coverage"} & set(checks):
+            FORMAT_CHECKS[suffix](path, checks, target_coverage, record)
+
+        if "hash" in checks:
+            digest = cached_hash_artifact(path, workers=hash_workers, full_sha256=full_sha256, use_cache=use_cache)
+            record["sha256"] = digest["sha256"]
+            record["tree_hash"] = {k: v for k, v in digest["tree_hash"].items() if k != "blocks"}
+            record["cache_status"] = digest["cache_status"]
+
+        if any(record.get(check, {}).get("status") == "FAIL" for check in ("guards", "coverage")):
+            record["status"] = "FAIL"
+    except Exception as e:
+        record["status"] = "ERROR"
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+    return record
+
+
+def run_batch(
+    paths: list,
+    out,
+    jobs: int = None,
+    memory_budget_mb: float = None,
+    **options,
+) -> list:
+    """
+    Validate `paths` on a process pool, writing one JSON line per artifact to
+    `out` in completion order
+
+    Returns:
+        List of records in input order
+    """
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    checks = options.get("checks", ALL_CHECKS)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(paths) or 1))
+    options.setdefault("hash_workers", max(1, default_workers() // jobs))
+    if memory_budget_mb is None:
+        available = available_memory_mb()
+        memory_budget_mb = available * 0.5 if available else 4096
+
+    # Largest first, so big artifacts don't straggle at the end
+    costs = {p: estimate_cost_mb(p, checks, options["hash_workers"]) for p in paths}
+    pending = sorted(range(len(paths)), key=lambda i: -costs[paths[i]])
+    results = [None] * len(paths)
+    in_flight = {}
+    in_flight_mb = 0.0
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while pending or in_flight:
+            # Admit work while it fits the budget; an oversized artifact runs alone
+            i = 0
+            while i < len(pending) and len(in_flight) < jobs:
+                cost = costs[paths[pending[i]]]
+                if in_flight and in_flight_mb + cost > memory_budget_mb:
+                    i += 1
+                    continue
+                index = pending.pop(i)
+                future = pool.submit(validate_artifact, paths[index], **options)
+                in_flight[future] = (index, cost)
+                in_flight_mb += cost
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, cost = in_flight.pop(future)
+                in_flight_mb -= cost
+                record = future.result()
+                record["index"] = index
+                results[index] = record
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Validate many .pte/.onnx/.gguf artifacts in parallel (JSONL output)"
+    )
+    parser.add_argument("inputs", nargs="+", help="Artifact files and/or directories to search")
+    parser.add_argument("--jobs", "-j", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=float,
+        help="Estimated resident memory allowed in flight (default: half of MemAvailable)"
+    )
+    parser.add_argument("--output", "-o", help="JSONL output file (default: stdout)")
+    parser.add_argument(
+        "--checks",
+        default=",".join(ALL_CHECKS),
+        help=f"Comma-separated subset of {','.join(ALL_CHECKS)} (default: all)"
+    )
+    parser.add_argument(
+        "--target-coverage",
+        type=float,
+        default=0.9,
+        help="Target INT8 coverage ratio (default: 0.9 = 90%%)"
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="DIR",
+        help="Directory name to skip while searching (repeatable)"
+    )
+    parser.add_argument("--min-size-mb", type=float, default=0.0, help="Fail artifacts smaller than this")
+    parser.add_argument("--tree-only", action="store_true", help="Skip the full-file SHA256 (tree hash only)")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the persistent digest cache")
+    args = parser.parse_args()
+
+    checks = tuple(c.strip() for c in args.checks.split(",") if c.strip())
+    unknown = set(checks) - set(ALL_CHECKS)
+    if unknown:
+        parser.error(f"unknown checks: {', '.join(sorted(unknown))}")
+
+    paths = discover_artifacts(args.inputs, args.exclude)
+    if not paths:
+        print(f"ERROR: no {'/'.join(ARTIFACT_SUFFIXES)} artifacts found", file=sys.stderr)
+        sys.exit(2)
+
+    start_time = time.perf_counter()
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        results = run_batch(
+            paths,
+            out,
+            jobs=args.jobs,
+            memory_budget_mb=args.memory_budget_mb,
+            checks=checks,
+            target_coverage=args.target_coverage,
+            min_size_mb=args.min_size_mb,
+            full_sha256=not args.tree_only,
+            use_cache=not args.no_cache,
+        )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start_time
+
+    # Human summary on stderr, so stdout stays pure JSONL
+    print("=" * 70, file=sys.stderr)
+    print(f"BATCH VALIDATION: {len(results)} artifacts in {elapsed:.1f} s", file=sys.stderr)
+    print("=" * 70, file=sys.stderr)
+    for record in results:
+        problems = record.get("problems", []) + record.get("guards", {}).get("problems", [])
+        coverage = record.get("coverage", {}).get("int8_coverage")
+        if record.get("coverage", {}).get("status") == "FAIL":
+            problems.append(f"coverage below {args.target_coverage:.0%}")
+        detail = record.get("error") or "; ".join(problems)
+        coverage_text = f"{coverage:7.1%}" if coverage is not None else "      -"
+        print(f"  {record['status']:<5} {record.get('size_mb', 0):>10.1f} MB  int8 {coverage_text}  "
+              f"{record['path']}{'  (' + detail + ')' if detail else ''}", file=sys.stderr)
+
+    statuses = {record["status"] for record in results}
+    if "ERROR" in statuses:
+        sys.exit(3)
+    sys.exit(1 if "FAIL" in statuses else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,9 @@ Validates ExecuTorch .pte files for critical structural issues
 
 CRITICAL GUARDS:
 1. Non-empty file (size > 0 bytes)
-2. Non-empty buffer (readable binary data)
-3. Non-zero partitions (executable programs)
+2. Non-empty buffer (readable binary data, memory-mapped)
+3. Non-zero partitions: >=1 execution plan and >=1 backend delegate, with an
+   in-bounds segment table (parsed from the program flatbuffer, zero-copy)
 
 Usage:
     python validate_pte_guards.py <path_to_pte_file>
@@ -13,7 +14,9 @@ Usage:
 
 import sys
 import os
-from pathlib import Path
+import time
+
+from yi_tools.pte import PTEFile, PTEFormatError
 
 
 def validate_pte(pte_path: str) -> bool:
@@ -30,6 +33,7 @@ def validate_pte(pte_path: str) -> bool:
         FileNotFoundError: If PTE file does not exist
         AssertionError: If any critical guard fails
     """
+    start_time = time.perf_counter()
     print("="*70)
     print(f"PTE GUARD VALIDATION")
     print(f"File: {pte_path}")
@@ -55,112 +59,100 @@ def validate_pte(pte_path: str) -> bool:
     print(f"    Status: PASS")
     print(f"    Size: {size_bytes:,} bytes ({size_mb:.2f} MB, {size_gb:.3f} GB)")
 
-    # GUARD 2: Readable buffer (basic binary validation)
-    print(f"\n[GUARD 2] Buffer Readability")
+    # GUARD 2: Readable buffer (memory-mapped, nothing copied)
+    print(f"\n[GUARD 2] Buffer Readability (mmap)")
     try:
-        with open(pte_path, "rb") as f:
-            buffer = f.read()
-
-        if not isinstance(buffer, (bytes, bytearray)):
-            raise AssertionError(f"Invalid buffer type: {type(buffer)}")
-
-        if len(buffer) == 0:
-            raise AssertionError("CRITICAL FAILURE: Empty buffer (0 bytes read)")
+        pte = PTEFile(pte_path)
+    except PTEFormatError as e:
+        raise AssertionError(f"CRITICAL FAILURE: Not a valid ExecuTorch program - {e}")
+    except Exception as e:
+        raise AssertionError(f"CRITICAL FAILURE: Cannot map buffer - {e}")
 
-        if len(buffer) != size_bytes:
+    with pte:
+        if len(pte.buf) != size_bytes:
             raise AssertionError(
-                f"Buffer size mismatch: expected {size_bytes:,}, got {len(buffer):,}"
+                f"Buffer size mismatch: expected {size_bytes:,}, got {len(pte.buf):,}"
             )
 
         print(f"    Status: PASS")
-        print(f"    Buffer Type: {type(buffer).__name__}")
-        print(f"    Buffer Length: {len(buffer):,} bytes")
+        print(f"    Buffer Type: mmap (read-only)")
+        print(f"    Buffer Length: {len(pte.buf):,} bytes")
 
         # Display first 32 bytes as hex (header inspection)
-        header_hex = buffer[:32].hex()
+        header_hex = pte.buf[:32].hex()
         print(f"    Header (hex): {header_hex[:64]}...")
 
-    except Exception as e:
-        raise AssertionError(f"CRITICAL FAILURE: Cannot read buffer - {e}")
+        # GUARD 3: Partition validation (ExecuTorch program flatbuffer)
+        print(f"\n[GUARD 3] Partition/Program Validation")
+        print(f"    Method: Program flatbuffer parse (zero-copy)")
+        print(f"    File identifier: {pte.identifier.decode('ascii', errors='replace')}")
 
-    # GUARD 3: Partition validation (ExecuTorch-specific)
-    print(f"\n[GUARD 3] Partition/Program Validation")
+        if pte.header:
+            print(f"    Extended header: {pte.header['magic']} "
+                  f"(program_size={pte.header['program_size']:,}, "
+                  f"segment_base_offset={pte.header['segment_base_offset']:,})")
+        else:
+            print(f"    Extended header: NONE (legacy program, no segments)")
 
-    # Try to validate using ExecuTorch if available
-    partition_validated = False
-    try:
-        # Attempt to import ExecuTorch components
         try:
-            from executorch.exir import EdgeProgramManager
-            executorch_available = True
-        except ImportError:
-            # Fallback: Try alternative import paths
-            try:
-                from executorch.sdk import BundledProgram
-                executorch_available = True
-            except ImportError:
-                executorch_available = False
-
-        if executorch_available:
-            # Method 1: Try EdgeProgramManager
-            try:
-                # Load PTE using ExecuTorch SDK
-                # Note: Actual API may vary - this is a placeholder for the correct method
-                print(f"    Method: ExecuTorch SDK validation (attempting)")
-
-                # Placeholder for actual ExecuTorch loading
-                # In practice, you would use:
-                # program = EdgeProgramManager.from_pte(pte_path)
-                # num_programs = len(program.programs)
-
-                # For now, we'll use heuristic validation
-                print(f"    Status: SKIPPED (ExecuTorch SDK not fully integrated)")
-                print(f"    Fallback: Using heuristic validation")
-
-            except Exception as e:
-                print(f"    ExecuTorch validation failed: {e}")
-                print(f"    Fallback: Using heuristic validation")
+            plans = pte.execution_plans()
+            segments = pte.segments()
+            span_problems = pte.validate_spans()
+        except ValueError as e:
+            raise AssertionError(f"CRITICAL FAILURE: Corrupt program table - {e}")
+
+        num_delegates = sum(len(plan["delegates"]) for plan in plans)
+        delegate_bytes = sum(d["size"] for plan in plans for d in plan["delegates"])
+
+        print(f"    Execution plans: {len(plans)}")
+        for plan in plans:
+            backends = sorted({d["id"] for d in plan["delegates"]})
+            print(f"      - {plan['name'] or '<unnamed>'}: {plan['num_values']} values, "
+                  f"{len(plan['operators'])} operators, {len(plan['delegates'])} delegates "
+                  f"{backends if backends else ''}")
+        print(f"    Delegates: {num_delegates} ({delegate_bytes / (1024 ** 2):.2f} MB of blobs)")
+        print(f"    Segments: {len(segments)}")
+
+        if len(plans) == 0:
+            raise AssertionError("CRITICAL FAILURE: Zero execution plans in program")
+        if num_delegates == 0:
+            raise AssertionError(
+                "CRITICAL FAILURE: Zero delegates (no partitions lowered to a backend)"
+            )
+        if span_problems:
+            raise AssertionError(
+                "CRITICAL FAILURE: Segment table out of bounds (truncated file?) - "
+                + "; ".join(span_problems)
+            )
+
+        # HEURISTIC VALIDATION: Basic structural checks
+        print(f"\n    Heuristic Checks:")
+
+        # Check 1: File size should be substantial for a 1B model
+        MIN_EXPECTED_SIZE_MB = 100  # 1B INT8 model should be at least ~100MB
+        if size_mb < MIN_EXPECTED_SIZE_MB:
+            print(f"    WARNING: File size ({size_mb:.2f} MB) is suspiciously small")
+            print(f"             Expected >={MIN_EXPECTED_SIZE_MB} MB for 1B INT8 model")
         else:
-            print(f"    ExecuTorch SDK: NOT AVAILABLE")
-            print(f"    Method: Heuristic validation")
+            print(f"    Size check: PASS ({size_mb:.2f} MB >= {MIN_EXPECTED_SIZE_MB} MB)")
 
-    except Exception as e:
-        print(f"    Partition check error: {e}")
-
-    # HEURISTIC VALIDATION: Basic structural checks
-    print(f"\n    Heuristic Checks:")
-
-    # Check 1: File size should be substantial for a 1B model
-    MIN_EXPECTED_SIZE_MB = 100  # 1B INT8 model should be at least ~100MB
-    if size_mb < MIN_EXPECTED_SIZE_MB:
-        print(f"    WARNING: File size ({size_mb:.2f} MB) is suspiciously small")
-        print(f"             Expected >={MIN_EXPECTED_SIZE_MB} MB for 1B INT8 model")
-    else:
-        print(f"    Size check: PASS ({size_mb:.2f} MB >= {MIN_EXPECTED_SIZE_MB} MB)")
-
-    # Check 2: Binary format markers (ExecuTorch PTE format)
-    # ExecuTorch PTE files typically have specific magic bytes or headers
-    # This is a placeholder - actual format depends on ExecuTorch version
-    header_first_4 = buffer[:4]
-    print(f"    Magic bytes (first 4): {header_first_4.hex()}")
-
-    # Check 3: Non-zero entropy (indicates actual data, not padding)
-    # Calculate simple entropy: count unique bytes in first 1KB
-    sample_size = min(1024, len(buffer))
-    unique_bytes = len(set(buffer[:sample_size]))
-    entropy_ratio = unique_bytes / 256.0  # Ratio of unique bytes to max possible (256)
-
-    print(f"    Entropy check (first {sample_size} bytes):")
-    print(f"      Unique bytes: {unique_bytes}/256")
-    print(f"      Entropy ratio: {entropy_ratio:.2%}")
-
-    if entropy_ratio < 0.1:
-        print(f"      WARNING: Low entropy - file may be mostly padding/zeros")
-    else:
-        print(f"      Status: PASS (sufficient data diversity)")
-
-    partition_validated = True
-    print(f"\n    Overall Status: PASS (heuristic validation)")
+        # Check 2: Non-zero entropy (indicates actual data, not padding)
+        # Calculate simple entropy: count unique bytes in first 1KB
+        sample_size = min(1024, len(pte.buf))
+        unique_bytes = len(set(pte.buf[:sample_size]))
+        entropy_ratio = unique_bytes / 256.0  # Ratio of unique bytes to max possible (256)
+
+        print(f"    Entropy check (first {sample_size} bytes):")
+        print(f"      Unique bytes: {unique_bytes}/256")
+        print(f"      Entropy ratio: {entropy_ratio:.2%}")
+
+        if entropy_ratio < 0.1:
+            print(f"      WARNING: Low entropy - file may be mostly padding/zeros")
+        else:
+            print(f"      Status: PASS (sufficient data diversity)")
+
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    print(f"\n    Overall Status: PASS ({elapsed_ms:.1f} ms)")
 
     # SUMMARY
     print("\n" + "="*70)
@@ -168,8 +160,8 @@ def validate_pte(pte_path: str) -> bool:
     print("="*70)
     print(f"  [PASS] File exists: {pte_path}")
     print(f"  [PASS] File size: {size_mb:.2f} MB ({size_gb:.3f} GB)")
-    print(f"  [PASS] Buffer readable: {len(buffer):,} bytes")
-    print(f"  [PASS] Structural validation: Heuristic checks passed")
+    print(f"  [PASS] Buffer readable: {size_bytes:,} bytes (mmap)")
+    print(f"  [PASS] Program: {len(plans)} execution plan(s), {num_delegates} delegate(s)")
     print("="*70)
     print("\nALL GUARDS PASSED\n")
 
@@ -194,7 +186,7 @@ def main():
         print("  Validates ExecuTorch .pte files for critical structural issues:")
         print("  - Non-empty file (size > 0 bytes)")
         print("  - Non-empty buffer (readable binary data)")
-        print("  - Non-zero partitions (executable programs)")
+        print("  - Non-zero partitions (>=1 execution plan, >=1 backend delegate)")
         sys.exit(0)
 
     try:
@@ -4,29 +4,44 @@ Validates .pte file integrity, size, and quantization
 """
 
 import argparse
-import hashlib
 import json
 import os
 from pathlib import Path
 
+from yi_tools.digest_cache import DigestCache, cached_hash_artifact
+from yi_tools.hashing import DEFAULT_BLOCK_SIZE, diff_blocks, sha256_file
 
-def calculate_sha256(file_path: str, chunk_size: int = 8192) -> str:
-    """Calculate SHA256 hash of file"""
-    sha256 = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        while chunk := f.read(chunk_size):
-            sha256.update(chunk)
-    return sha256.hexdigest()
 
+def calculate_sha256(file_path: str) -> str:
+    """Calculate classic whole-file SHA256 hash of file"""
+    return sha256_file(file_path)
 
-def verify_pte(pte_path: str, manifest_path: str = None, max_size_gb: float = None):
+
+def verify_pte(
+    pte_path: str,
+    manifest_path: str = None,
+    max_size_gb: float = None,
+    full_sha256: bool = False,
+    workers: int = None,
+    update_manifest: bool = False,
+    use_cache: bool = True,
+    reverify_every: int = None,
+):
     """
     Verify PTE file against manifest and size constraints
 
+    When the manifest carries a `tree_hash`, the parallel block tree is
+    verified and the serial whole-file SHA256 is skipped unless requested.
+
     Args:
         pte_path: Path to .pte file
         manifest_path: Path to manifest.json (optional)
         max_size_gb: Maximum allowed size in GB (optional)
+        full_sha256: Always compute the classic whole-file SHA256
+        workers: Hashing thread count (default: one per core)
+        update_manifest: Record tree_hash (and sha256) into the manifest
+        use_cache: Consult the persistent digest cache (yi_tools.digest_cache)
+        reverify_every: Re-hash a cached file every N-th hit (default 10)
     """
     if not os.path.exists(pte_path):
         print(f"❌ ERROR: PTE file not found: {pte_path}")
@@ -51,23 +66,59 @@ def verify_pte(pte_path: str, manifest_path: str = None, max_size_gb: float = No
         else:
             print(f"    ✅ PASSED: Within {max_size_gb} GB limit")
 
-    # 2. SHA256 checksum
+    # 2. SHA256 checksum (block tree + optional whole-file)
+    manifest = None
+    if manifest_path and os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+
+    manifest_tree = (manifest or {}).get("tree_hash")
+    block_size = manifest_tree["block_size"] if manifest_tree else DEFAULT_BLOCK_SIZE
+    need_full = full_sha256 or update_manifest or not manifest_tree
+
     print(f"\n[2] SHA256 Hash:")
-    sha256_hash = calculate_sha256(pte_path)
-    print(f"    {sha256_hash}")
+    digest = cached_hash_artifact(
+        pte_path,
+        block_size=block_size,
+        workers=workers,
+        full_sha256=need_full,
+        cache=DigestCache(reverify_every=reverify_every) if use_cache else None,
+        use_cache=use_cache,
+    )
+    sha256_hash = digest["sha256"]
+    tree_hash = digest["tree_hash"]
+    if sha256_hash:
+        print(f"    {sha256_hash}")
+    else:
+        print(f"    (whole-file SHA256 skipped; verifying block tree)")
+    if digest["cache_status"] == "bitrot":
+        print(f"    ⚠️  Cached digest disagrees with file contents (possible bit rot)")
+    print(f"    Digest cache: {digest['cache_status']}")
+    print(f"    Tree root: {tree_hash['root']} ({len(tree_hash['blocks'])} x {block_size // (1024 ** 2)} MiB blocks)")
 
     # 3. Manifest verification
     if manifest_path:
-        if not os.path.exists(manifest_path):
+        if manifest is None:
             print(f"\n[3] Manifest: ⚠️  File not found: {manifest_path}")
         else:
             print(f"\n[3] Manifest Verification:")
-            with open(manifest_path, "r") as f:
-                manifest = json.load(f)
 
-            # Check SHA256
+            # Check tree root (parallel) first, then whole-file SHA256
+            if manifest_tree:
+                if manifest_tree.get("root") == tree_hash["root"]:
+                    print(f"    ✅ Tree root matches manifest")
+                else:
+                    bad = diff_blocks(manifest_tree.get("blocks", []), tree_hash["blocks"])
+                    print(f"    ❌ Tree root mismatch!")
+                    print(f"       Expected: {manifest_tree.get('root')}")
+                    print(f"       Actual:   {tree_hash['root']}")
+                    print(f"       Corrupt blocks: {bad[:16]}{' ...' if len(bad) > 16 else ''}")
+                    return False
+
             manifest_sha = manifest.get("sha256", "")
-            if manifest_sha == sha256_hash:
+            if sha256_hash is None:
+                pass
+            elif manifest_sha == sha256_hash:
                 print(f"    ✅ SHA256 matches manifest")
             else:
                 print(f"    ❌ SHA256 mismatch!")
@@ -76,7 +127,11 @@ def verify_pte(pte_path: str, manifest_path: str = None, max_size_gb: float = No
                 return False
 
             # Check size
-            manifest_size = manifest.get("pte_size_bytes", 0)
+            # .pte manifests use pte_size_bytes; GGUF/ONNX manifests use file_size_bytes/size_bytes
+            manifest_size = next(
+                (manifest[k] for k in ("pte_size_bytes", "file_size_bytes", "size_bytes") if k in manifest),
+                0,
+            )
             if manifest_size == file_size_bytes:
                 print(f"    ✅ Size matches manifest ({manifest_size:,} bytes)")
             else:
@@ -90,6 +145,12 @@ def verify_pte(pte_path: str, manifest_path: str = None, max_size_gb: float = No
             print(f"    Quant: {manifest.get('quantization', 'N/A')}")
             print(f"    Seq:   {manifest.get('sequence_length', 'N/A')}")
 
+            if update_manifest and not manifest_tree:
+                manifest["tree_hash"] = tree_hash
+                with open(manifest_path, "w") as f:
+                    json.dump(manifest, f, indent=2)
+                print(f"    Recorded tree_hash in manifest")
+
     # 4. Basic binary structure check
     print(f"\n[4] Binary Structure:")
     with open(pte_path, "rb") as f:
@@ -115,6 +176,14 @@ def main():
     parser.add_argument("pte_file", help="Path to .pte file")
     parser.add_argument("--manifest", help="Path to manifest.json", default=None)
     parser.add_argument("--max-size-gb", type=float, help="Maximum size in GB", default=None)
+    parser.add_argument("--full-sha256", action="store_true",
+                        help="Always compute the whole-file SHA256 (even if manifest has tree_hash)")
+    parser.add_argument("--workers", type=int, help="Hashing threads (default: one per core)", default=None)
+    parser.add_argument("--update-manifest", action="store_true",
+                        help="Record tree_hash into a manifest that lacks one")
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the persistent digest cache")
+    parser.add_argument("--reverify-every", type=int, default=None,
+                        help="Re-hash a cached file every N-th run to catch bit rot (default: 10)")
 
     args = parser.parse_args()
 
@@ -126,7 +195,16 @@ def main():
             args.manifest = str(candidate)
             print(f"Auto-detected manifest: {args.manifest}\n")
 
-    success = verify_pte(args.pte_file, args.manifest, args.max_size_gb)
+    success = verify_pte(
+        args.pte_file,
+        args.manifest,
+        args.max_size_gb,
+        full_sha256=args.full_sha256,
+        workers=args.workers,
+        update_manifest=args.update_manifest,
+        use_cache=not args.no_cache,
+        reverify_every=args.reverify_every,
+    )
 
     exit(0 if success else 1)
 
@@ -0,0 +1,4 @@
+"""
+YI model-artifact tooling
+Shared helpers used by the validators in tools/ and the exporters in models/
+"""
@@ -0,0 +1,3 @@
+from yi_tools.cli import main
+
+main()
@@ -0,0 +1,356 @@
+"""
+Admission Formula Calibration
+Fits required RAM = size_mb * multiplier + overhead_mb + kv_mb_per_token * ctx
+
+The rule `free_ram_MB >= size_mb * 1.6 + 600` (app/admission/android.kt,
+ios.swift, the Qwen manifest, verify_gguf.py and the ONNX exporters) was
+never measured. This tool loads every artifact at every preset's context
+length in a fresh child process (yi_tools.ctx_scaling, fill 100%, so the
+prompt plus max_new reaches ctx) and records native peak RSS. It then fits,
+per runtime, peak_MB = size_mb * multiplier + overhead_mb + kv_mb_per_token * ctx:
+
+- with two or more artifact sizes, all three terms are fitted jointly by
+  least squares on peak RSS
+- with one size, the multiplier is the RSS added by loading the model
+  (after the runtime is imported), extrapolated to ctx 0 across presets,
+  per MB of file; kv_mb_per_token is then the slope of the remaining peak
+  against ctx (KV cache, attention scratch, logits)
+- overhead_mb is raised so no measured point is under-predicted, plus
+  --headroom-mb for the app and allocator slack
+
+The interpreter's own RSS is excluded, so overhead_mb is the runtime's cost
+on top of the host app. The coefficients go under the manifest's
+`admission.runtimes.<runtime>` and replace `admission_formula`; callers
+without calibration fall back to LEGACY.
+
+Usage:
+    python -m yi_tools calibrate model.gguf [other.gguf model.onnx ...]
+        [--manifest manifest.json] [--preset full --preset safe] [--headroom-mb 300]
+        [--update-manifest] [--json-output out.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+from yi_tools.presets import PRESETS, get_preset
+
+# The uncalibrated rule (free_ram_MB >= size_mb * 1.6 + 600)
+LEGACY = {"multiplier": 1.6, "overhead_mb": 600.0, "kv_mb_per_token": 0.0}
+
+DEFAULT_HEADROOM_MB = 0.0
+
+
+def runtime_for(path: str) -> str:
+    ext = os.path.splitext(path.lower())[1]
+    return {".gguf": "llama.cpp", ".onnx": "onnxruntime", ".ort": "onnxruntime"}.get(ext, "executorch")
+
+
+def artifact_size_mb(path: str) -> float:
+    """File size in MB, including an ONNX external-data sidecar"""
+    size = os.path.getsize(path)
+    sidecar = path + ".data"
+    if path.lower().endswith(".onnx") and os.path.exists(sidecar):
+        size += os.path.getsize(sidecar)
+    return size / (1024 ** 2)
+
+
+def coefficients_for(manifest: dict, runtime: str) -> dict:
+    """Calibrated coefficients for `runtime` from a manifest, else LEGACY"""
+    calibrated = ((manifest or {}).get("admission") or {}).get("runtimes", {}).get(runtime)
+    if not calibrated:
+        return dict(LEGACY)
+    return {key: calibrated[key] for key in LEGACY}
+
+
+def previous_admission(manifest_path) -> dict:
+    """`admission` block of an existing manifest (kept when exporters rewrite it), or None"""
+    try:
+        with open(manifest_path, "r") as f:
+            return json.load(f).get("admission")
+    except (OSError, ValueError):
+        return None
+
+
+def required_ram_mb(size_mb: float, ctx: int = 0, coefficients: dict = None) -> int:
+    """Free RAM (MB) needed to load a `size_mb` artifact and run `ctx` tokens"""
+    c = coefficients or LEGACY
+    return round(size_mb * c["multiplier"] + c["overhead_mb"] + c["kv_mb_per_token"] * (ctx or 0))
+
+
+def formula_text(coefficients: dict) -> str:
+    c = coefficients
+    text = f"free_ram_MB >= size_mb * {c['multiplier']:g} + {c['overhead_mb']:g}"
+    if c["kv_mb_per_token"]:
+        text += f" + ctx * {c['kv_mb_per_token']:g}"
+    return text
+
+
+def _linear_fit(xs: list, ys: list) -> tuple:
+    """Least-squares (intercept, slope); slope 0 when x does not vary"""
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if not var_x:
+        return mean_y, 0.0
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var_x
+    return mean_y - slope * mean_x, slope
+
+
+def _solve_normal(rows: list, ys: list) -> list:
+    """Least squares via the normal equations (Gaussian elimination); None if singular"""
+    n = len(rows[0])
+    a = [[sum(r[i] * r[j] for r in rows) for j in range(n)] + [sum(r[i] * y for r, y in zip(rows, ys))]
+         for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda i: abs(a[i][col]))
+        if abs(a[pivot][col]) < 1e-9:
+            return None
+        a[col], a[pivot] = a[pivot], a[col]
+        for i in range(n):
+            if i != col:
+                factor = a[i][col] / a[col][col]
+                a[i] = [x - factor * y for x, y in zip(a[i], a[col])]
+    return [a[i][n] / a[i][i] for i in range(n)]
+
+
+def _load_ratio(points: list) -> float:
+    """Median load cost at ctx 0 per MB of artifact"""
+    # llama.cpp allocates the KV cache at load: extrapolate each artifact's
+    # load cost to ctx 0 so the multiplier does not absorb the per-token term
+    ratios = []
+    for artifact in dict.fromkeys(p["artifact"] for p in points):
+        at = [p for p in points if p["artifact"] == artifact]
+        load_at_zero, _ = _linear_fit([p["ctx"] for p in at], [p["load_mb"] for p in at])
+        if at[0]["size_mb"] > 0:
+            ratios.append(max(0.0, load_at_zero) / at[0]["size_mb"])
+    return statistics.median(ratios) if ratios else 1.0
+
+
+def fit(points: list, headroom_mb: float = DEFAULT_HEADROOM_MB) -> dict:
+    """
+    Fit one runtime's coefficients
+
+    Args:
+        points: [{artifact, size_mb, ctx, load_mb, peak_mb}]; load_mb is
+            measured above the imported runtime, peak_mb above the
+            pre-runtime baseline
+
+    With two or more artifact sizes the three terms are fitted jointly on
+    peak RSS; with one size the multiplier comes from the load cost.
+
+    Returns:
+        Dict with method, multiplier, overhead_mb, kv_mb_per_token, fitted_overhead_mb,
+        r2, max_residual_mb and the points with predictions
+    """
+    method = "least_squares"
+    coefficients = None
+    if len({p["size_mb"] for p in points}) >= 2 and len({p["ctx"] for p in points}) >= 2:
+        coefficients = _solve_normal(
+            [[p["size_mb"], p["ctx"], 1.0] for p in points], [p["peak_mb"] for p in points]
+        )
+    if coefficients and coefficients[0] >= 0 and coefficients[1] >= 0:
+        multiplier, slope, intercept = coefficients
+    else:
+        # One artifact size (or a non-physical joint fit): take the
+        # multiplier from the load cost, then fit ctx on what remains
+        method = "load_ratio"
+        multiplier = _load_ratio(points)
+        rest = [p["peak_mb"] - multiplier * p["size_mb"] for p in points]
+        intercept, slope = _linear_fit([p["ctx"] for p in points], rest)
+        if slope < 0:
+            intercept, slope = statistics.fmean(rest), 0.0
+
+    predicted = [multiplier * p["size_mb"] + intercept + slope * p["ctx"] for p in points]
+    residuals = [p["peak_mb"] - q for p, q in zip(points, predicted)]
+    mean_peak = statistics.fmean(p["peak_mb"] for p in points)
+    total = sum((p["peak_mb"] - mean_peak) ** 2 for p in points)
+    r2 = 1 - sum(r ** 2 for r in residuals) / total if total else None
+    # Shift the intercept so no measured point is under-predicted
+    overhead = intercept + max(0.0, max(residuals)) + headroom_mb
+
+    return {
+        "method": method,
+        "multiplier": round(multiplier, 4),
+        "overhead_mb": round(overhead, 1),
+        "kv_mb_per_token": round(slope, 5),
+        "fitted_overhead_mb": round(intercept, 1),
+        "headroom_mb": headroom_mb,
+        "r2": round(r2, 4) if r2 is not None else None,
+        "max_residual_mb": round(max(abs(r) for r in residuals), 1),
+        "points": [{**p, "predicted_mb": round(q, 1)} for p, q in zip(points, predicted)],
+    }
+
+
+def measure(path: str, preset: dict, mem_interval_ms: float = 10.0, manifest_path: str = None) -> dict:
+    """Peak RSS for one artifact at one preset (child process, prompt + max_new = ctx)"""
+    from yi_tools.ctx_scaling import run_isolated
+
+    argv = ["--fills", "1.0", "--warmup", "0", "--repeats", "1", "--mem-interval-ms", str(mem_interval_ms)]
+    if manifest_path:
+        argv += ["--manifest", os.path.abspath(manifest_path)]
+    result = run_isolated(path, preset["name"], argv)
+    row = result["rows"][0]
+    if row["error"]:
+        raise RuntimeError(row["error"])
+    baseline = result["baseline_rss_mb"] or 0.0
+    peak = max(v for v in (result["peak_rss_mb"], result["hwm_mb"]) if v is not None)
+    size_mb = artifact_size_mb(path)
+    return {
+        "artifact": os.path.basename(path),
+        "size_mb": round(size_mb, 3),
+        "preset": preset["name"],
+        "ctx": preset["ctx"],
+        "baseline_mb": round(baseline, 1),
+        "load_mb": round(result["load_peak_rss_mb"] - (result["import_rss_mb"] or baseline), 1),
+        "peak_mb": round(peak - baseline, 1),
+    }
+
+
+def calibrate(
+    paths: list,
+    presets: list,
+    headroom_mb: float = DEFAULT_HEADROOM_MB,
+    mem_interval_ms: float = 10.0,
+    manifest_path: str = None,
+    progress=None,
+) -> dict:
+    """Measure every artifact x preset and fit coefficients per runtime"""
+    from yi_tools.bench_history import host_info
+
+    measurements, errors = [], []
+    for path in paths:
+        for preset in presets:
+            try:
+                point = measure(path, preset, mem_interval_ms, manifest_path)
+                point["runtime"] = runtime_for(path)
+                measurements.append(point)
+            except (RuntimeError, ValueError, OSError) as e:
+                point = {"artifact": os.path.basename(path), "preset": preset["name"], "error": str(e)}
+                errors.append(point)
+            if progress:
+                progress(point)
+
+    runtimes = {}
+    for runtime in sorted({p["runtime"] for p in measurements}):
+        points = [{k: p[k] for k in ("artifact", "size_mb", "preset", "ctx", "load_mb", "peak_mb")}
+                  for p in measurements if p["runtime"] == runtime]
+        runtimes[runtime] = fit(points, headroom_mb)
+
+    return {
+        "host": host_info(),
+        "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "legacy_formula": formula_text(LEGACY),
+        "measurements": measurements,
+        "errors": errors,
+        "runtimes": runtimes,
+    }
+
+
+def update_manifest(manifest_path: str, calibration: dict, runtime: str = None) -> dict:
+    """
+    Write `admission` (coefficients per runtime) into a manifest and refresh
+    admission_formula / required_ram_mb for its primary runtime
+    """
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+
+    admission = manifest.setdefault("admission", {"runtimes": {}})
+    admission.setdefault("runtimes", {})
+    for name, coefficients in calibration["runtimes"].items():
+        admission["runtimes"][name] = {
+            **{key: coefficients[key] for key in LEGACY},
+            "headroom_mb": coefficients["headroom_mb"],
+            "r2": coefficients["r2"],
+            "max_residual_mb": coefficients["max_residual_mb"],
+            "points": len(coefficients["points"]),
+            "host": calibration["host"].get("machine"),
+            "calibrated_at": calibration["calibrated_at"],
+        }
+    admission["legacy_formula"] = calibration["legacy_formula"]
+
+    runtime = runtime or manifest.get("runtime") or next(iter(calibration["runtimes"]), None)
+    if runtime in admission["runtimes"]:
+        coefficients = coefficients_for(manifest, runtime)
+        manifest["admission_formula"] = formula_text(coefficients)
+        size_mb = manifest.get("size_mb") or manifest.get("file_size_mb")
+        if size_mb:
+            manifest["required_ram_mb"] = required_ram_mb(size_mb, manifest.get("context_length")
+                                                          or manifest.get("sequence_length"), coefficients)
+
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the admission formula from measured peak RSS")
+    parser.add_argument("artifacts", nargs="+", help="Artifacts to measure (.gguf, .onnx/.ort, .pte)")
+    parser.add_argument("--manifest", help="Manifest to read presets from / update (default: next to the first artifact)")
+    parser.add_argument("--preset", action="append", help="Preset(s) whose ctx is measured (default: full, safe, guard)")
+    parser.add_argument("--headroom-mb", type=float, default=DEFAULT_HEADROOM_MB,
+                        help="Extra MB added to the fitted overhead for app / allocator slack (default: 0)")
+    parser.add_argument("--runtime", help="Runtime whose coefficients set admission_formula (default: manifest runtime)")
+    parser.add_argument("--mem-interval-ms", type=float, default=10.0, help="Memory sampling interval (default: 10)")
+    parser.add_argument("--update-manifest", action="store_true", help="Write the coefficients into the manifest")
+    parser.add_argument("--json-output", help="Path to save JSON results (optional)")
+    args = parser.parse_args()
+
+    manifest_path = args.manifest or os.path.join(os.path.dirname(os.path.abspath(args.artifacts[0])), "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    try:
+        presets = [get_preset(name, manifest) for name in (args.preset or list(PRESETS))]
+    except KeyError as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+
+    print("=" * 70)
+    points = ", ".join(f"{p['name']}@{p['ctx']}" for p in presets)
+    print(f"ADMISSION CALIBRATION: {len(args.artifacts)} artifact(s) x {points}")
+    print("=" * 70)
+
+    def progress(point):
+        if "error" in point:
+            print(f"  {point['artifact']:<32} {point['preset']:<6} ERROR: {point['error']}")
+            return
+        legacy = required_ram_mb(point["size_mb"])
+        print(f"  {point['artifact']:<32} {point['preset']:<6} ctx={point['ctx']:<5} size {point['size_mb']:>8.1f} MB  "
+              f"load {point['load_mb']:>7.1f}  peak {point['peak_mb']:>7.1f} MB  (legacy rule: {legacy} MB)")
+
+    calibration = calibrate(args.artifacts, presets, args.headroom_mb, args.mem_interval_ms,
+                            manifest_path if manifest else None, progress)
+    if not calibration["runtimes"]:
+        print("\nERROR: nothing measured")
+        sys.exit(2)
+
+    for runtime, c in calibration["runtimes"].items():
+        print(f"\n  {runtime}: {formula_text(c)}")
+        print(f"    fitted overhead {c['fitted_overhead_mb']} MB, r2={c['r2']}, max |residual| {c['max_residual_mb']} MB")
+        print(f"    {'artifact':<32} {'ctx':>5} {'peak':>8} {'fit':>8} {'new rule':>9} {'legacy':>7}")
+        for p in c["points"]:
+            print(f"    {p['artifact']:<32} {p['ctx']:>5} {p['peak_mb']:>8.1f} {p['predicted_mb']:>8.1f} "
+                  f"{required_ram_mb(p['size_mb'], p['ctx'], c):>9} {required_ram_mb(p['size_mb']):>7}")
+
+    if args.update_manifest:
+        if not manifest:
+            print(f"\nERROR: no manifest at {manifest_path}")
+            sys.exit(2)
+        updated = update_manifest(manifest_path, calibration, args.runtime)
+        print(f"\nCoefficients written to {manifest_path}: {updated.get('admission_formula')}")
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(calibration, f, indent=2)
+        print(f"\nResults saved to: {args.json_output}")
+
+    sys.exit(1 if calibration["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
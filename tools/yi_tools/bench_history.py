@@ -0,0 +1,451 @@
+"""
+Benchmark History Store
+Append-only SQLite record of KPI runs plus bootstrap regression checks
+
+Every kpi_smoke_test run (or saved results JSON) becomes one row keyed by
+artifact SHA256, runtime version and host fingerprint, with its raw
+per-repeat samples (TTFT, decode tok/s, per language for GGUF) stored
+alongside. `compare` resamples baseline and candidate samples to get a
+bootstrap confidence interval for the relative change of the mean; a
+metric regresses when the whole interval is on the worse side of zero and
+the point estimate is worse than --threshold (default 5%).
+
+Baseline selection (first that applies):
+- --baseline RUN_ID
+- --baseline-label LABEL: latest run with that label
+- otherwise the previous run of the same artifact name, backend and host
+
+Usage:
+    python -m yi_tools history record results.json [--label nightly] [--artifact model.gguf]
+    python -m yi_tools history list [--artifact qwen2.5-1.5b-instruct-q4_k_m.gguf]
+    python -m yi_tools history compare [--candidate ID] [--baseline ID | --baseline-label L]
+        [--metric tok_s --metric ttft_ms] [--threshold 0.05] [--json-output out.json]
+
+Exit code of `compare`: 1 if any metric regressed, 0 otherwise.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+# sqlite3, hashlib, platform and subprocess are imported where used:
+# `python -m yi_tools history --help` stays inside the startup budget
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                          "results", "bench_history.sqlite")
+DEFAULT_METRICS = ("tok_s", "ttft_ms")
+DEFAULT_THRESHOLD = 0.05
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_RESAMPLES = 5000
+
+LOWER_IS_BETTER = {"ttft_ms", "load_time_ms", "decode_token_ms"}
+
+# backend -> distribution that carries its version
+RUNTIME_PACKAGES = {
+    "executorch": "executorch",
+    "llama.cpp": "llama_cpp_python",
+    "onnxruntime": "onnxruntime",
+}
+
+# Sample names in results JSON -> stored metric names
+_SAMPLE_METRICS = {
+    "ttft_ms": "ttft_ms",
+    "decode_tok_s": "tok_s",
+    "tokens_per_second": "tok_s",
+    "prompt_eval_speed": "prompt_eval_speed",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    recorded_at REAL NOT NULL,
+    artifact_name TEXT NOT NULL,
+    artifact_sha256 TEXT,
+    backend TEXT,
+    runtime_version TEXT,
+    host_fingerprint TEXT NOT NULL,
+    host_json TEXT,
+    git_commit TEXT,
+    label TEXT,
+    status TEXT,
+    kpi_json TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_key ON runs (artifact_sha256, runtime_version, host_fingerprint);
+CREATE INDEX IF NOT EXISTS runs_series ON runs (artifact_name, backend, host_fingerprint, id);
+CREATE TABLE IF NOT EXISTS samples (
+    run INTEGER NOT NULL REFERENCES runs (id),
+    metric TEXT NOT NULL,
+    language TEXT NOT NULL DEFAULT '',
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_run ON samples (run, metric, language);
+"""
+
+
+def host_info() -> dict:
+    """Stable description of the benchmark host (no kernel release / hostname)"""
+    import platform
+
+    cpu = platform.processor() or ""
+    mem_gb = None
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.startswith(("model name", "Hardware")):
+                    cpu = line.split(":", 1)[1].strip()
+                    break
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    mem_gb = round(int(line.split()[1]) / (1024 ** 2))
+                    break
+    except OSError:
+        pass
+    return {
+        "system": platform.system(),
+        "machine": platform.machine(),
+        "cpu": cpu,
+        "cpu_count": os.cpu_count(),
+        "mem_gb": mem_gb,
+    }
+
+
+def host_fingerprint(info: dict = None) -> str:
+    import hashlib
+
+    info = info or host_info()
+    return hashlib.sha256(json.dumps(info, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def runtime_version(backend: str) -> str:
+    """'<package> <version>' for the backend's runtime, or None if not installed"""
+    from importlib import metadata
+
+    package = RUNTIME_PACKAGES.get(backend)
+    if not package:
+        return None
+    try:
+        return f"{package} {metadata.version(package)}"
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def git_commit() -> str:
+    import subprocess
+
+    if os.environ.get("GITHUB_SHA"):
+        return os.environ["GITHUB_SHA"]
+    try:
+        proc = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(DEFAULT_DB))
+    except OSError:
+        return None
+    return proc.stdout.strip() or None
+
+
+def extract_samples(results: dict) -> list:
+    """(metric, language, value) rows from a kpi_smoke_test results dict"""
+    rows = []
+    bench = results.get("benchmark") or {}
+    for name, values in (bench.get("samples") or {}).items():
+        if name in _SAMPLE_METRICS:
+            rows += [(_SAMPLE_METRICS[name], "", v) for v in values]
+    for language, detail in (bench.get("details") or {}).items():
+        for name, values in (detail.get("samples") or {}).items():
+            if name in _SAMPLE_METRICS:
+                rows += [(_SAMPLE_METRICS[name], language, v) for v in values]
+    load_ms = (results.get("kpi") or {}).get("load_time_ms")
+    if load_ms is not None:
+        rows.append(("load_time_ms", "", load_ms))
+    return rows
+
+
+class HistoryStore:
+    """SQLite-backed run history (append-only: runs are never updated)"""
+
+    def __init__(self, db_path: str = None):
+        import sqlite3
+
+        self.db_path = db_path or DEFAULT_DB
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def record(self, results: dict, artifact_path: str = None, label: str = None, sha256: str = None) -> int:
+        """
+        Append one run; the artifact is hashed (digest cache) unless `sha256`
+        is given or the file is gone
+
+        Returns:
+            Row id of the new run
+        """
+        artifact_path = artifact_path or results.get("pte_file") or ""
+        if sha256 is None and artifact_path and os.path.exists(artifact_path):
+            from yi_tools.digest_cache import cached_hash_artifact
+
+            sha256 = cached_hash_artifact(artifact_path)["sha256"]
+        backend = results.get("backend") or (results.get("runtime") or {}).get("backend")
+        info = host_info()
+
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (run_id, recorded_at, artifact_name, artifact_sha256, backend, runtime_version,"
+                " host_fingerprint, host_json, git_commit, label, status, kpi_json)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    results.get("run_id"),
+                    time.time(),
+                    os.path.basename(artifact_path),
+                    sha256,
+                    backend,
+                    runtime_version(backend),
+                    host_fingerprint(info),
+                    json.dumps(info, sort_keys=True),
+                    git_commit(),
+                    label,
+                    results.get("status"),
+                    json.dumps(results.get("kpi") or {}),
+                ),
+            )
+            run = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO samples (run, metric, language, value) VALUES (?, ?, ?, ?)",
+                [(run, metric, language, value) for metric, language, value in extract_samples(results)],
+            )
+        return run
+
+    def run(self, run: int) -> dict:
+        row = self.conn.execute("SELECT * FROM runs WHERE id = ?", (run,)).fetchone()
+        if row is None:
+            raise KeyError(f"no run {run} in {self.db_path}")
+        return dict(row)
+
+    def runs(self, artifact: str = None, label: str = None, limit: int = 50) -> list:
+        query, params = "SELECT * FROM runs WHERE 1 = 1", []
+        if artifact:
+            query += " AND (artifact_name = ? OR artifact_sha256 = ?)"
+            params += [artifact, artifact]
+        if label:
+            query += " AND label = ?"
+            params.append(label)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def samples(self, run: int) -> dict:
+        """{(metric, language): [values]} for one run"""
+        grouped = {}
+        for row in self.conn.execute("SELECT metric, language, value FROM samples WHERE run = ? ORDER BY rowid",
+                                     (run,)):
+            grouped.setdefault((row["metric"], row["language"]), []).append(row["value"])
+        return grouped
+
+    def latest(self) -> int:
+        row = self.conn.execute("SELECT MAX(id) FROM runs").fetchone()
+        if row[0] is None:
+            raise KeyError(f"no runs in {self.db_path}")
+        return row[0]
+
+    def find_baseline(self, candidate: int, label: str = None) -> int:
+        """Latest run labelled `label`, else the previous run in the candidate's series"""
+        run = self.run(candidate)
+        if label:
+            row = self.conn.execute(
+                "SELECT MAX(id) FROM runs WHERE label = ? AND id != ?", (label, candidate)
+            ).fetchone()
+        else:
+            row = self.conn.execute(
+                "SELECT MAX(id) FROM runs WHERE artifact_name = ? AND backend IS ? AND host_fingerprint = ? AND id < ?",
+                (run["artifact_name"], run["backend"], run["host_fingerprint"], candidate),
+            ).fetchone()
+        if row[0] is None:
+            raise KeyError(f"no baseline run for run {candidate}" + (f" with label {label!r}" if label else ""))
+        return row[0]
+
+
+def bootstrap_ci(
+    baseline: list,
+    candidate: list,
+    confidence: float = DEFAULT_CONFIDENCE,
+    resamples: int = DEFAULT_RESAMPLES,
+    seed: int = 0,
+) -> tuple:
+    """
+    Percentile bootstrap CI of mean(candidate) / mean(baseline) - 1
+
+    Both samples are resampled independently with replacement.
+
+    Returns:
+        (point, low, high) relative changes
+    """
+    rng = random.Random(seed)
+    base_mean = statistics.fmean(baseline)
+    point = statistics.fmean(candidate) / base_mean - 1
+    ratios = []
+    for _ in range(resamples):
+        b = statistics.fmean(rng.choices(baseline, k=len(baseline)))
+        c = statistics.fmean(rng.choices(candidate, k=len(candidate)))
+        ratios.append(c / b - 1 if b else 0.0)
+    ratios.sort()
+    tail = (1 - confidence) / 2
+    low = ratios[int(tail * (resamples - 1))]
+    high = ratios[int((1 - tail) * (resamples - 1))]
+    return point, low, high
+
+
+def compare_runs(
+    store: HistoryStore,
+    baseline: int,
+    candidate: int,
+    metrics: tuple = DEFAULT_METRICS,
+    threshold: float = DEFAULT_THRESHOLD,
+    confidence: float = DEFAULT_CONFIDENCE,
+    resamples: int = DEFAULT_RESAMPLES,
+) -> dict:
+    """
+    Bootstrap comparison of every (metric, language) present in both runs
+
+    Status per row: REGRESSION / IMPROVEMENT (significant and beyond
+    `threshold`), NO_CHANGE, or INSUFFICIENT (fewer than 2 samples a side).
+    """
+    base_samples, cand_samples = store.samples(baseline), store.samples(candidate)
+    rows = []
+    for key in sorted(set(base_samples) & set(cand_samples)):
+        metric, language = key
+        if metric not in metrics:
+            continue
+        base, cand = base_samples[key], cand_samples[key]
+        row = {
+            "metric": metric,
+            "language": language or None,
+            "baseline_mean": round(statistics.fmean(base), 3),
+            "candidate_mean": round(statistics.fmean(cand), 3),
+            "n": [len(base), len(cand)],
+        }
+        if len(base) < 2 or len(cand) < 2 or not row["baseline_mean"]:
+            row.update({"change_pct": None, "ci_pct": None, "status": "INSUFFICIENT"})
+            rows.append(row)
+            continue
+
+        point, low, high = bootstrap_ci(base, cand, confidence, resamples)
+        # Normalize so that negative = worse
+        sign = -1 if metric in LOWER_IS_BETTER else 1
+        worse_high = max(sign * low, sign * high)
+        better_low = min(sign * low, sign * high)
+        if worse_high < 0 and sign * point <= -threshold:
+            status = "REGRESSION"
+        elif better_low > 0 and sign * point >= threshold:
+            status = "IMPROVEMENT"
+        else:
+            status = "NO_CHANGE"
+        row.update({
+            "change_pct": round(point * 100, 2),
+            "ci_pct": [round(low * 100, 2), round(high * 100, 2)],
+            "status": status,
+        })
+        rows.append(row)
+
+    return {
+        "baseline": store.run(baseline),
+        "candidate": store.run(candidate),
+        "threshold": threshold,
+        "confidence": confidence,
+        "resamples": resamples,
+        "rows": rows,
+        "status": "FAIL" if any(r["status"] == "REGRESSION" for r in rows) else "PASS",
+    }
+
+
+def _describe(run: dict) -> str:
+    sha = (run["artifact_sha256"] or "-")[:12]
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["recorded_at"]))
+    return (f"#{run['id']} {when} {run['artifact_name']} sha256={sha} {run['runtime_version'] or run['backend']} "
+            f"host={run['host_fingerprint']}" + (f" [{run['label']}]" if run["label"] else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark history store and regression comparison")
+    parser.add_argument("--db", help=f"History database (default: {os.path.relpath(DEFAULT_DB)})")
+    sub = parser.add_subparsers(dest="action", required=True)
+
+    record = sub.add_parser("record", help="Append a kpi_smoke_test results JSON")
+    record.add_argument("results", help="Results JSON (kpi_smoke_test --json-output)")
+    record.add_argument("--artifact", help="Artifact path to hash (default: pte_file in the results)")
+    record.add_argument("--label", help="Free-form label, e.g. 'baseline' or a release tag")
+
+    listing = sub.add_parser("list", help="List recorded runs (newest first)")
+    listing.add_argument("--artifact", help="Filter by artifact file name or SHA256")
+    listing.add_argument("--label", help="Filter by label")
+    listing.add_argument("--limit", type=int, default=20)
+
+    compare = sub.add_parser("compare", help="Bootstrap regression check of a run against a baseline")
+    compare.add_argument("--candidate", type=int, help="Candidate run id (default: latest)")
+    group = compare.add_mutually_exclusive_group()
+    group.add_argument("--baseline", type=int, help="Baseline run id")
+    group.add_argument("--baseline-label", help="Use the latest run with this label as baseline")
+    compare.add_argument("--metric", action="append", help=f"Metric to compare (default: {', '.join(DEFAULT_METRICS)})")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                         help="Relative change that counts as a regression (default: 0.05 = 5%%)")
+    compare.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE, help="CI level (default: 0.95)")
+    compare.add_argument("--resamples", type=int, default=DEFAULT_RESAMPLES, help="Bootstrap resamples (default: 5000)")
+    compare.add_argument("--json-output", help="Path to save the comparison JSON (optional)")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    try:
+        if args.action == "record":
+            with open(args.results, "r") as f:
+                results = json.load(f)
+            run = store.record(results, args.artifact, args.label)
+            print(f"Recorded {_describe(store.run(run))} ({store.db_path})")
+            return
+
+        if args.action == "list":
+            for run in store.runs(args.artifact, args.label, args.limit):
+                kpi = json.loads(run["kpi_json"] or "{}")
+                print(f"  {_describe(run)}  {run['status']}  ttft={kpi.get('ttft_ms')} tok_s={kpi.get('tok_s')}")
+            return
+
+        try:
+            candidate = args.candidate or store.latest()
+            baseline = args.baseline or store.find_baseline(candidate, args.baseline_label)
+        except KeyError as e:
+            print(f"ERROR: {e.args[0]}")
+            sys.exit(2)
+        result = compare_runs(store, baseline, candidate, tuple(args.metric or DEFAULT_METRICS),
+                              args.threshold, args.confidence, args.resamples)
+    finally:
+        store.close()
+
+    print("=" * 70)
+    print(f"BENCHMARK COMPARISON ({args.confidence:.0%} bootstrap CI, threshold {args.threshold:.0%})")
+    print("=" * 70)
+    print(f"  Baseline:  {_describe(result['baseline'])}")
+    print(f"  Candidate: {_describe(result['candidate'])}")
+    print(f"\n  {'metric':<18} {'language':<10} {'baseline':>10} {'candidate':>10} {'change':>8} {'CI':>18}  status")
+    for row in result["rows"]:
+        change = f"{row['change_pct']:+.1f}%" if row["change_pct"] is not None else "-"
+        ci = f"[{row['ci_pct'][0]:+.1f}, {row['ci_pct'][1]:+.1f}]%" if row["ci_pct"] else "-"
+        print(f"  {row['metric']:<18} {row['language'] or '-':<10} {row['baseline_mean']:>10.2f} "
+              f"{row['candidate_mean']:>10.2f} {change:>8} {ci:>18}  {row['status']}")
+    print(f"\n  Status: {result['status']}")
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults saved to: {args.json_output}")
+
+    sys.exit(1 if result["status"] == "FAIL" else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark Sample Statistics
+Percentiles and dispersion for latency / throughput samples (stdlib only),
+plus the greedy prefill/decode timing loop shared by the runtime runners
+"""
+
+import math
+import statistics
+import time
+
+
+def percentile(samples, pct: float) -> float:
+    """Linear-interpolated percentile (same convention as numpy's default)"""
+    ordered = sorted(samples)
+    if not ordered:
+        raise ValueError("percentile of empty sample")
+    if len(ordered) == 1:
+        return float(ordered[0])
+    rank = (len(ordered) - 1) * pct / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return float(ordered[low] + (ordered[high] - ordered[low]) * (rank - low))
+
+
+def summarize(samples, digits: int = 3) -> dict:
+    """
+    n, mean, stdev, variance, cv, min, p50, p90, p99, max of a sample
+
+    Returns None for an empty sample so callers can store it as-is.
+    """
+    samples = [float(s) for s in samples]
+    if not samples:
+        return None
+    mean = statistics.fmean(samples)
+    variance = statistics.variance(samples) if len(samples) > 1 else 0.0
+    stdev = math.sqrt(variance)
+    summary = {
+        "n": len(samples),
+        "mean": mean,
+        "stdev": stdev,
+        "variance": variance,
+        "cv": stdev / mean if mean else None,
+        "min": min(samples),
+        "p50": percentile(samples, 50),
+        "p90": percentile(samples, 90),
+        "p99": percentile(samples, 99),
+        "max": max(samples),
+    }
+    return {k: (round(v, digits) if isinstance(v, float) else v) for k, v in summary.items()}
+
+
+def time_generation(
+    prefill, decode, ids: list, decode_tokens: int, warmup: int, repeats: int, mark=None
+) -> dict:
+    """
+    Time `prefill(ids) -> token` (TTFT) and `decode(token, pos) -> token` steps
+
+    Runs `warmup + repeats` greedy generations; only the timed repeats are
+    kept. `mark(phase)` (e.g. MemorySampler.mark) is called outside the
+    timed regions when prefill / decode begin. Returns summaries for
+    ttft_ms, prefill_tok_s, decode_tok_s and decode_token_ms, the raw
+    samples and the last generated ids.
+    """
+    mark = mark or (lambda phase: None)
+    ttft_ms, prefill_tok_s, decode_tok_s, token_ms = [], [], [], []
+    generated = []
+    for run in range(warmup + repeats):
+        mark("prefill")
+        start = time.perf_counter()
+        token = prefill(ids)
+        first = time.perf_counter()
+        mark("decode")
+
+        steps = []
+        out = [token]
+        pos = len(ids)
+        for _ in range(max(0, decode_tokens - 1)):
+            step_start = time.perf_counter()
+            token = decode(token, pos)
+            steps.append((time.perf_counter() - step_start) * 1000)
+            out.append(token)
+            pos += 1
+
+        if run < warmup:
+            continue
+        ttft = (first - start) * 1000
+        ttft_ms.append(ttft)
+        prefill_tok_s.append(len(ids) / (ttft / 1000) if ttft else 0.0)
+        if steps:
+            decode_tok_s.append(len(steps) / (sum(steps) / 1000))
+            token_ms.extend(steps)
+        generated = out
+
+    return {
+        "ttft_ms": summarize(ttft_ms),
+        "prefill_tok_s": summarize(prefill_tok_s),
+        "decode_tok_s": summarize(decode_tok_s),
+        "decode_token_ms": summarize(token_ms),
+        "samples": {
+            "ttft_ms": [round(v, 3) for v in ttft_ms],
+            "decode_tok_s": [round(v, 3) for v in decode_tok_s],
+        },
+        "generated_ids": generated,
+    }
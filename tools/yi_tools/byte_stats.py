@@ -0,0 +1,177 @@
+"""
+Vectorized Byte Statistics and Entropy Map
+Shannon-entropy histograms over a memory-mapped artifact (NumPy)
+
+The file is viewed through np.frombuffer on an mmap, so windows are
+histogrammed in C without copying. Each window is classified from its
+entropy and per-lane structure:
+
+- padding:   almost all zero bytes
+- low:       entropy < 2 bits/byte (metadata, repeated patterns)
+- fp32:      4-byte lanes where the sign/exponent byte (lane 3) is far more
+             predictable than the mantissa bytes - typical of fp32 weights
+- fp16:      same test on 2-byte lanes
+- quantized: high, lane-uniform entropy (int8 / packed int4 weights)
+
+Consecutive windows of the same class are merged into regions, giving an
+entropy map that shows fp32 islands and padding inside a "quantized" model.
+"""
+
+import mmap
+import os
+
+import numpy as np
+
+DEFAULT_WINDOW_SIZE = 1024 * 1024  # 1 MiB
+DEFAULT_SAMPLE_WINDOWS = 512       # windows examined in strided mode
+PADDING_ZERO_FRACTION = 0.95
+LOW_ENTROPY_BITS = 2.0
+LANE_RATIO = 0.75                  # exponent-lane entropy vs mantissa lanes
+
+
+def shannon_entropy(counts) -> float:
+    """Entropy in bits/byte of a 256-bin histogram"""
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum()
+    if total == 0:
+        return 0.0
+    p = counts[counts > 0] / total
+    return max(0.0, float(-(p * np.log2(p)).sum()))
+
+
+def lane_histograms(window: np.ndarray) -> tuple:
+    """
+    (256-bin histogram, 4x256 per-lane histograms) of a byte window
+
+    The whole-window histogram is the sum of the lane histograms plus the
+    unaligned tail, so each byte is counted exactly once.
+    """
+    usable = len(window) - len(window) % 4
+    grouped = window[:usable].reshape(-1, 4)
+    lanes = np.stack([np.bincount(grouped[:, lane], minlength=256) for lane in range(4)])
+    counts = lanes.sum(axis=0)
+    if usable < len(window):
+        counts = counts + np.bincount(window[usable:], minlength=256)
+    return counts, lanes
+
+
+def classify_window(window: np.ndarray) -> dict:
+    """Entropy, zero fraction, class and histogram (`counts`) of one window"""
+    counts, lanes = lane_histograms(window)
+    size = len(window)
+    entropy = shannon_entropy(counts)
+    zero_fraction = float(counts[0] / size) if size else 1.0
+
+    if zero_fraction >= PADDING_ZERO_FRACTION:
+        kind = "padding"
+    elif entropy < LOW_ENTROPY_BITS:
+        kind = "low"
+    else:
+        kind = "quantized"
+        lanes4 = [shannon_entropy(lane) for lane in lanes]
+        lanes2 = [shannon_entropy(lanes[0] + lanes[2]), shannon_entropy(lanes[1] + lanes[3])]
+        if lanes4[3] < LANE_RATIO * (lanes4[0] + lanes4[1]) / 2:
+            kind = "fp32"
+        elif lanes2[1] < LANE_RATIO * lanes2[0]:
+            kind = "fp16"
+    return {"entropy": round(entropy, 4), "zero_fraction": round(zero_fraction, 4), "class": kind, "counts": counts}
+
+
+def _window_offsets(size_bytes: int, window_size: int, sample_windows: int):
+    total_windows = (size_bytes + window_size - 1) // window_size
+    if not sample_windows or sample_windows >= total_windows:
+        return [i * window_size for i in range(total_windows)]
+    step = total_windows / sample_windows
+    return [int(i * step) * window_size for i in range(sample_windows)]
+
+
+def entropy_map(
+    file_path: str,
+    window_size: int = DEFAULT_WINDOW_SIZE,
+    sample_windows: int = DEFAULT_SAMPLE_WINDOWS,
+) -> dict:
+    """
+    Whole-file byte histogram and per-region entropy map
+
+    Args:
+        file_path: Artifact to scan
+        window_size: Window size in bytes
+        sample_windows: Evenly strided windows to examine (0 = full scan)
+
+    Returns:
+        Dict with histogram stats over scanned bytes, `bytes_by_class`
+        (extrapolated to the whole file in strided mode) and merged
+        `regions` [{start, end, class, entropy}]
+    """
+    size_bytes = os.path.getsize(file_path)
+    result = {
+        "size_bytes": size_bytes,
+        "window_size": window_size,
+        "mode": "full" if not sample_windows else "strided",
+        "scanned_bytes": 0,
+        "entropy_bits": 0.0,
+        "unique_byte_values": 0,
+        "zero_fraction": 1.0,
+        "bytes_by_class": {},
+        "regions": [],
+    }
+    if size_bytes == 0:
+        return result
+
+    offsets = _window_offsets(size_bytes, window_size, sample_windows)
+    if len(offsets) * window_size >= size_bytes:
+        result["mode"] = "full"
+    scale = size_bytes / min(size_bytes, len(offsets) * window_size)
+
+    totals = np.zeros(256, dtype=np.int64)
+    windows = []
+    with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = np.frombuffer(mm, dtype=np.uint8)
+        window = None
+        try:
+            for offset in offsets:
+                window = data[offset:offset + window_size]
+                stats = classify_window(window)
+                totals += stats.pop("counts")
+                stats["start"] = offset
+                stats["end"] = offset + len(window)
+                windows.append(stats)
+        finally:
+            # Drop the view before the mmap closes (exported buffer)
+            del data, window
+
+    scanned = int(totals.sum())
+    result["scanned_bytes"] = scanned
+    result["entropy_bits"] = round(shannon_entropy(totals), 4)
+    result["unique_byte_values"] = int((totals > 0).sum())
+    result["zero_fraction"] = round(float(totals[0] / scanned), 4)
+
+    by_class = {}
+    for stats in windows:
+        by_class[stats["class"]] = by_class.get(stats["class"], 0) + (stats["end"] - stats["start"])
+    result["bytes_by_class"] = {k: int(v * scale) for k, v in sorted(by_class.items(), key=lambda kv: -kv[1])}
+    result["regions"] = merge_regions(windows, contiguous=result["mode"] == "full")
+    return result
+
+
+def merge_regions(windows: list, contiguous: bool = True) -> list:
+    """Merge runs of same-class windows (in strided mode runs span the gaps)"""
+    regions = []
+    for stats in windows:
+        last = regions[-1] if regions else None
+        if last and last["class"] == stats["class"] and (not contiguous or last["end"] == stats["start"]):
+            n = last.pop("_windows")
+            last["entropy"] = round((last["entropy"] * n + stats["entropy"]) / (n + 1), 4)
+            last["end"] = stats["end"]
+            last["_windows"] = n + 1
+        else:
+            regions.append({
+                "start": stats["start"],
+                "end": stats["end"],
+                "class": stats["class"],
+                "entropy": stats["entropy"],
+                "_windows": 1,
+            })
+    for region in regions:
+        del region["_windows"]
+    return regions
@@ -0,0 +1,84 @@
+"""
+YI Tools Command-Line Entry Point
+One fast-starting front end for the validators in tools/
+
+Subcommands are resolved from a static table and their modules imported
+only when selected, so `--help` and the structural checks never pay for
+torch/executorch/onnxruntime/transformers. Backends load inside the
+subcommands that run a model (kpi), and only then.
+
+Usage:
+    python -m yi_tools <command> [args...]
+    python -m yi_tools --help
+
+    python -m yi_tools guards model.pte
+    python -m yi_tools coverage model.pte --json-output coverage.json
+    python -m yi_tools batch models/ -o results.jsonl
+"""
+
+import importlib
+import os
+import sys
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# command -> (module, function, summary, needs heavy backend)
+COMMANDS = {
+    "guards": ("validate_pte_guards", "main", "Structural guards for a .pte (plans, delegates, spans)", False),
+    "coverage": ("validate_int8_coverage", "main", "INT8 coverage from .pte constant tables", False),
+    "verify": ("verify_pte", "main", "Size and digest verification against a manifest", False),
+    "batch": ("validate_batch", "main", "Parallel guards/coverage/hashing over many artifacts", False),
+    "gguf": ("yi_tools.gguf", "main", "GGUF header, tensor table and quantization report", False),
+    "digests": ("yi_tools.digest_cache", "main", "Inspect or invalidate the digest cache", False),
+    "memory": ("yi_tools.mem_estimate", "main", "Analytic KV-cache / activation / weight RAM per preset", False),
+    "startup": ("yi_tools.startup_bench", "main", "Startup-time benchmark for these commands", False),
+    "history": ("yi_tools.bench_history", "main", "Benchmark history store and regression comparison", False),
+    "threads": ("yi_tools.thread_sweep", "main", "Thread-count / CPU-affinity sweep -> per-topology presets", True),
+    "conversation": ("yi_tools.conversation_bench", "main", "10-turn scenario replay: per-turn TTFT / prefill / tok/s", True),
+    "ctx": ("yi_tools.ctx_scaling", "main", "Context-length scaling per FULL/SAFE/GUARD preset (TTFT, tok/s, RSS)", True),
+    "load": ("yi_tools.load_bench", "main", "mmap / read / mlock load paths: TTFT from process start, RSS", True),
+    "calibrate": ("yi_tools.admission", "main", "Fit admission-formula coefficients from measured peak RSS", True),
+    "kpi": ("kpi_smoke_test", "main", "TTFT / tok/s / memory smoke test (loads ExecuTorch, llama.cpp or ONNX Runtime)", True),
+}
+
+
+def _usage() -> str:
+    lines = ["usage: python -m yi_tools <command> [args...]", "", "commands:"]
+    width = max(len(name) for name in COMMANDS)
+    for name, (_, _, summary, heavy) in COMMANDS.items():
+        lines.append(f"  {name:<{width}}  {summary}{'' if not heavy else ' [runtime]'}")
+    lines.append("")
+    lines.append("Run `python -m yi_tools <command> --help` for command options.")
+    return "\n".join(lines)
+
+
+def resolve(command: str):
+    """Import the module behind `command` and return its entry function"""
+    module_name, func_name = COMMANDS[command][:2]
+    if TOOLS_DIR not in sys.path:
+        sys.path.insert(0, TOOLS_DIR)
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def main(argv: list = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print(_usage())
+        sys.exit(0 if argv else 2)
+
+    command, args = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"ERROR: unknown command {command!r}\n", file=sys.stderr)
+        print(_usage(), file=sys.stderr)
+        sys.exit(2)
+
+    entry = resolve(command)
+    # Subcommands parse sys.argv themselves
+    sys.argv = [f"yi_tools {command}", *args]
+    result = entry()
+    if isinstance(result, int):
+        sys.exit(result)
+
+
+if __name__ == "__main__":
+    main()
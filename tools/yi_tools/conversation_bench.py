@@ -0,0 +1,387 @@
+"""
+10-Turn Conversation Benchmark
+Replays prompts/scenarios_10turn.md and times every turn as history grows
+
+Each scenario ("## Scenario N: ..." with a numbered "### Turn Prompts:"
+list) is replayed as one conversation: system prompt, then every previous
+user turn and the model's own (greedy) reply, then the new user turn. Per
+turn it records TTFT, the tokens actually prefilled, the context size and
+decode tok/s, which shows how latency climbs toward the preset's context
+window (512 tokens for SAFE). When the next turn would not fit, the oldest
+turns are dropped, as a chat client would do.
+
+llama.cpp keeps its KV cache between turns and only prefills the new
+suffix (what llama.rn does with its prompt cache); --no-cache-reuse
+re-prefills the whole history every turn. ExecuTorch / ONNX Runtime
+programs are re-prefilled every turn and need --tokenizer-path.
+
+Usage:
+    python -m yi_tools conversation model.gguf [--preset safe] [--scenario 1 --scenario 2]
+        [--scenarios prompts/scenarios_10turn.md] [--no-cache-reuse] [--json-output out.json]
+    python -m yi_tools conversation model.pte --tokenizer-path tokenizer.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+from yi_tools.bench_stats import summarize
+from yi_tools.cli import TOOLS_DIR
+from yi_tools.presets import get_preset
+
+DEFAULT_SCENARIOS = os.path.join(os.path.dirname(TOOLS_DIR), "prompts", "scenarios_10turn.md")
+
+# System prompts used by packages/app/src/services/InferenceService.ts
+SYSTEM_PROMPTS = {
+    "ko": ("당신은 JenAI입니다. 따뜻하고 공감적인 AI 동반자입니다.\n"
+           "사용자의 감정을 깊이 이해하고, 짧고 자연스러운 대화로 응답하세요.\n"
+           "의료 조언은 제공하지 마세요. 2-3 문장으로 간결하게 답변하세요."),
+    "en": ("You are JenAI, a warm and empathetic AI companion.\n"
+           "You deeply understand emotions and respond with natural, conversational language.\n"
+           "Do not provide medical advice. Keep responses brief (2-3 sentences)."),
+}
+
+_SCENARIO = re.compile(r"^##\s+Scenario\s+(\d+):\s*(.+?)\s*$")
+_TITLE = re.compile(r"^(.+?)\s*\((.+)\)$")
+_TURN = re.compile(r"^\s*(\d+)\.\s+(.+?)\s*$")
+_HANGUL = re.compile(r"[가-힣]")
+
+
+def parse_scenarios(path: str = DEFAULT_SCENARIOS) -> list:
+    """
+    Scenarios from the markdown file
+
+    Returns:
+        [{index, name, context, emotion, language, turns: [str, ...]}]
+    """
+    scenarios, current, in_turns = [], None, False
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            header = _SCENARIO.match(line)
+            if header:
+                title = _TITLE.match(header.group(2))
+                current = {
+                    "index": int(header.group(1)),
+                    "name": title.group(1) if title else header.group(2),
+                    "context": title.group(2) if title else None,
+                    "emotion": None,
+                    "turns": [],
+                }
+                scenarios.append(current)
+                in_turns = False
+            elif line.startswith("## "):
+                current = None  # rubric / usage sections
+            elif current is None:
+                continue
+            elif line.startswith("**Emotion**:"):
+                current["emotion"] = line.split(":", 1)[1].strip()
+            elif line.startswith("### "):
+                in_turns = "Turn Prompts" in line
+            elif in_turns:
+                turn = _TURN.match(line)
+                if turn:
+                    current["turns"].append(turn.group(2))
+
+    for scenario in scenarios:
+        scenario["language"] = "ko" if any(_HANGUL.search(t) for t in scenario["turns"]) else "en"
+    return scenarios
+
+
+class LlamaCppSession:
+    """Chat rendering + timed generation on a GGUFRunner, reusing the KV prefix"""
+
+    def __init__(self, runner, reuse_cache: bool = True):
+        self.llm = runner.llm
+        self.chatml = runner.chat_format == "chatml"
+        self.reuse_cache = reuse_cache
+        self.bos = [self.llm.token_bos()]
+        self.stop_ids = {self.llm.token_eos()}
+        if self.chatml:
+            self.stop_ids.update(self._tokenize("<|im_end|>"))
+        self.assistant_prefix = self.render("assistant", None)
+        self.turn_end = self._tokenize("<|im_end|>\n" if self.chatml else "\n")
+
+    def _tokenize(self, text: str) -> list:
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=False, special=True)
+
+    def render(self, role: str, text: str) -> list:
+        """Token ids of one message; text=None renders just the reply header"""
+        if self.chatml:
+            body = f"<|im_start|>{role}\n" + (f"{text}<|im_end|>\n" if text is not None else "")
+        else:
+            body = f"{role.capitalize()}: " + (f"{text}\n" if text is not None else "")
+        return self._tokenize(body)
+
+    def generate(self, ids: list, max_new_tokens: int) -> dict:
+        llm = self.llm
+        cached = 0
+        if self.reuse_cache:
+            for a, b in zip(llm.input_ids[:llm.n_tokens].tolist(), ids):
+                if a != b:
+                    break
+                cached += 1
+            cached = min(cached, len(ids) - 1)  # at least one token produces fresh logits
+            llm.n_tokens = cached
+        else:
+            llm.reset()
+
+        start = time.perf_counter()
+        llm.eval(ids[cached:])
+        token = llm.sample(temp=0.0)
+        first = time.perf_counter()
+
+        generated = []
+        while token not in self.stop_ids and len(generated) < max_new_tokens:
+            generated.append(token)
+            if len(generated) == max_new_tokens:
+                break
+            llm.eval([token])
+            token = llm.sample(temp=0.0)
+        end = time.perf_counter()
+
+        decoded = max(0, len(generated) - 1)
+        decode_s = end - first
+        return {
+            "prefill_tokens": len(ids) - cached,
+            "cached_tokens": cached,
+            "ttft_ms": (first - start) * 1000,
+            "generated": generated,
+            "decode_tok_s": decoded / decode_s if decoded and decode_s else None,
+        }
+
+    def detokenize(self, ids: list) -> str:
+        return self.llm.detokenize(ids).decode("utf-8", errors="replace")
+
+
+class TokenizerSession:
+    """PTERunner / ORTRunner plus a tokenizers.Tokenizer (no KV reuse between turns)"""
+
+    def __init__(self, runner, tokenizer_path: str):
+        from tokenizers import Tokenizer
+
+        self.runner = runner
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        eos = [self.tokenizer.token_to_id(t) for t in ("</s>", "<|eot_id|>", "<|end_of_text|>", "<|im_end|>")]
+        self.stop_ids = {t for t in eos if t is not None}
+        bos = [self.tokenizer.token_to_id(t) for t in ("<|begin_of_text|>", "<s>")]
+        self.bos = [t for t in bos if t is not None][:1]
+        self.assistant_prefix = self.render("assistant", None)
+        self.turn_end = self.tokenizer.encode("\n", add_special_tokens=False).ids
+
+    def render(self, role: str, text: str) -> list:
+        body = f"{role.capitalize()}: " + (f"{text}\n" if text is not None else "")
+        return self.tokenizer.encode(body, add_special_tokens=False).ids
+
+    def generate(self, ids: list, max_new_tokens: int) -> dict:
+        start = time.perf_counter()
+        token = self.runner.prefill(ids)
+        first = time.perf_counter()
+        generated, pos = [], len(ids)
+        while token not in self.stop_ids and len(generated) < max_new_tokens:
+            generated.append(token)
+            if len(generated) == max_new_tokens:
+                break
+            token = self.runner.decode(token, pos)
+            pos += 1
+        end = time.perf_counter()
+
+        decoded = max(0, len(generated) - 1)
+        decode_s = end - first
+        return {
+            "prefill_tokens": len(ids),
+            "cached_tokens": 0,
+            "ttft_ms": (first - start) * 1000,
+            "generated": generated,
+            "decode_tok_s": decoded / decode_s if decoded and decode_s else None,
+        }
+
+    def detokenize(self, ids: list) -> str:
+        return self.tokenizer.decode(ids)
+
+
+def replay(session, scenario: dict, n_ctx: int, max_new_tokens: int, system_prompt: str = None) -> list:
+    """Run one scenario turn by turn; returns per-turn rows"""
+    system_prompt = system_prompt or SYSTEM_PROMPTS.get(scenario["language"], SYSTEM_PROMPTS["en"])
+    system = session.bos + session.render("system", system_prompt)
+    history = []  # [(user_ids, assistant_ids)]
+    dropped = 0
+    rows = []
+
+    for turn, text in enumerate(scenario["turns"], start=1):
+        user = session.render("user", text)
+
+        def context_size():
+            return len(system) + sum(len(u) + len(a) for u, a in history) + len(user) + len(session.assistant_prefix)
+
+        while history and context_size() + max_new_tokens > n_ctx:
+            history.pop(0)
+            dropped += 1
+        ids = system + [t for pair in history for part in pair for t in part] + user + session.assistant_prefix
+        if len(ids) >= n_ctx:
+            raise ValueError(f"scenario {scenario['index']} turn {turn} alone needs {len(ids)} tokens > n_ctx {n_ctx}")
+        budget = max(1, min(max_new_tokens, n_ctx - len(ids)))
+
+        result = session.generate(ids, budget)
+        reply = result.pop("generated")
+        history.append((user, session.assistant_prefix + reply + session.turn_end))
+        rows.append({
+            "scenario": scenario["index"],
+            "turn": turn,
+            "context_tokens": len(ids),
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in result.items()},
+            "generated_tokens": len(reply),
+            "history_turns": len(history) - 1,
+            "dropped_turns": dropped,
+            "reply": session.detokenize(reply)[:200],
+        })
+    return rows
+
+
+def summarize_turns(rows: list) -> list:
+    """Per-turn-index aggregates across scenarios (the latency curve)"""
+    curve = []
+    for turn in sorted({r["turn"] for r in rows}):
+        at = [r for r in rows if r["turn"] == turn]
+        ttft = summarize([r["ttft_ms"] for r in at])
+        rates = [r["decode_tok_s"] for r in at if r["decode_tok_s"]]
+        curve.append({
+            "turn": turn,
+            "ttft_ms_p50": ttft["p50"],
+            "ttft_ms_max": ttft["max"],
+            "prefill_tokens_mean": round(statistics.fmean(r["prefill_tokens"] for r in at), 1),
+            "context_tokens_mean": round(statistics.fmean(r["context_tokens"] for r in at), 1),
+            "decode_tok_s_p50": round(statistics.median(rates), 3) if rates else None,
+            "dropped_turns_max": max(r["dropped_turns"] for r in at),
+        })
+    return curve
+
+
+def open_session(model_path: str, n_ctx: int, tokenizer_path: str = None, reuse_cache: bool = True):
+    """Backend session for `model_path` (llama.cpp for .gguf, else PTE/ORT + tokenizer)"""
+    ext = os.path.splitext(model_path.lower())[1]
+    if ext == ".gguf":
+        from yi_tools.gguf_runtime import GGUFRunner
+
+        return LlamaCppSession(GGUFRunner(model_path, n_ctx=n_ctx), reuse_cache)
+    if not tokenizer_path:
+        raise ValueError("--tokenizer-path (tokenizer.json) is required for .pte/.onnx models")
+    if ext in (".onnx", ".ort"):
+        from yi_tools.ort_runtime import ORTRunner
+
+        return TokenizerSession(ORTRunner(model_path), tokenizer_path)
+    from yi_tools.pte_runtime import PTERunner
+
+    return TokenizerSession(PTERunner(model_path), tokenizer_path)
+
+
+def run_benchmark(
+    model_path: str,
+    scenarios: list,
+    n_ctx: int,
+    max_new_tokens: int,
+    tokenizer_path: str = None,
+    reuse_cache: bool = True,
+    progress=None,
+) -> dict:
+    session = open_session(model_path, n_ctx, tokenizer_path, reuse_cache)
+    window = getattr(getattr(session, "runner", None), "window", None)
+    if window and window > 1:
+        n_ctx = min(n_ctx, window)
+
+    # Warm up kernels / page in weights outside the measured turns
+    session.generate(session.bos + session.render("user", "warmup") + session.assistant_prefix, 4)
+    if isinstance(session, LlamaCppSession):
+        session.llm.reset()  # or scenario 1 turn 1 reuses the warmup tokens as a cached prefix
+
+    rows = []
+    for scenario in scenarios:
+        scenario_rows = replay(session, scenario, n_ctx, max_new_tokens)
+        rows += scenario_rows
+        if progress:
+            progress(scenario, scenario_rows)
+        if isinstance(session, LlamaCppSession):
+            session.llm.reset()  # each scenario is a fresh conversation
+
+    return {
+        "model": model_path,
+        "n_ctx": n_ctx,
+        "max_new_tokens": max_new_tokens,
+        "cache_reuse": reuse_cache and isinstance(session, LlamaCppSession),
+        "scenarios": [{k: s[k] for k in ("index", "name", "emotion", "language")} for s in scenarios],
+        "turns": rows,
+        "curve": summarize_turns(rows),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay 10-turn scenarios and time every turn")
+    parser.add_argument("model", help="Path to .gguf (or .pte/.onnx with --tokenizer-path)")
+    parser.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help="Scenario markdown (default: prompts/scenarios_10turn.md)")
+    parser.add_argument("--scenario", type=int, action="append", help="Scenario number(s) to run (default: all)")
+    parser.add_argument("--preset", default="safe", help="Preset for ctx / max_new (default: safe)")
+    parser.add_argument("--manifest", help="Manifest with recommended_presets (default: manifest.json next to model)")
+    parser.add_argument("--n-ctx", type=int, help="Override the preset's context window")
+    parser.add_argument("--max-new", type=int, help="Override the preset's max new tokens per turn")
+    parser.add_argument("--tokenizer-path", help="tokenizer.json for .pte/.onnx models")
+    parser.add_argument("--no-cache-reuse", action="store_true", help="llama.cpp: re-prefill the full history each turn")
+    parser.add_argument("--json-output", help="Path to save JSON results (optional)")
+    args = parser.parse_args()
+
+    manifest_path = args.manifest or os.path.join(os.path.dirname(os.path.abspath(args.model)), "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    preset = get_preset(args.preset, manifest)
+    n_ctx = args.n_ctx or preset["ctx"]
+    max_new = args.max_new or preset["max_new"]
+
+    scenarios = parse_scenarios(args.scenarios)
+    if args.scenario:
+        scenarios = [s for s in scenarios if s["index"] in args.scenario]
+    if not scenarios:
+        print(f"ERROR: no scenarios parsed from {args.scenarios}")
+        sys.exit(2)
+
+    print("=" * 70)
+    print(f"10-TURN CONVERSATION BENCHMARK: {args.model}")
+    print(f"Preset {preset['name']} (n_ctx={n_ctx}, max_new={max_new}), {len(scenarios)} scenario(s)")
+    print("=" * 70)
+
+    def progress(scenario, rows):
+        print(f"\n  Scenario {scenario['index']}: {scenario['name']} ({scenario['language']})")
+        print(f"    {'turn':>4} {'ttft_ms':>9} {'prefill':>8} {'cached':>7} {'context':>8} {'gen':>5} "
+              f"{'tok/s':>9} {'dropped':>8}")
+        for r in rows:
+            rate = f"{r['decode_tok_s']:.1f}" if r["decode_tok_s"] else "-"
+            print(f"    {r['turn']:>4} {r['ttft_ms']:>9.2f} {r['prefill_tokens']:>8} {r['cached_tokens']:>7} "
+                  f"{r['context_tokens']:>8} {r['generated_tokens']:>5} {rate:>9} {r['dropped_turns']:>8}")
+
+    try:
+        result = run_benchmark(args.model, scenarios, n_ctx, max_new, args.tokenizer_path,
+                               reuse_cache=not args.no_cache_reuse, progress=progress)
+    except (ImportError, ValueError, RuntimeError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+    result["preset"] = preset
+
+    print(f"\n  LATENCY CURVE (across scenarios, cache reuse: {'on' if result['cache_reuse'] else 'off'})")
+    print(f"    {'turn':>4} {'ttft p50':>9} {'ttft max':>9} {'prefill':>8} {'context':>8} {'tok/s p50':>10}")
+    for point in result["curve"]:
+        rate = f"{point['decode_tok_s_p50']:.1f}" if point["decode_tok_s_p50"] else "-"
+        print(f"    {point['turn']:>4} {point['ttft_ms_p50']:>9.2f} {point['ttft_ms_max']:>9.2f} "
+              f"{point['prefill_tokens_mean']:>8.0f} {point['context_tokens_mean']:>8.0f} {rate:>10}")
+
+    if args.json_output:
+        with open(args.json_output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\nResults saved to: {args.json_output}")
+
+
+if __name__ == "__main__":
+    main()
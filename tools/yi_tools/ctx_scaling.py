@@ -0,0 +1,327 @@
+"""
+Context-Length Scaling Benchmark
+TTFT, tok/s and peak RSS per FULL/SAFE/GUARD preset at several fill levels
+
+Each preset's (ctx, max_new, top_p, temp) tuple is run with the prompt
+filling 25/50/75/100% of the room the preset leaves for it (ctx - max_new),
+then max_new tokens are decoded, so the 100% point ends exactly at the
+preset's context window. Decoding ignores EOS so every point does the same
+amount of work.
+
+Memory is sampled with MemorySampler; the model is loaded with the preset's
+n_ctx, since llama.cpp sizes its KV cache and compute buffers from it. By
+default every preset runs in its own child process so one preset's
+allocations never inflate the next one's peak RSS (--in-process to skip).
+
+llama.cpp samples with the preset's top_p / temperature; ExecuTorch and
+ONNX Runtime programs decode greedily on synthetic prompts (sampling cost
+is negligible next to a forward pass) and are capped at their exported
+window.
+
+The table is what the preset boundaries in app/admission/android.kt and
+ios.swift should be justified with.
+
+Usage:
+    python -m yi_tools ctx model.gguf [--preset full --preset safe] [--fills 0.25,0.5,1.0]
+        [--repeats 3] [--json-output out.json]
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import tempfile
+
+from yi_tools.bench_stats import time_generation
+from yi_tools.cli import TOOLS_DIR
+from yi_tools.mem_sampler import DEFAULT_INTERVAL_MS, MemorySampler
+from yi_tools.presets import PRESETS, get_preset
+
+DEFAULT_FILLS = (0.25, 0.5, 0.75, 1.0)
+
+
+def prompt_length(preset: dict, fill: float) -> int:
+    """Prompt tokens for `fill` of the room left by max_new (at least 1)"""
+    return max(1, round(fill * (preset["ctx"] - preset["max_new"])))
+
+
+class _LlamaCppTarget:
+    """Preset-sampled prefill/decode on a GGUFRunner, prompts from real text"""
+
+    sampling = "top_p"
+
+    def __init__(self, model_path: str, preset: dict, threads: int = None):
+        from yi_tools.gguf_runtime import LANGUAGE_PROMPTS, GGUFRunner
+
+        self.runner = GGUFRunner(model_path, n_ctx=preset["ctx"], n_threads=threads, n_threads_batch=threads)
+        self.llm = self.runner.llm
+        self.preset = preset
+        self.window = preset["ctx"]
+        text = " ".join(LANGUAGE_PROMPTS.values())
+        self._text_ids = self.llm.tokenize(text.encode("utf-8"), add_bos=False, special=False)
+
+    def prompt(self, length: int) -> list:
+        ids = [self.llm.token_bos()]
+        while len(ids) < length:
+            ids += self._text_ids
+        return ids[:length]
+
+    def _sample(self) -> int:
+        return self.llm.sample(top_p=self.preset["top_p"], temp=self.preset["temp"])
+
+    def prefill(self, ids: list) -> int:
+        self.llm.reset()
+        self.llm.eval(ids)
+        return self._sample()
+
+    def decode(self, token: int, pos: int) -> int:
+        self.llm.eval([token])
+        return self._sample()
+
+
+class _RunnerTarget:
+    """PTERunner / ORTRunner (greedy) on synthetic prompts"""
+
+    sampling = "greedy"
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.window = runner.window if runner.window and runner.window > 1 else None
+        self.prefill = runner.prefill
+        self.decode = runner.decode
+
+    def prompt(self, length: int) -> list:
+        return self.runner.synthetic_prompt(length)
+
+
+def import_runtime(model_path: str):
+    ext = os.path.splitext(model_path.lower())[1]
+    if ext == ".gguf":
+        from yi_tools.gguf_runtime import GGUFRunner  # noqa: F401
+
+        importlib.import_module("llama_cpp")
+    elif ext in (".onnx", ".ort"):
+        importlib.import_module("onnxruntime")
+    else:
+        from yi_tools.pte_runtime import PYBINDINGS_MODULE
+
+        importlib.import_module(PYBINDINGS_MODULE)
+
+
+def open_target(model_path: str, preset: dict, threads: int = None):
+    ext = os.path.splitext(model_path.lower())[1]
+    if ext == ".gguf":
+        return _LlamaCppTarget(model_path, preset, threads)
+    if ext in (".onnx", ".ort"):
+        from yi_tools.ort_runtime import ORTRunner
+
+        return _RunnerTarget(ORTRunner(model_path, intra_op=threads or 0))
+    from yi_tools.pte_runtime import PTERunner
+
+    return _RunnerTarget(PTERunner(model_path))
+
+
+def run_preset(
+    model_path: str,
+    preset: dict,
+    fills: list = DEFAULT_FILLS,
+    warmup: int = 1,
+    repeats: int = 3,
+    threads: int = None,
+    interval_ms: float = DEFAULT_INTERVAL_MS,
+    progress=None,
+) -> dict:
+    """
+    Load the model with the preset's ctx and time every fill level
+
+    Returns:
+        Dict with preset, load_ms, baseline_rss_mb (before the runtime is
+        imported), import_rss_mb, load_peak_rss_mb, peak_rss_mb and rows
+        [{fill, prompt_tokens, context_tokens, ttft_ms, prefill_tok_s,
+        decode_tok_s, peak_rss_mb, error}]
+    """
+    sampler = MemorySampler(interval_ms=interval_ms).start()
+    # Import the runtime first so its libraries are not counted as load cost
+    sampler.mark("import")
+    import_runtime(model_path)
+    sampler.mark("load")
+    target = open_target(model_path, preset, threads)
+    sampler.mark("idle")
+
+    rows = []
+    for fill in fills:
+        length = prompt_length(preset, fill)
+        row = {"fill": fill, "prompt_tokens": length, "context_tokens": length + preset["max_new"]}
+        if target.window and row["context_tokens"] > target.window:
+            row["error"] = f"needs {row['context_tokens']} tokens > exported window {target.window}"
+        else:
+            label = f"fill{round(fill * 100)}"
+            timings = time_generation(
+                target.prefill, target.decode, target.prompt(length), preset["max_new"], warmup, repeats,
+                mark=lambda phase: sampler.mark(f"{label}/{phase}"),
+            )
+            sampler.mark("idle")
+            row.update({
+                "ttft_ms": timings["ttft_ms"],
+                "prefill_tok_s": timings["prefill_tok_s"],
+                "decode_tok_s": timings["decode_tok_s"],
+                "samples": timings["samples"],
+                "error": None,
+            })
+        rows.append(row)
+        if progress:
+            progress(preset, row)
+
+    report = sampler.stop()
+    for row in rows:
+        label = f"fill{round(row['fill'] * 100)}/"
+        peaks = [p["rss_mb"] for phase, p in report["phase_peaks"].items()
+                 if phase.startswith(label) and p["rss_mb"] is not None]
+        row["peak_rss_mb"] = max(peaks) if peaks else None
+
+    runner = getattr(target, "runner", None)
+    return {
+        "preset": preset,
+        "backend": runner.describe() if runner else None,
+        "sampling": target.sampling,
+        "load_ms": round(runner.load_ms, 2) if runner else None,
+        "baseline_rss_mb": report["timeline"][0][2] if report["timeline"] else None,
+        "import_rss_mb": (report["phase_peaks"].get("import") or {}).get("rss_mb"),
+        "load_peak_rss_mb": (report["phase_peaks"].get("load") or {}).get("rss_mb"),
+        "peak_rss_mb": report["peaks"]["rss_mb"],
+        "hwm_mb": report["hwm_mb"],
+        "memory_source": report["source"],
+        "rows": rows,
+    }
+
+
+def run_isolated(model_path: str, preset_name: str, argv: list) -> dict:
+    """Run one preset in a child process (fresh address space) and return its result"""
+    import subprocess
+
+    fd, path = tempfile.mkstemp(prefix="ctx_scaling_", suffix=".json")
+    os.close(fd)
+    try:
+        command = [sys.executable, "-m", "yi_tools", "ctx", os.path.abspath(model_path), "--preset", preset_name,
+                   "--in-process", "--quiet", "--json-output", path, *argv]
+        completed = subprocess.run(command, capture_output=True, text=True, cwd=TOOLS_DIR)
+        if completed.returncode not in (0, 1):  # 1 = every fill level failed, still reported
+            detail = (completed.stdout + completed.stderr).strip().splitlines()
+            raise RuntimeError(f"preset {preset_name} failed: {detail[-1] if detail else completed.returncode}")
+        with open(path, "r") as f:
+            return json.load(f)["presets"][0]
+    finally:
+        os.remove(path)
+
+
+def _cell(summary, fmt: str = "{:.1f}") -> str:
+    return fmt.format(summary["p50"]) if summary else "-"
+
+
+def print_table(results: list, indent: str = ""):
+    print(f"{indent}{'preset':<6} {'ctx':>5} {'max_new':>7} {'fill':>5} {'prompt':>6} {'ttft_ms':>9} "
+          f"{'prefill/s':>10} {'decode/s':>9} {'peak_rss':>9}")
+    for result in results:
+        preset = result["preset"]
+        for row in result["rows"]:
+            head = (f"{indent}{preset['name']:<6} {preset['ctx']:>5} {preset['max_new']:>7} "
+                    f"{round(row['fill'] * 100):>4}% {row['prompt_tokens']:>6}")
+            if row["error"]:
+                print(f"{head}  ERROR: {row['error']}")
+                continue
+            rss = f"{row['peak_rss_mb']:.1f}" if row["peak_rss_mb"] is not None else "-"
+            print(f"{head} {_cell(row['ttft_ms'], '{:.2f}'):>9} {_cell(row['prefill_tok_s']):>10} "
+                  f"{_cell(row['decode_tok_s']):>9} {rss:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTFT / tok/s / peak RSS per preset at several context fill levels")
+    parser.add_argument("model", help="Path to .gguf, .onnx/.ort or .pte")
+    parser.add_argument("--preset", action="append", help="Preset(s) to run (default: full, safe, guard)")
+    parser.add_argument("--manifest", help="Manifest with recommended_presets (default: manifest.json next to model)")
+    parser.add_argument("--fills", help="Comma-separated prompt fill fractions of ctx - max_new (default: 0.25,0.5,0.75,1.0)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed warmup runs per fill level (default: 1)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per fill level (default: 3)")
+    parser.add_argument("--threads", type=int, help="Runtime threads (default: runtime default)")
+    parser.add_argument("--mem-interval-ms", type=float, default=DEFAULT_INTERVAL_MS,
+                        help="Memory sampling interval (default: 10)")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run all presets in this process (peak RSS then carries over between presets)")
+    parser.add_argument("--quiet", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--json-output", help="Path to save JSON results (optional)")
+    args = parser.parse_args()
+
+    manifest_path = args.manifest or os.path.join(os.path.dirname(os.path.abspath(args.model)), "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    try:
+        presets = [get_preset(name, manifest) for name in (args.preset or list(PRESETS))]
+        fills = [float(f) for f in args.fills.split(",")] if args.fills else list(DEFAULT_FILLS)
+    except (KeyError, ValueError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+    if any(not 0 < f <= 1 for f in fills):
+        print("ERROR: --fills must be fractions in (0, 1]")
+        sys.exit(2)
+
+    if not args.quiet:
+        print("=" * 70)
+        print(f"CONTEXT-LENGTH SCALING: {args.model}")
+        print(f"Presets: {', '.join(p['name'] for p in presets)}; fills: "
+              f"{', '.join(f'{round(f * 100)}%' for f in fills)}; "
+              f"{'in-process' if args.in_process else 'one process per preset'}")
+        print("=" * 70)
+
+    def progress(preset, row):
+        if args.quiet:
+            return
+        status = f"ERROR: {row['error']}" if row["error"] else f"ttft {row['ttft_ms']['p50']:.2f} ms"
+        print(f"  {preset['name']:<6} fill {round(row['fill'] * 100):>3}% ({row['prompt_tokens']} tokens): {status}")
+
+    # Forwarded to isolated children (the preset list is per child)
+    child_argv = ["--warmup", str(args.warmup), "--repeats", str(args.repeats),
+                  "--mem-interval-ms", str(args.mem_interval_ms), "--manifest", os.path.abspath(manifest_path)]
+    if args.fills:
+        child_argv += ["--fills", args.fills]
+    if args.threads:
+        child_argv += ["--threads", str(args.threads)]
+
+    results = []
+    try:
+        for preset in presets:
+            if args.in_process:
+                result = run_preset(args.model, preset, fills, args.warmup, args.repeats, args.threads,
+                                    args.mem_interval_ms, progress)
+            else:
+                result = run_isolated(args.model, preset["name"], child_argv)
+                for row in result["rows"]:
+                    progress(preset, row)
+            results.append(result)
+    except (ImportError, ValueError, RuntimeError) as e:
+        print(f"ERROR: {e}")
+        sys.exit(2)
+
+    if not args.quiet:
+        print("\n  CONTEXT SCALING TABLE (p50; peak RSS in MB per fill level)")
+        print_table(results, indent="    ")
+        print("\n  Per preset: load / peak RSS")
+        for result in results:
+            print(f"    {result['preset']['name']:<6} load {result['load_ms'] or 0:.0f} ms, "
+                  f"load peak {result['load_peak_rss_mb'] or 0:.1f} MB, peak {result['peak_rss_mb'] or 0:.1f} MB "
+                  f"(sampling: {result['sampling']})")
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump({"model": args.model, "fills": fills, "presets": results}, f, indent=2)
+        if not args.quiet:
+            print(f"\nResults saved to: {args.json_output}")
+
+    failed = [row for result in results for row in result["rows"] if row["error"]]
+    sys.exit(1 if failed and len(failed) == sum(len(r["rows"]) for r in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
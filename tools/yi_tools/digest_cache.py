@@ -0,0 +1,291 @@
+"""
+Persistent Artifact Digest Cache
+Skips re-hashing unchanged multi-GB artifacts across tool invocations
+
+Entries are keyed on file identity (st_dev, st_ino, st_size, st_mtime_ns)
+plus the tree block size. Any rewrite of the artifact changes at least one of
+those, so a stale digest is never returned for a modified file.
+
+Safety:
+- Trust but re-verify: every N-th hit of an entry re-hashes the file and
+  compares with the cached digests, so silent bit rot cannot hide behind the
+  cache indefinitely (N=1 disables trust entirely).
+- Racy entries: a digest recorded within RACY_WINDOW_NS of the file's mtime
+  is not trusted (same idea as git's racy-index check), because a write in
+  the same timestamp tick would keep the identity unchanged.
+- LRU eviction bounds the cache to `max_entries`.
+- Concurrent writers (batch validation workers, parallel CI jobs) merge
+  into the on-disk cache under an exclusive lock instead of overwriting it.
+
+Location: $YI_DIGEST_CACHE, or ~/.cache/yi_tools/digests.json.
+Set YI_DIGEST_CACHE=off to disable.
+
+Usage:
+    python -m yi_tools.digest_cache --list
+    python -m yi_tools.digest_cache --invalidate <path> [<path> ...]
+    python -m yi_tools.digest_cache --clear
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from yi_tools.hashing import DEFAULT_BLOCK_SIZE, hash_artifact
+
+try:
+    import fcntl
+except ImportError:  # Windows: last writer wins
+    fcntl = None
+
+CACHE_VERSION = 1
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_REVERIFY_EVERY = 10
+RACY_WINDOW_NS = 2 * 10 ** 9  # 2 s, covers coarse filesystem timestamps
+
+
+def default_cache_path():
+    """Cache file path, or None when disabled via YI_DIGEST_CACHE=off"""
+    env = os.environ.get("YI_DIGEST_CACHE")
+    if env is not None:
+        if env.strip().lower() in ("", "0", "off", "false", "none"):
+            return None
+        return Path(env).expanduser()
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "yi_tools" / "digests.json"
+
+
+def file_identity(file_path: str, block_size: int = DEFAULT_BLOCK_SIZE) -> str:
+    """Cache key for the file's current on-disk identity"""
+    st = os.stat(file_path)
+    return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}:{block_size}"
+
+
+class DigestCache:
+    """On-disk digest cache (JSON, atomically replaced on save)"""
+
+    def __init__(
+        self,
+        cache_path=None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        reverify_every: int = None,
+    ):
+        self.cache_path = Path(cache_path) if cache_path else default_cache_path()
+        self.max_entries = max_entries
+        if reverify_every is None:
+            reverify_every = int(os.environ.get("YI_DIGEST_CACHE_REVERIFY", DEFAULT_REVERIFY_EVERY))
+        self.reverify_every = max(1, reverify_every)
+        self.entries = self._load()
+        self._removed = set()
+        self._cleared = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache_path is not None
+
+    def _load(self) -> dict:
+        if not self.enabled or not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # Corrupt cache is never fatal - start over
+            return {}
+        if data.get("version") != CACHE_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Exclusive lock on a sidecar file for the read-merge-write in save()"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.cache_path.with_suffix(".lock"), "a") as lock:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _merge_from_disk(self):
+        """Fold in entries other processes saved since we loaded"""
+        if self._cleared:
+            return
+        for key, entry in self._load().items():
+            if key in self._removed:
+                continue
+            mine = self.entries.get(key)
+            if mine is None or entry.get("last_used", 0) > mine.get("last_used", 0):
+                self.entries[key] = entry
+
+    def save(self):
+        """Merge with the on-disk cache, evict LRU entries beyond max_entries, persist"""
+        if not self.enabled:
+            return
+        import tempfile
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with self._locked():
+            self._merge_from_disk()
+            self._removed.clear()
+            self._cleared = False
+            if len(self.entries) > self.max_entries:
+                by_use = sorted(self.entries.items(), key=lambda kv: kv[1].get("last_used", 0))
+                for key, _ in by_use[:len(self.entries) - self.max_entries]:
+                    del self.entries[key]
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_path.parent, prefix=".digests.")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"version": CACHE_VERSION, "entries": self.entries}, f, indent=2)
+                os.replace(tmp_path, self.cache_path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+
+    def invalidate(self, file_path: str = None) -> int:
+        """Drop entries for one path (any identity) or everything; returns count removed"""
+        if file_path is None:
+            removed = len(self.entries)
+            self.entries = {}
+            self._cleared = True
+        else:
+            target = os.path.abspath(file_path)
+            stale = [k for k, e in self.entries.items() if e.get("path") == target]
+            for key in stale:
+                del self.entries[key]
+            self._removed.update(stale)
+            removed = len(stale)
+        self.save()
+        return removed
+
+    def lookup(self, file_path: str, block_size: int = DEFAULT_BLOCK_SIZE, full_sha256: bool = True):
+        """Trusted cache entry for the file's current identity, or None"""
+        if not self.enabled:
+            return None
+        st = os.stat(file_path)
+        entry = self.entries.get(file_identity(file_path, block_size))
+        if entry is None:
+            return None
+        if full_sha256 and not entry.get("sha256"):
+            return None
+        if entry.get("verified_at_ns", 0) - st.st_mtime_ns < RACY_WINDOW_NS:
+            return None
+        return entry
+
+    def store(self, file_path: str, digest: dict, started_ns: int):
+        """Record a freshly computed digest (started_ns = time hashing began)"""
+        if not self.enabled:
+            return
+        block_size = digest["tree_hash"]["block_size"]
+        self.entries[file_identity(file_path, block_size)] = {
+            "path": os.path.abspath(file_path),
+            "size_bytes": digest["size_bytes"],
+            "sha256": digest["sha256"],
+            "tree_hash": digest["tree_hash"],
+            "verified_at_ns": started_ns,
+            "hits_since_verify": 0,
+            "last_used": time.time(),
+        }
+
+
+def cached_hash_artifact(
+    file_path: str,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    workers: int = None,
+    full_sha256: bool = True,
+    cache: DigestCache = None,
+    use_cache: bool = True,
+) -> dict:
+    """
+    hash_artifact() backed by the persistent digest cache
+
+    Returns the hash_artifact() dict plus `cache_status`: one of
+    "disabled", "miss", "hit", "reverified" or "bitrot" (cached digest no
+    longer matches the bytes on disk; the fresh digest is returned).
+    """
+    if not use_cache:
+        digest = hash_artifact(file_path, block_size, workers, full_sha256)
+        digest["cache_status"] = "disabled"
+        return digest
+
+    cache = cache or DigestCache()
+    if not cache.enabled:
+        return cached_hash_artifact(file_path, block_size, workers, full_sha256, use_cache=False)
+
+    entry = cache.lookup(file_path, block_size, full_sha256)
+    if entry is not None and entry["hits_since_verify"] + 1 < cache.reverify_every:
+        entry["hits_since_verify"] += 1
+        entry["last_used"] = time.time()
+        cache.save()
+        return {
+            "size_bytes": entry["size_bytes"],
+            "sha256": entry["sha256"] if full_sha256 else None,
+            "tree_hash": entry["tree_hash"],
+            "cache_status": "hit",
+        }
+
+    started_ns = time.time_ns()
+    # Re-verification always recomputes both digests so the whole entry is
+    # checked; an entry stored without a sha256 is compared on the tree root
+    # and gets the fresh sha256 backfilled by store()
+    digest = hash_artifact(file_path, block_size, workers, full_sha256 or entry is not None)
+    if entry is None:
+        status = "miss"
+    elif digest["tree_hash"]["root"] == entry["tree_hash"]["root"] and (
+        entry["sha256"] is None or digest["sha256"] == entry["sha256"]
+    ):
+        status = "reverified"
+    else:
+        status = "bitrot"
+        print(
+            f"WARNING: digest cache mismatch for unchanged file identity: {file_path}\n"
+            f"         cached root {entry['tree_hash']['root'][:16]}..., "
+            f"on-disk root {digest['tree_hash']['root'][:16]}... (possible bit rot)",
+            file=sys.stderr,
+        )
+
+    cache.store(file_path, digest, started_ns)
+    cache.save()
+    if not full_sha256:
+        digest["sha256"] = None
+    digest["cache_status"] = status
+    return digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the artifact digest cache")
+    parser.add_argument("--cache", help="Cache file (default: $YI_DIGEST_CACHE or ~/.cache/yi_tools/digests.json)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--list", action="store_true", help="List cached entries")
+    group.add_argument("--invalidate", nargs="+", metavar="PATH", help="Drop entries for these artifacts")
+    group.add_argument("--clear", action="store_true", help="Drop all entries")
+    args = parser.parse_args()
+
+    cache = DigestCache(args.cache)
+    if not cache.enabled:
+        print("Digest cache disabled (YI_DIGEST_CACHE=off)")
+        return
+
+    if args.list:
+        print(f"Cache: {cache.cache_path} ({len(cache.entries)} entries)")
+        for entry in sorted(cache.entries.values(), key=lambda e: e.get("last_used", 0), reverse=True):
+            sha = (entry.get("sha256") or "-")[:16]
+            print(f"  {entry['path']}  {entry['size_bytes']:,} bytes  sha256={sha}  "
+                  f"hits_since_verify={entry['hits_since_verify']}")
+    elif args.invalidate:
+        removed = sum(cache.invalidate(p) for p in args.invalidate)
+        print(f"Removed {removed} entr{'y' if removed == 1 else 'ies'}")
+    else:
+        removed = cache.invalidate()
+        print(f"Cleared {removed} entr{'y' if removed == 1 else 'ies'} from {cache.cache_path}")
+
+
+if __name__ == "__main__":
+    main()
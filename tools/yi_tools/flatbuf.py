@@ -0,0 +1,151 @@
+"""
+Minimal Zero-Copy FlatBuffers Reader
+Just enough of the FlatBuffers binary format to walk ExecuTorch/XNNPACK
+schemas over an mmap without the flatbuffers package or generated code.
+
+Tables are read lazily with struct.unpack_from against the underlying
+buffer. Only metadata (scalars, strings, shape vectors) is decoded; byte
+payloads are exposed as (offset, length) spans, so nothing large is copied
+and only the pages actually touched are faulted in.
+"""
+
+import struct
+
+_U16 = struct.Struct("<H")
+_I32 = struct.Struct("<i")
+_U32 = struct.Struct("<I")
+
+SCALAR_FORMATS = {
+    "b": 1, "B": 1, "h": 2, "H": 2, "i": 4, "I": 4, "q": 8, "Q": 8, "f": 4, "d": 8, "?": 1,
+}
+
+
+class FlatbufferError(ValueError):
+    """Malformed or truncated flatbuffer"""
+
+
+class Table:
+    """A flatbuffer table located at `pos` inside `buf`"""
+
+    __slots__ = ("buf", "pos", "_vtable", "_vtable_len")
+
+    def __init__(self, buf, pos: int):
+        self.buf = buf
+        self.pos = pos
+        _check(buf, pos, 4)
+        self._vtable = pos - _I32.unpack_from(buf, pos)[0]
+        _check(buf, self._vtable, 4)
+        self._vtable_len = _U16.unpack_from(buf, self._vtable)[0]
+
+    def _field_offset(self, field_index: int) -> int:
+        """Byte offset of field inside the table, or 0 if absent"""
+        slot = 4 + 2 * field_index
+        if slot + 2 > self._vtable_len:
+            return 0
+        return _U16.unpack_from(self.buf, self._vtable + slot)[0]
+
+    def has(self, field_index: int) -> bool:
+        return self._field_offset(field_index) != 0
+
+    def scalar(self, field_index: int, fmt: str, default=0):
+        off = self._field_offset(field_index)
+        if off == 0:
+            return default
+        pos = self.pos + off
+        _check(self.buf, pos, SCALAR_FORMATS[fmt])
+        return struct.unpack_from("<" + fmt, self.buf, pos)[0]
+
+    def _indirect(self, field_index: int):
+        """Absolute position the uoffset field points to, or None"""
+        off = self._field_offset(field_index)
+        if off == 0:
+            return None
+        pos = self.pos + off
+        _check(self.buf, pos, 4)
+        return pos + _U32.unpack_from(self.buf, pos)[0]
+
+    def table(self, field_index: int):
+        pos = self._indirect(field_index)
+        return None if pos is None else Table(self.buf, pos)
+
+    def string(self, field_index: int, default: str = None):
+        pos = self._indirect(field_index)
+        if pos is None:
+            return default
+        length = _U32.unpack_from(self.buf, pos)[0]
+        _check(self.buf, pos + 4, length)
+        return bytes(self.buf[pos + 4:pos + 4 + length]).decode("utf-8", errors="replace")
+
+    def vector_len(self, field_index: int) -> int:
+        pos = self._indirect(field_index)
+        if pos is None:
+            return 0
+        _check(self.buf, pos, 4)
+        return _U32.unpack_from(self.buf, pos)[0]
+
+    def vector_span(self, field_index: int, elem_size: int = 1):
+        """(absolute data offset, element count) of a vector, or (None, 0)"""
+        pos = self._indirect(field_index)
+        if pos is None:
+            return None, 0
+        count = _U32.unpack_from(self.buf, pos)[0]
+        _check(self.buf, pos + 4, count * elem_size)
+        return pos + 4, count
+
+    def scalar_vector(self, field_index: int, fmt: str) -> tuple:
+        """Small vector of scalars (shapes, offsets) decoded to a tuple"""
+        start, count = self.vector_span(field_index, SCALAR_FORMATS[fmt])
+        if start is None:
+            return ()
+        return struct.unpack_from(f"<{count}{fmt}", self.buf, start)
+
+    def table_vector(self, field_index: int):
+        """Lazy list of tables (each element is a uoffset)"""
+        start, count = self.vector_span(field_index, 4)
+        if start is None:
+            return []
+        return TableVector(self.buf, start, count)
+
+
+class TableVector:
+    """Sequence of tables decoded on access"""
+
+    __slots__ = ("buf", "start", "count")
+
+    def __init__(self, buf, start: int, count: int):
+        self.buf = buf
+        self.start = start
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i: int) -> Table:
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        pos = self.start + 4 * i
+        return Table(self.buf, pos + _U32.unpack_from(self.buf, pos)[0])
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+
+def root_table(buf, offset: int = 0) -> Table:
+    """Root table of a flatbuffer starting at `offset` within buf"""
+    _check(buf, offset, 8)
+    return Table(buf, offset + _U32.unpack_from(buf, offset)[0])
+
+
+def file_identifier(buf, offset: int = 0) -> bytes:
+    _check(buf, offset, 8)
+    return bytes(buf[offset + 4:offset + 8])
+
+
+def _check(buf, pos: int, size: int):
+    if pos < 0 or pos + size > len(buf):
+        raise FlatbufferError(
+            f"read of {size} bytes at offset {pos} outside buffer of {len(buf)} bytes"
+        )
@@ -0,0 +1,347 @@
+"""
+GGUF Reader (zero-copy)
+Parses GGUF KV metadata and the tensor-info table from an mmap
+
+Layout (ggml/docs/gguf.md, versions 2 and 3):
+    magic b"GGUF", version u32, tensor_count u64, kv_count u64
+    kv_count x (key string, value_type u32, value)
+    tensor_count x (name string, n_dims u32, dims u64[n_dims], ggml_type u32, offset u64)
+    padding to general.alignment (default 32)
+    tensor data (offsets above are relative to this point)
+
+Only the header region is touched, so a 1 GB+ model is summarised in
+milliseconds. Large metadata arrays (tokenizer vocab, merges) are skipped
+and recorded by type and length only.
+
+Usage:
+    python -m yi_tools.gguf <model.gguf> [--manifest manifest.json] [--tensors]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from collections import OrderedDict
+
+GGUF_MAGIC = b"GGUF"
+DEFAULT_ALIGNMENT = 32
+MAX_INLINE_ARRAY = 64  # arrays longer than this are summarised, not decoded
+
+# GGUF metadata value types
+(T_UINT8, T_INT8, T_UINT16, T_INT16, T_UINT32, T_INT32, T_FLOAT32, T_BOOL,
+ T_STRING, T_ARRAY, T_UINT64, T_INT64, T_FLOAT64) = range(13)
+_SCALAR_FORMATS = {
+    T_UINT8: "<B", T_INT8: "<b", T_UINT16: "<H", T_INT16: "<h", T_UINT32: "<I", T_INT32: "<i",
+    T_FLOAT32: "<f", T_BOOL: "<?", T_UINT64: "<Q", T_INT64: "<q", T_FLOAT64: "<d",
+}
+_TYPE_NAMES = {
+    T_UINT8: "uint8", T_INT8: "int8", T_UINT16: "uint16", T_INT16: "int16", T_UINT32: "uint32",
+    T_INT32: "int32", T_FLOAT32: "float32", T_BOOL: "bool", T_STRING: "string", T_ARRAY: "array",
+    T_UINT64: "uint64", T_INT64: "int64", T_FLOAT64: "float64",
+}
+
+# ggml_type -> (name, elements per block, bytes per block)
+GGML_TYPES = {
+    0: ("F32", 1, 4),
+    1: ("F16", 1, 2),
+    2: ("Q4_0", 32, 18),
+    3: ("Q4_1", 32, 20),
+    6: ("Q5_0", 32, 22),
+    7: ("Q5_1", 32, 24),
+    8: ("Q8_0", 32, 34),
+    9: ("Q8_1", 32, 36),
+    10: ("Q2_K", 256, 84),
+    11: ("Q3_K", 256, 110),
+    12: ("Q4_K", 256, 144),
+    13: ("Q5_K", 256, 176),
+    14: ("Q6_K", 256, 210),
+    15: ("Q8_K", 256, 292),
+    16: ("IQ2_XXS", 256, 66),
+    17: ("IQ2_XS", 256, 74),
+    18: ("IQ3_XXS", 256, 98),
+    19: ("IQ1_S", 256, 50),
+    20: ("IQ4_NL", 32, 18),
+    21: ("IQ3_S", 256, 110),
+    22: ("IQ2_S", 256, 82),
+    23: ("IQ4_XS", 256, 136),
+    24: ("I8", 1, 1),
+    25: ("I16", 1, 2),
+    26: ("I32", 1, 4),
+    27: ("I64", 1, 8),
+    28: ("F64", 1, 8),
+    29: ("IQ1_M", 256, 56),
+    30: ("BF16", 1, 2),
+    34: ("TQ1_0", 256, 54),
+    35: ("TQ2_0", 256, 66),
+}
+
+# general.file_type (llama_ftype) -> label
+FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1",
+    10: "Q2_K", 11: "Q3_K_S", 12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M",
+    16: "Q5_K_S", 17: "Q5_K_M", 18: "Q6_K", 19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S",
+    22: "IQ3_XS", 23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL", 26: "IQ3_S", 27: "IQ3_M",
+    28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16",
+}
+
+# Architecture-scoped keys worth copying into manifests ("{arch}." prefix)
+MODEL_KEYS = (
+    "context_length", "embedding_length", "block_count", "feed_forward_length",
+    "attention.head_count", "attention.head_count_kv", "attention.key_length",
+    "attention.value_length", "rope.freq_base", "vocab_size",
+)
+
+
+class GGUFFormatError(ValueError):
+    """File is not a well-formed GGUF model"""
+
+
+class GGUFFile:
+    """
+    Memory-mapped, read-only view of a GGUF file's header region
+
+    Usage:
+        with GGUFFile(path) as gguf:
+            print(gguf.quantization_summary())
+    """
+
+    def __init__(self, gguf_path: str):
+        self.path = str(gguf_path)
+        self._file = open(self.path, "rb")
+        self.size_bytes = os.fstat(self._file.fileno()).st_size
+        if self.size_bytes < 24:
+            self._file.close()
+            raise GGUFFormatError(f"File too small to be GGUF ({self.size_bytes} bytes)")
+        self.buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._pos = 0
+        try:
+            self._parse()
+        except (struct.error, UnicodeDecodeError) as e:
+            self.close()
+            raise GGUFFormatError(f"Corrupt GGUF header at offset {self._pos}: {e}") from e
+        except GGUFFormatError:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.buf.closed:
+            self.buf.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # -- primitive readers -------------------------------------------------
+
+    def _read(self, fmt: str):
+        value = struct.unpack_from(fmt, self.buf, self._pos)[0]
+        self._pos += struct.calcsize(fmt)
+        return value
+
+    def _read_string(self) -> str:
+        length = self._read("<Q")
+        if self._pos + length > self.size_bytes:
+            raise GGUFFormatError(f"String of {length} bytes at {self._pos} runs past end of file")
+        value = self.buf[self._pos:self._pos + length].decode("utf-8")
+        self._pos += length
+        return value
+
+    def _skip_string(self):
+        length = self._read("<Q")
+        self._pos += length
+
+    def _read_value(self, value_type: int):
+        if value_type in _SCALAR_FORMATS:
+            return self._read(_SCALAR_FORMATS[value_type])
+        if value_type == T_STRING:
+            return self._read_string()
+        if value_type == T_ARRAY:
+            elem_type = self._read("<I")
+            count = self._read("<Q")
+            if count <= MAX_INLINE_ARRAY:
+                return [self._read_value(elem_type) for _ in range(count)]
+            # Skip without decoding: fixed-size elements jump, strings walk lengths
+            if elem_type in _SCALAR_FORMATS:
+                self._pos += count * struct.calcsize(_SCALAR_FORMATS[elem_type])
+            elif elem_type == T_STRING:
+                for _ in range(count):
+                    self._skip_string()
+            else:
+                for _ in range(count):
+                    self._read_value(elem_type)
+            return {"type": _TYPE_NAMES.get(elem_type, str(elem_type)), "length": count}
+        raise GGUFFormatError(f"Unknown metadata value type {value_type}")
+
+    # -- header --------------------------------------------------------------
+
+    def _parse(self):
+        if self.buf[0:4] != GGUF_MAGIC:
+            raise GGUFFormatError(f"Bad magic {self.buf[0:4]!r} (expected {GGUF_MAGIC!r})")
+        self._pos = 4
+        self.version = self._read("<I")
+        if self.version not in (2, 3):
+            raise GGUFFormatError(f"Unsupported GGUF version {self.version}")
+        tensor_count = self._read("<Q")
+        kv_count = self._read("<Q")
+
+        self.metadata = OrderedDict()
+        for _ in range(kv_count):
+            key = self._read_string()
+            self.metadata[key] = self._read_value(self._read("<I"))
+
+        infos = []
+        for _ in range(tensor_count):
+            name = self._read_string()
+            n_dims = self._read("<I")
+            dims = struct.unpack_from(f"<{n_dims}Q", self.buf, self._pos)
+            self._pos += 8 * n_dims
+            ggml_type = self._read("<I")
+            offset = self._read("<Q")
+            infos.append((name, dims, ggml_type, offset))
+
+        self.alignment = int(self.metadata.get("general.alignment", DEFAULT_ALIGNMENT))
+        self.header_size = self._pos
+        self.data_offset = (self._pos + self.alignment - 1) // self.alignment * self.alignment
+
+        self.tensors = []
+        for name, dims, ggml_type, offset in infos:
+            type_name, block_elems, block_bytes = GGML_TYPES.get(ggml_type, (f"TYPE_{ggml_type}", 0, 0))
+            numel = 1
+            for dim in dims:
+                numel *= dim
+            nbytes = numel // block_elems * block_bytes if block_elems else None
+            self.tensors.append({
+                "name": name,
+                "shape": list(dims),
+                "ggml_type": type_name,
+                "numel": numel,
+                "nbytes": nbytes,
+                "bpw": round(block_bytes * 8 / block_elems, 4) if block_elems else None,
+                "offset": self.data_offset + offset,
+            })
+
+    @property
+    def architecture(self) -> str:
+        return self.metadata.get("general.architecture", "")
+
+    @property
+    def file_type(self) -> str:
+        file_type = self.metadata.get("general.file_type")
+        return FILE_TYPES.get(file_type, f"UNKNOWN_{file_type}" if file_type is not None else None)
+
+    def model_params(self) -> dict:
+        """Architecture hyper-parameters ({arch}.block_count etc.) with the prefix stripped"""
+        arch = self.architecture
+        params = {}
+        for key in MODEL_KEYS:
+            value = self.metadata.get(f"{arch}.{key}")
+            if value is not None:
+                params[key] = value
+        tokens = self.metadata.get("tokenizer.ggml.tokens")
+        if "vocab_size" not in params and isinstance(tokens, dict):
+            params["vocab_size"] = tokens["length"]
+        return params
+
+    def validate_spans(self) -> list:
+        """Problems with tensor data that falls outside the file or overlaps"""
+        problems = []
+        spans = sorted((t["offset"], t["nbytes"] or 0, t["name"]) for t in self.tensors)
+        prev_end, prev_name = self.data_offset, None
+        for offset, nbytes, name in spans:
+            if offset % self.alignment:
+                problems.append(f"{name}: offset {offset} not aligned to {self.alignment}")
+            if offset < prev_end:
+                problems.append(f"{name}: overlaps {prev_name or 'header'}")
+            if offset + nbytes > self.size_bytes:
+                problems.append(f"{name}: data [{offset:,} +{nbytes:,}] exceeds file size {self.size_bytes:,}")
+            prev_end, prev_name = offset + nbytes, name
+        return problems
+
+    def quantization_summary(self) -> dict:
+        """Per-type totals and effective bits-per-weight over all tensors"""
+        by_type = OrderedDict()
+        total_params = 0
+        total_bytes = 0
+        for tensor in self.tensors:
+            bucket = by_type.setdefault(tensor["ggml_type"], {"tensors": 0, "params": 0, "bytes": 0})
+            bucket["tensors"] += 1
+            bucket["params"] += tensor["numel"]
+            bucket["bytes"] += tensor["nbytes"] or 0
+            total_params += tensor["numel"]
+            total_bytes += tensor["nbytes"] or 0
+        for bucket in by_type.values():
+            bucket["bpw"] = round(bucket["bytes"] * 8 / bucket["params"], 4) if bucket["params"] else None
+        return {
+            "file_type": self.file_type,
+            "tensor_count": len(self.tensors),
+            "total_params": total_params,
+            "tensor_data_bytes": total_bytes,
+            "effective_bpw": round(total_bytes * 8 / total_params, 4) if total_params else None,
+            "by_type": dict(sorted(by_type.items(), key=lambda kv: -kv[1]["params"])),
+        }
+
+    def manifest_entry(self, include_tensors: bool = True) -> dict:
+        """Summary block recorded under "gguf" in model manifests"""
+        entry = {
+            "version": self.version,
+            "architecture": self.architecture,
+            "name": self.metadata.get("general.name"),
+            "alignment": self.alignment,
+            "data_offset": self.data_offset,
+            "model_params": self.model_params(),
+            "quantization": self.quantization_summary(),
+        }
+        if include_tensors:
+            entry["tensors"] = [
+                {k: t[k] for k in ("name", "ggml_type", "bpw", "offset", "shape")}
+                for t in self.tensors
+            ]
+        return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise GGUF metadata and tensor quantization")
+    parser.add_argument("gguf_file", help="Path to .gguf file")
+    parser.add_argument("--manifest", help="Write the summary under \"gguf\" in this manifest.json")
+    parser.add_argument("--tensors", action="store_true", help="Print every tensor")
+    args = parser.parse_args()
+
+    with GGUFFile(args.gguf_file) as gguf:
+        summary = gguf.quantization_summary()
+        problems = gguf.validate_spans()
+        print(f"GGUF v{gguf.version}  arch={gguf.architecture}  file_type={summary['file_type']}")
+        print(f"Tensors: {summary['tensor_count']}  params: {summary['total_params']:,}  "
+              f"effective bpw: {summary['effective_bpw']}")
+        for type_name, bucket in summary["by_type"].items():
+            print(f"  {type_name:<8} {bucket['tensors']:>4} tensors  {bucket['params']:>14,} params  "
+                  f"{bucket['bpw']} bpw")
+        if args.tensors:
+            for tensor in gguf.tensors:
+                print(f"  {tensor['name']:<48} {tensor['ggml_type']:<8} {tensor['bpw']:>7} bpw  "
+                      f"@{tensor['offset']:,}  {tensor['shape']}")
+        for problem in problems:
+            print(f"  ERROR: {problem}")
+
+        if args.manifest:
+            manifest = {}
+            if os.path.exists(args.manifest):
+                with open(args.manifest, "r") as f:
+                    manifest = json.load(f)
+            manifest["gguf"] = gguf.manifest_entry()
+            if summary["file_type"]:
+                manifest["quantization"] = summary["file_type"]
+            with open(args.manifest, "w") as f:
+                json.dump(manifest, f, indent=2)
+            print(f"Manifest updated: {args.manifest}")
+
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+llama.cpp Runtime Benchmark Engine (llama-cpp-python)
+Measures the GGUF metrics published under `baseline_metrics` in manifests
+
+Per language (ko/en/zh/ja) the same chat turn is evaluated:
+- prompt_eval_speed: prompt tokens / prompt evaluation time (tok/s)
+- ttft_ms:           prompt evaluation + first greedy token
+- tokens_per_second: decode rate over the remaining generated tokens
+plus load_time_ms for constructing the model (mmap'd, as on device).
+
+Results use the manifest schema ({"korean": ..., "english": ...}), so they
+can be written back or diffed against `baseline_metrics` directly.
+"""
+
+import importlib
+import time
+
+from yi_tools.bench_stats import summarize
+from yi_tools.lazy import is_available
+
+# language code -> manifest key
+LANGUAGE_KEYS = {"ko": "korean", "en": "english", "zh": "chinese", "ja": "japanese"}
+
+# One emotional-support opening turn per language (same intent as
+# prompts/scenarios_10turn.md, Scenario 1)
+LANGUAGE_PROMPTS = {
+    "ko": "친구에게 무시당했고 마음이 아파. 점심시간에 내가 말을 걸었는데 쳐다보지도 않았어.",
+    "en": "My friend ignored me and it really hurts. I talked to them at lunch and they didn't even look at me.",
+    "zh": "朋友不理我，我心里很难受。午饭的时候我跟他说话，他连看都没看我一眼。",
+    "ja": "友達に無視されて、心が痛い。昼休みに話しかけたのに、こっちを見てもくれなかった。",
+}
+
+# Metrics where a larger value is a regression
+LOWER_IS_BETTER = {"load_time_ms", "ttft_ms"}
+BASELINE_METRICS = ("load_time_ms", "ttft_ms", "tokens_per_second", "prompt_eval_speed")
+
+
+class LlamaCppUnavailable(RuntimeError):
+    """llama-cpp-python is not installed"""
+
+
+def runtime_available() -> bool:
+    return is_available("llama_cpp")
+
+
+class GGUFRunner:
+    """One GGUF model loaded through llama-cpp-python"""
+
+    def __init__(
+        self,
+        model_path: str,
+        n_ctx: int = 512,
+        n_threads: int = None,
+        n_threads_batch: int = None,
+        use_mmap: bool = True,
+        use_mlock: bool = False,
+    ):
+        if not runtime_available():
+            raise LlamaCppUnavailable("llama-cpp-python not installed (pip install llama-cpp-python)")
+        llama_cpp = importlib.import_module("llama_cpp")
+
+        self.model_path = model_path
+        self.n_ctx = n_ctx
+        start_time = time.perf_counter()
+        self.llm = llama_cpp.Llama(
+            model_path=model_path,
+            n_ctx=n_ctx,
+            n_threads=n_threads,
+            n_threads_batch=n_threads_batch,
+            use_mmap=use_mmap,
+            use_mlock=use_mlock,
+            verbose=False,
+        )
+        self.load_ms = (time.perf_counter() - start_time) * 1000
+        self.version = getattr(llama_cpp, "__version__", None)
+        template = (self.llm.metadata or {}).get("tokenizer.chat_template", "")
+        self.chat_format = "chatml" if "<|im_start|>" in template else "raw"
+
+    def describe(self) -> dict:
+        return {
+            "backend": "llama.cpp",
+            "llama_cpp_python": self.version,
+            "n_ctx": self.n_ctx,
+            "n_threads": getattr(self.llm, "n_threads", None),
+            "n_threads_batch": getattr(self.llm, "n_threads_batch", None),
+            "chat_format": self.chat_format,
+            "load_ms": round(self.load_ms, 2),
+        }
+
+    def format_prompt(self, text: str) -> str:
+        if self.chat_format == "chatml":
+            return f"<|im_start|>user\n{text}<|im_end|>\n<|im_start|>assistant\n"
+        return text
+
+    def generate_timed(self, prompt: str, max_new_tokens: int, mark=None) -> dict:
+        """Greedy generation from a fresh context, timed per phase"""
+        mark = mark or (lambda phase: None)
+        llm = self.llm
+        tokens = llm.tokenize(self.format_prompt(prompt).encode("utf-8"), add_bos=True, special=True)
+        tokens = tokens[:max(1, self.n_ctx - max_new_tokens)]
+        eos = llm.token_eos()
+
+        llm.reset()
+        mark("prefill")
+        start = time.perf_counter()
+        llm.eval(tokens)
+        prompt_done = time.perf_counter()
+        token = llm.sample(temp=0.0)
+        first = time.perf_counter()
+        mark("decode")
+
+        decoded = 0
+        for _ in range(max_new_tokens - 1):
+            if token == eos:
+                break
+            llm.eval([token])
+            token = llm.sample(temp=0.0)
+            decoded += 1
+        end = time.perf_counter()
+
+        prompt_s = prompt_done - start
+        decode_s = end - first
+        return {
+            "prompt_tokens": len(tokens),
+            "generated_tokens": decoded + 1,
+            "prompt_eval_speed": len(tokens) / prompt_s if prompt_s else None,
+            "ttft_ms": (first - start) * 1000,
+            "tokens_per_second": decoded / decode_s if decoded and decode_s else None,
+        }
+
+    def benchmark_languages(
+        self,
+        languages: list = None,
+        prompts: dict = None,
+        max_new_tokens: int = 64,
+        warmup: int = 1,
+        repeats: int = 3,
+        mark=None,
+    ) -> dict:
+        """
+        Per-language benchmark in manifest `baseline_metrics` schema
+
+        Returns:
+            Dict with `metrics` (load_time_ms + per-language p50 values keyed
+            "korean"/"english"/...) and `details` (full summaries per language)
+        """
+        languages = languages or list(LANGUAGE_KEYS)
+        prompts = {**LANGUAGE_PROMPTS, **(prompts or {})}
+        metrics = {"load_time_ms": round(self.load_ms, 1), "ttft_ms": {}, "tokens_per_second": {},
+                   "prompt_eval_speed": {}}
+        details = {}
+
+        for code in languages:
+            key = LANGUAGE_KEYS.get(code, code)
+            runs = []
+            for run in range(warmup + repeats):
+                result = self.generate_timed(prompts[code], max_new_tokens, mark)
+                if run >= warmup:
+                    runs.append(result)
+
+            summary = {
+                name: summarize([r[name] for r in runs if r[name] is not None])
+                for name in ("ttft_ms", "tokens_per_second", "prompt_eval_speed")
+            }
+            summary["prompt_tokens"] = runs[-1]["prompt_tokens"]
+            summary["generated_tokens"] = [r["generated_tokens"] for r in runs]
+            summary["samples"] = {
+                name: [round(r[name], 3) for r in runs if r[name] is not None]
+                for name in ("ttft_ms", "tokens_per_second", "prompt_eval_speed")
+            }
+            details[key] = summary
+            for name in ("ttft_ms", "tokens_per_second", "prompt_eval_speed"):
+                metrics[name][key] = round(summary[name]["p50"], 1) if summary[name] else None
+
+        return {**self.describe(), "metrics": metrics, "details": details,
+                "max_new_tokens": max_new_tokens, "warmup": warmup, "repeats": repeats}
+
+
+def compare_to_baseline(measured: dict, baseline: dict, tolerance: float = 0.10) -> dict:
+    """
+    Diff measured metrics against a manifest's `baseline_metrics`
+
+    A metric regresses when it is worse than baseline by more than
+    `tolerance` (fraction): higher for load/TTFT, lower for throughput.
+
+    Returns:
+        Dict with `rows` [{metric, language, baseline, measured, delta_pct,
+        status}] and overall `status` PASS/FAIL
+    """
+    rows = []
+
+    def add(metric, language, base, value):
+        if base is None or value is None:
+            status, delta_pct = "UNKNOWN", None
+        else:
+            delta_pct = (value - base) / base if base else 0.0
+            worse = delta_pct > tolerance if metric in LOWER_IS_BETTER else delta_pct < -tolerance
+            status = "REGRESSION" if worse else "OK"
+        rows.append({
+            "metric": metric,
+            "language": language,
+            "baseline": base,
+            "measured": value,
+            "delta_pct": round(delta_pct * 100, 1) if delta_pct is not None else None,
+            "status": status,
+        })
+
+    for metric in BASELINE_METRICS:
+        base, value = baseline.get(metric), measured.get(metric)
+        if isinstance(base, dict) or isinstance(value, dict):
+            base, value = base or {}, value or {}
+            for language in list(base) + [k for k in value if k not in base]:
+                add(metric, language, base.get(language), value.get(language))
+        elif base is not None or value is not None:
+            add(metric, None, base, value)
+
+    return {
+        "tolerance": tolerance,
+        "rows": rows,
+        "status": "FAIL" if any(r["status"] == "REGRESSION" for r in rows) else "PASS",
+    }
@@ -0,0 +1,274 @@
+"""
+Artifact Hashing Engine
+mmap-backed, multi-threaded SHA256 for multi-GB model artifacts (.pte/.onnx/.gguf)
+
+Two digests are produced:
+1. Classic whole-file SHA256 (compatible with `shasum -a 256` and older manifests)
+2. Block tree hash: the file is split into fixed-size blocks, each block is
+   hashed on a thread pool, and the block digests are folded into a binary
+   Merkle root. This parallelises across cores and lets a mismatch be pinned
+   to a single block.
+
+hashlib releases the GIL while hashing large buffers, so plain threads scale
+with core count without copying the mapped file.
+
+Exporters can avoid the read-back pass entirely by writing through
+HashingWriter, which produces the same digests as bytes go to disk.
+"""
+
+import hashlib
+import io
+import mmap
+import os
+
+TREE_ALGORITHM = "sha256-tree-v1"
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024  # 16 MiB
+STREAM_CHUNK_SIZE = 4 * 1024 * 1024    # 4 MiB slices for the serial SHA256
+
+
+def default_workers() -> int:
+    """Number of hashing threads (one per available core)"""
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return max(1, os.cpu_count() or 1)
+
+
+def _open_mapped(file_path: str):
+    """Open file and map it read-only; returns (file, mmap) or (file, None) if empty"""
+    f = open(file_path, "rb")
+    if os.fstat(f.fileno()).st_size == 0:
+        return f, None
+    return f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _sha256_view(view) -> str:
+    """SHA256 of a buffer, fed in slices so large views do not stall the hasher"""
+    sha256 = hashlib.sha256()
+    for offset in range(0, len(view), STREAM_CHUNK_SIZE):
+        sha256.update(view[offset:offset + STREAM_CHUNK_SIZE])
+    return sha256.hexdigest()
+
+
+def merkle_root(block_digests: list) -> str:
+    """
+    Fold hex block digests into a binary Merkle root
+
+    Parent = sha256(left || right) over raw digest bytes; an odd node at the
+    end of a level is promoted unchanged. An empty file has root sha256(b"").
+    """
+    if not block_digests:
+        return hashlib.sha256(b"").hexdigest()
+
+    level = [bytes.fromhex(d) for d in block_digests]
+    while len(level) > 1:
+        parents = []
+        for i in range(0, len(level) - 1, 2):
+            parents.append(hashlib.sha256(level[i] + level[i + 1]).digest())
+        if len(level) % 2 == 1:
+            parents.append(level[-1])
+        level = parents
+    return level[0].hex()
+
+
+def sha256_file(file_path: str) -> str:
+    """Classic whole-file SHA256 (hex), streamed from a memory map"""
+    f, mm = _open_mapped(file_path)
+    try:
+        if mm is None:
+            return hashlib.sha256(b"").hexdigest()
+        with memoryview(mm) as view:
+            return _sha256_view(view)
+    finally:
+        if mm is not None:
+            mm.close()
+        f.close()
+
+
+def hash_artifact(
+    file_path: str,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    workers: int = None,
+    full_sha256: bool = True,
+) -> dict:
+    """
+    Hash an artifact with the block tree (and optionally whole-file SHA256)
+
+    The serial whole-file SHA256 runs on the same pool as the block hashes, so
+    requesting both costs roughly max(serial pass, parallel pass).
+
+    Args:
+        file_path: Path to artifact
+        block_size: Tree block size in bytes
+        workers: Thread count (default: one per core)
+        full_sha256: Also compute the classic whole-file SHA256
+
+    Returns:
+        Dict with size_bytes, sha256 (or None) and tree_hash
+        ({algorithm, block_size, root, blocks})
+    """
+    # Deferred: concurrent.futures pulls in logging/threading at import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    if block_size <= 0:
+        raise ValueError(f"block_size must be positive, got {block_size}")
+
+    workers = workers or default_workers()
+    f, mm = _open_mapped(file_path)
+    try:
+        size_bytes = 0 if mm is None else len(mm)
+        blocks = []
+        sha256 = hashlib.sha256(b"").hexdigest() if full_sha256 else None
+
+        if mm is not None:
+            view = memoryview(mm)
+            try:
+                # Extra worker so the serial SHA256 never starves block hashing
+                pool_size = workers + 1 if full_sha256 else workers
+                with ThreadPoolExecutor(max_workers=pool_size) as pool:
+                    full_future = pool.submit(_sha256_view, view) if full_sha256 else None
+                    block_futures = [
+                        pool.submit(_sha256_view, view[offset:offset + block_size])
+                        for offset in range(0, size_bytes, block_size)
+                    ]
+                    blocks = [future.result() for future in block_futures]
+                    if full_future is not None:
+                        sha256 = full_future.result()
+            finally:
+                view.release()
+
+        return {
+            "size_bytes": size_bytes,
+            "sha256": sha256,
+            "tree_hash": {
+                "algorithm": TREE_ALGORITHM,
+                "block_size": block_size,
+                "root": merkle_root(blocks),
+                "blocks": blocks,
+            },
+        }
+    finally:
+        if mm is not None:
+            mm.close()
+        f.close()
+
+
+def diff_blocks(expected: list, actual: list) -> list:
+    """Indices of blocks whose digests differ (length mismatch counts too)"""
+    mismatched = [
+        i for i, (a, b) in enumerate(zip(expected, actual)) if a != b
+    ]
+    longer = max(len(expected), len(actual))
+    mismatched.extend(range(min(len(expected), len(actual)), longer))
+    return mismatched
+
+
+class HashingWriter:
+    """
+    Write-only file wrapper that hashes bytes as they go to disk
+
+    Produces the same dict as hash_artifact() (size, whole-file SHA256 and
+    block tree) without re-reading the file. Only sequential writes are
+    supported; seeking raises io.UnsupportedOperation so a writer that
+    back-patches its output cannot produce a silently wrong digest.
+
+    Usage:
+        with HashingWriter(path) as f:
+            program.write_to_file(f)
+        digest = f.digest()
+    """
+
+    def __init__(self, file_path: str, block_size: int = DEFAULT_BLOCK_SIZE, fsync: bool = True):
+        if block_size <= 0:
+            raise ValueError(f"block_size must be positive, got {block_size}")
+        self.file_path = str(file_path)
+        self.block_size = block_size
+        self.fsync = fsync
+        self._file = open(self.file_path, "wb")
+        self._sha256 = hashlib.sha256()
+        self._pending = bytearray()
+        self._blocks = []
+        self._size = 0
+        self._digest = None
+
+    def write(self, data) -> int:
+        if self._file.closed:
+            raise ValueError("write to closed HashingWriter")
+        with memoryview(data) as view:
+            view = view.cast("B")
+            n = len(view)
+            self._file.write(view)
+            self._sha256.update(view)
+            self._size += n
+
+            offset = 0
+            if self._pending:
+                take = min(self.block_size - len(self._pending), n)
+                self._pending += view[:take]
+                offset = take
+                if len(self._pending) == self.block_size:
+                    self._blocks.append(hashlib.sha256(self._pending).hexdigest())
+                    self._pending.clear()
+            # Full blocks straight from the caller's buffer, no copy
+            while n - offset >= self.block_size:
+                self._blocks.append(hashlib.sha256(view[offset:offset + self.block_size]).hexdigest())
+                offset += self.block_size
+            if offset < n:
+                self._pending += view[offset:]
+        return n
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def tell(self) -> int:
+        return self._size
+
+    def seek(self, *args):
+        raise io.UnsupportedOperation("HashingWriter only supports sequential writes")
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self):
+        self._file.flush()
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self._pending:
+            self._blocks.append(hashlib.sha256(self._pending).hexdigest())
+            self._pending.clear()
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._digest = {
+            "size_bytes": self._size,
+            "sha256": self._sha256.hexdigest(),
+            "tree_hash": {
+                "algorithm": TREE_ALGORITHM,
+                "block_size": self.block_size,
+                "root": merkle_root(self._blocks),
+                "blocks": list(self._blocks),
+            },
+        }
+
+    def digest(self) -> dict:
+        """Digest of everything written; closes the file first if still open"""
+        self.close()
+        return self._digest
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,59 @@
+"""
+Lazy Imports for Heavy Backends
+Keeps torch/executorch/onnxruntime/transformers out of tool startup
+
+Structural checks (guards, coverage, hashing) only need file metadata, so
+nothing here imports a backend until an attribute is actually used.
+is_available() answers "is it installed?" from the import system's finder
+without executing the package.
+
+Usage:
+    from yi_tools.lazy import is_available, lazy_import
+
+    if is_available("executorch"):
+        portable_lib = lazy_import("executorch.extension.pybindings.portable_lib")
+        module = portable_lib._load_for_executorch(path)  # imported here
+"""
+
+import importlib
+import importlib.util
+import sys
+
+HEAVY_BACKENDS = ("torch", "executorch", "onnxruntime", "transformers", "optimum", "llama_cpp")
+
+
+def is_available(name: str) -> bool:
+    """True if the top-level package of `name` is installed (not imported)"""
+    top = name.split(".", 1)[0]
+    if top in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(top) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def lazy_import(name: str):
+    """
+    Module object for `name` whose body runs on first attribute access
+
+    Parent packages of a dotted name are imported eagerly by the import
+    system; only the leaf module is deferred. Raises ImportError right away
+    if the module cannot be found.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def loaded_backends() -> list:
+    """Heavy backends already imported in this process"""
+    return [name for name in HEAVY_BACKENDS if name in sys.modules]
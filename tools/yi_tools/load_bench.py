@@ -0,0 +1,376 @@
+"""
+Model-Load Path Benchmark (mmap / read / mlock)
+Time-to-first-token from process start and resident memory after load
+
+InferenceService loads with `use_mlock: true` and the Qwen manifest
+records load_time_ms 290, but the alternatives were never measured. Every
+run here is a fresh child process (so nothing is already mapped) that
+loads the model one way, evaluates one chat turn and reports:
+
+- ttft_from_start_ms: process spawn -> first token (interpreter start,
+  runtime import, load, prefill)
+- the phase split: startup_ms, import_ms, load_ms, first_token_ms
+- RSS / anonymous / file-backed / locked (VmLck) MB after load and after
+  the first token
+
+Load paths:
+- mmap:  llama.cpp use_mmap; ExecuTorch's default mmap data loader -
+         weights are paged in lazily and stay reclaimable page cache
+- read:  llama.cpp use_mmap=false; ExecuTorch from an in-memory buffer;
+         ONNX Runtime's only load path - weights are copied to anonymous memory
+- mlock: llama.cpp use_mlock (mmap + mlock); for ExecuTorch the .pte's
+         mappings are mlock'ed after loading (what MmapDataLoader's
+         MlockConfig does on device) - pinned, never reclaimed
+
+Cold runs evict the file from the page cache first with
+posix_fadvise(POSIX_FADV_DONTNEED), which needs no root (pages still
+mapped by another process stay resident). Warm runs read the file once
+beforehand. mlock is capped by RLIMIT_MEMLOCK; the limit and the locked
+MB are reported so a silently failed lock is visible.
+
+Usage:
+    python -m yi_tools load model.gguf [--modes mmap,read,mlock] [--repeats 3] [--warm-only]
+        [--json-output out.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from yi_tools.cli import TOOLS_DIR
+from yi_tools.mem_sampler import read_smaps_rollup, read_status
+
+MODES = ("mmap", "read", "mlock")
+
+
+def backend_for(model_path: str) -> str:
+    ext = os.path.splitext(model_path.lower())[1]
+    return {".gguf": "llama.cpp", ".onnx": "onnxruntime", ".ort": "onnxruntime"}.get(ext, "executorch")
+
+
+def supported_modes(backend: str) -> tuple:
+    # ONNX Runtime always copies initializers out of the file: nothing to map or lock
+    return ("read",) if backend == "onnxruntime" else MODES
+
+
+def model_files(model_path: str) -> list:
+    """The model plus an ONNX external-data sidecar"""
+    files = [model_path]
+    if os.path.exists(model_path + ".data"):
+        files.append(model_path + ".data")
+    return files
+
+
+def drop_page_cache(path: str) -> bool:
+    """Ask the kernel to evict `path` from the page cache (no root needed)"""
+    if not hasattr(os, "posix_fadvise"):
+        return False
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fdatasync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+    return True
+
+
+def warm_page_cache(path: str, chunk: int = 1 << 22):
+    with open(path, "rb", buffering=0) as f:
+        while f.read(chunk):
+            pass
+
+
+def memlock_limit_mb() -> float:
+    """Soft RLIMIT_MEMLOCK in MB (None = unlimited or unknown)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    soft, _ = resource.getrlimit(resource.RLIMIT_MEMLOCK)
+    return None if soft == resource.RLIM_INFINITY else soft / (1024 ** 2)
+
+
+def mlock_file_mappings(path: str) -> int:
+    """mlock every mapping of `path` in this process; returns the bytes locked"""
+    import ctypes
+    import ctypes.util
+
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    libc.mlock.argtypes = (ctypes.c_void_p, ctypes.c_size_t)
+    target = os.path.realpath(path)
+    locked = 0
+    with open("/proc/self/maps", "r") as f:
+        for line in f:
+            fields = line.split(maxsplit=5)
+            if len(fields) == 6 and fields[5].strip() == target:
+                start, end = (int(x, 16) for x in fields[0].split("-"))
+                if libc.mlock(start, end - start) != 0:
+                    raise OSError(ctypes.get_errno(), f"mlock failed: {os.strerror(ctypes.get_errno())}")
+                locked += end - start
+    return locked
+
+
+def _memory() -> dict:
+    status = read_status()
+    try:
+        values = read_smaps_rollup()
+    except (OSError, KeyError, ValueError):
+        values = status
+    values["locked_mb"] = status.get("locked_mb")
+    return {k: round(values[k], 1) if values.get(k) is not None else None
+            for k in ("rss_mb", "anon_mb", "file_mb", "locked_mb")}
+
+
+# -- child ---------------------------------------------------------------
+
+
+def _first_token_llama(runner) -> int:
+    from yi_tools.gguf_runtime import LANGUAGE_PROMPTS
+
+    llm = runner.llm
+    ids = llm.tokenize(runner.format_prompt(LANGUAGE_PROMPTS["ko"]).encode("utf-8"), add_bos=True, special=True)
+    llm.eval(ids[:max(1, runner.n_ctx - 1)])
+    return llm.sample(temp=0.0)
+
+
+def child(model_path: str, mode: str, n_ctx: int, prompt_tokens: int) -> dict:
+    """One load + first token in this (fresh) process"""
+    t_main = time.time()
+    backend = backend_for(model_path)
+    result = {"mode": mode}
+
+    if backend == "llama.cpp":
+        from yi_tools.gguf_runtime import GGUFRunner
+
+        import llama_cpp  # noqa: F401
+        t_import = time.time()
+        runner = GGUFRunner(model_path, n_ctx=n_ctx, use_mmap=mode != "read", use_mlock=mode == "mlock")
+        t_load = time.time()
+        memory_load = _memory()
+        _first_token_llama(runner)
+    else:
+        if backend == "onnxruntime":
+            from yi_tools.ort_runtime import ORTRunner
+
+            import onnxruntime  # noqa: F401
+            t_import = time.time()
+            runner = ORTRunner(model_path)
+        else:
+            import importlib
+
+            from yi_tools.pte_runtime import PYBINDINGS_MODULE, PTERunner
+
+            importlib.import_module(PYBINDINGS_MODULE)
+            t_import = time.time()
+            runner = PTERunner(model_path, from_buffer=mode == "read")
+        if mode == "mlock":
+            result["mlocked_mb"] = round(mlock_file_mappings(model_path) / (1024 ** 2), 1)
+        t_load = time.time()
+        memory_load = _memory()
+        ids = runner.synthetic_prompt(prompt_tokens)
+        if runner.window and runner.window > 1:
+            ids = ids[:runner.window - 1] if runner.layout == "full_window" else ids[:runner.window]
+        runner.prefill(ids)
+    t_first = time.time()
+
+    result.update({
+        "t_main": t_main,
+        "t_first_token": t_first,
+        "import_ms": round((t_import - t_main) * 1000, 2),
+        "load_ms": round((t_load - t_import) * 1000, 2),
+        "first_token_ms": round((t_first - t_load) * 1000, 2),
+        "after_load": memory_load,
+        "after_first_token": _memory(),
+    })
+    return result
+
+
+# -- parent --------------------------------------------------------------
+
+
+def run_once(model_path: str, mode: str, cold: bool, n_ctx: int = 512, prompt_tokens: int = 32) -> dict:
+    """Spawn one child; TTFT is measured from just before the spawn"""
+    files = model_files(model_path)
+    if cold:
+        evicted = all(drop_page_cache(path) for path in files)
+    else:
+        for path in files:
+            warm_page_cache(path)
+        evicted = False
+
+    command = [sys.executable, "-m", "yi_tools", "load", os.path.abspath(model_path), "--child", mode,
+               "--n-ctx", str(n_ctx), "--prompt-tokens", str(prompt_tokens)]
+    t_spawn = time.time()
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=TOOLS_DIR)
+    if completed.returncode != 0:
+        lines = (completed.stdout + completed.stderr).strip().splitlines()
+        raise RuntimeError(f"{mode} load failed: {lines[-1] if lines else completed.returncode}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    result["cache"] = "cold" if cold else "warm"
+    result["page_cache_dropped"] = evicted
+    result["startup_ms"] = round((result.pop("t_main") - t_spawn) * 1000, 2)
+    result["ttft_from_start_ms"] = round((result.pop("t_first_token") - t_spawn) * 1000, 2)
+    return result
+
+
+def _median(runs: list, *keys):
+    values = []
+    for run in runs:
+        value = run
+        for key in keys:
+            value = value.get(key) if value else None
+        if value is not None:
+            values.append(value)
+    return round(statistics.median(values), 2) if values else None
+
+
+def summarize_runs(runs: list) -> list:
+    """Median per (mode, cache) over the repeats"""
+    rows = []
+    for mode in dict.fromkeys(r["mode"] for r in runs):
+        for cache in ("cold", "warm"):
+            at = [r for r in runs if r["mode"] == mode and r["cache"] == cache]
+            if not at:
+                continue
+            rows.append({
+                "mode": mode,
+                "cache": cache,
+                "runs": len(at),
+                **{key: _median(at, key) for key in
+                   ("ttft_from_start_ms", "startup_ms", "import_ms", "load_ms", "first_token_ms")},
+                **{f"load_{key}": _median(at, "after_load", key) for key in
+                   ("rss_mb", "anon_mb", "file_mb", "locked_mb")},
+                "first_token_rss_mb": _median(at, "after_first_token", "rss_mb"),
+            })
+    return rows
+
+
+def run_benchmark(
+    model_path: str,
+    modes: list = None,
+    repeats: int = 3,
+    cold: bool = True,
+    warm: bool = True,
+    n_ctx: int = 512,
+    prompt_tokens: int = 32,
+    progress=None,
+) -> dict:
+    backend = backend_for(model_path)
+    modes = [m for m in (modes or MODES) if m in supported_modes(backend)]
+    caches = [c for c, on in ((True, cold), (False, warm)) if on]
+
+    runs, errors = [], []
+    # Interleave modes so drift (thermal, background load) hits all of them
+    for _ in range(repeats):
+        for is_cold in caches:
+            for mode in modes:
+                try:
+                    run = run_once(model_path, mode, is_cold, n_ctx, prompt_tokens)
+                    runs.append(run)
+                except (RuntimeError, ValueError, OSError) as e:
+                    run = {"mode": mode, "cache": "cold" if is_cold else "warm", "error": str(e)}
+                    errors.append(run)
+                if progress:
+                    progress(run)
+
+    return {
+        "model": model_path,
+        "backend": backend,
+        "size_mb": round(sum(os.path.getsize(p) for p in model_files(model_path)) / (1024 ** 2), 1),
+        "n_ctx": n_ctx,
+        "memlock_limit_mb": memlock_limit_mb(),
+        "modes": modes,
+        "repeats": repeats,
+        "runs": runs,
+        "errors": errors,
+        "summary": summarize_runs(runs),
+    }
+
+
+def print_summary(result: dict, indent: str = ""):
+    print(f"{indent}{'mode':<6} {'cache':<5} {'ttft*':>9} {'startup':>8} {'import':>8} {'load':>8} {'1st tok':>8} "
+          f"{'rss':>8} {'anon':>8} {'file':>8} {'locked':>7}")
+    for row in result["summary"]:
+        cells = [row["ttft_from_start_ms"], row["startup_ms"], row["import_ms"], row["load_ms"],
+                 row["first_token_ms"], row["load_rss_mb"], row["load_anon_mb"], row["load_file_mb"]]
+        text = " ".join(f"{c:>8.1f}" if c is not None else f"{'-':>8}" for c in cells)
+        locked = f"{row['load_locked_mb']:.1f}" if row["load_locked_mb"] is not None else "-"
+        print(f"{indent}{row['mode']:<6} {row['cache']:<5} {text} {locked:>7}")
+    print(f"{indent}(* ms from process spawn to first token; memory in MB after load)")
+
+
+def mlock_verdict(result: dict) -> str:
+    """One line: what mlock costs in pinned memory and buys in TTFT vs mmap"""
+    by = {(r["mode"], r["cache"]): r for r in result["summary"]}
+    for cache in ("cold", "warm"):
+        mmap_row, mlock_row = by.get(("mmap", cache)), by.get(("mlock", cache))
+        if mmap_row and mlock_row and mmap_row["ttft_from_start_ms"] and mlock_row["ttft_from_start_ms"]:
+            delta = mlock_row["ttft_from_start_ms"] - mmap_row["ttft_from_start_ms"]
+            pinned = mlock_row["load_locked_mb"] or 0.0
+            return (f"mlock vs mmap ({cache}): TTFT {delta:+.1f} ms, {pinned:.1f} MB pinned "
+                    f"(RSS {mlock_row['load_rss_mb']:.1f} vs {mmap_row['load_rss_mb']:.1f} MB after load)")
+    return "mlock vs mmap: not measured"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare mmap / read / mlock model loading (TTFT from process start, RSS)")
+    parser.add_argument("model", help="Path to .gguf, .pte or .onnx")
+    parser.add_argument("--modes", help=f"Comma-separated load paths (default: {','.join(MODES)})")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per mode and cache state (default: 3)")
+    parser.add_argument("--cold-only", action="store_true", help="Only runs with the file evicted from the page cache")
+    parser.add_argument("--warm-only", action="store_true", help="Only runs with the file in the page cache")
+    parser.add_argument("--n-ctx", type=int, default=512, help="llama.cpp context (default: 512, as InferenceService)")
+    parser.add_argument("--prompt-tokens", type=int, default=32, help="Prompt length for .pte/.onnx (default: 32)")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--json-output", help="Path to save JSON results (optional)")
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.model, args.child, args.n_ctx, args.prompt_tokens)))
+        return
+
+    modes = args.modes.split(",") if args.modes else None
+    unknown = [m for m in modes or [] if m not in MODES]
+    if unknown:
+        print(f"ERROR: unknown load mode(s) {', '.join(unknown)} (known: {', '.join(MODES)})")
+        sys.exit(2)
+
+    backend = backend_for(args.model)
+    print("=" * 70)
+    print(f"LOAD PATH BENCHMARK: {args.model} ({backend})")
+    limit = memlock_limit_mb()
+    print(f"RLIMIT_MEMLOCK: {'unlimited' if limit is None else f'{limit:.1f} MB'}")
+    print("=" * 70)
+
+    def progress(run):
+        if "error" in run:
+            print(f"  {run['mode']:<6} {run['cache']:<5} ERROR: {run['error']}")
+        else:
+            print(f"  {run['mode']:<6} {run['cache']:<5} ttft {run['ttft_from_start_ms']:>8.1f} ms  "
+                  f"load {run['load_ms']:>8.1f} ms  rss {run['after_load']['rss_mb']:>7.1f} MB")
+
+    result = run_benchmark(args.model, modes, args.repeats, cold=not args.warm_only, warm=not args.cold_only,
+                           n_ctx=args.n_ctx, prompt_tokens=args.prompt_tokens, progress=progress)
+    skipped = [m for m in (modes or MODES) if m not in result["modes"]]
+    if skipped:
+        print(f"  (skipped for {backend}: {', '.join(skipped)})")
+
+    print("\n  SUMMARY (median)")
+    print_summary(result, indent="    ")
+    print(f"\n  {mlock_verdict(result)}")
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults saved to: {args.json_output}")
+
+    sys.exit(1 if result["errors"] and not result["runs"] else 0)
+
+
+if __name__ == "__main__":
+    main()
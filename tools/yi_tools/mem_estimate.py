@@ -0,0 +1,297 @@
+"""
+Analytic Memory Estimator
+KV cache, logits, activation and weight bytes from a model's shape
+
+Shape comes from a HuggingFace config.json (or a transformers config
+object) or from GGUF metadata ({arch}.block_count, attention.head_count,
+attention.head_count_kv, attention.key_length, embedding_length, vocab).
+Per preset ctx the estimate is:
+
+    weights      GGUF tensor bytes, the exported artifact's size, or
+                 params x dtype bytes
+    kv cache     2 (K, V) x layers x kv_heads x head_dim x ctx x dtype bytes
+                 (+ per-token, per-head scale / zero point for int8)
+    logits       vocab x fp32 x rows (1 for llama.cpp, the whole prefill
+                 batch for exported graphs that return every position)
+    activations  one layer's live fp32 buffers for a prefill batch:
+                 hidden / qkv / ffn tensors plus the heads x batch x ctx
+                 attention scores (layers run one after another)
+
+plus a fixed runtime overhead - the calibrated admission overhead_mb when
+the manifest has one (yi_tools.admission), else the legacy 600 MB.
+
+A static-KV program (manifest `kv_cache.static`, yi_tools.static_kv)
+allocates its whole cache at load, so its KV and attention scores are
+sized to max_cache_len under every preset, and it runs tokens_per_step
+(1) tokens at a time instead of a prefill batch.
+
+Everything is arithmetic on a handful of integers, so the per-preset table
+is written into manifests (`memory_estimate`) and the app can read
+required_ram_mb per preset instead of re-deriving it.
+
+Usage:
+    python -m yi_tools memory model.gguf [--kv-dtype fp16|int8|q8_0] [--runtime llama.cpp]
+    python -m yi_tools memory config.json --weight-bytes 1321083008 [--manifest m.json --update-manifest]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from yi_tools.admission import LEGACY, coefficients_for
+from yi_tools.presets import load_presets
+
+# Bytes per KV element; int8 adds a fp32 scale + int8 zero point per token
+# and KV head (ExecuTorch's quantized KV cache); q8_0 is llama.cpp's
+# 32-element block with one fp16 scale
+KV_DTYPE_BYTES = {"fp32": 4.0, "fp16": 2.0, "bf16": 2.0, "int8": 1.0, "q8_0": 34 / 32}
+KV_INT8_GROUP_BYTES = 4 + 1
+
+WEIGHT_DTYPE_BYTES = {"float32": 4, "float16": 2, "bfloat16": 2, "int8": 1, "int4": 0.5}
+
+LOGITS_BYTES = 4  # fp32
+ACTIVATION_BYTES = 4  # fp32
+DEFAULT_BATCH_TOKENS = 512  # llama.cpp n_batch / n_ubatch
+
+
+def shape_from_config(config) -> dict:
+    """Shape from a HF config dict / object (multimodal configs: text_config)"""
+    if hasattr(config, "to_dict"):
+        config = config.to_dict()
+    config = config.get("text_config") or config
+    hidden = config["hidden_size"]
+    heads = config["num_attention_heads"]
+    return {
+        "source": "config",
+        "architecture": (config.get("architectures") or [config.get("model_type")])[0],
+        "layers": config["num_hidden_layers"],
+        "heads": heads,
+        "kv_heads": config.get("num_key_value_heads") or heads,
+        "head_dim": config.get("head_dim") or hidden // heads,
+        "hidden": hidden,
+        "intermediate": config.get("intermediate_size") or 4 * hidden,
+        "vocab": config["vocab_size"],
+        "tie_embeddings": bool(config.get("tie_word_embeddings", False)),
+        "max_ctx": config.get("max_position_embeddings"),
+        "weight_dtype": config.get("torch_dtype") or "float32",
+    }
+
+
+def shape_from_gguf(gguf) -> dict:
+    """Shape from an open GGUFFile (weights are its tensor data bytes)"""
+    params = gguf.model_params()
+    hidden = params["embedding_length"]
+    heads = params["attention.head_count"]
+    kv_heads = params.get("attention.head_count_kv") or heads
+    if isinstance(kv_heads, list):  # per-layer counts (e.g. OpenELM); size for the largest
+        kv_heads = max(kv_heads)
+    names = {t["name"] for t in gguf.tensors}
+    return {
+        "source": "gguf",
+        "architecture": gguf.architecture,
+        "layers": params["block_count"],
+        "heads": heads,
+        "kv_heads": kv_heads,
+        "head_dim": params.get("attention.key_length") or hidden // heads,
+        "hidden": hidden,
+        "intermediate": params.get("feed_forward_length") or 4 * hidden,
+        "vocab": params.get("vocab_size"),
+        "tie_embeddings": "output.weight" not in names,
+        "max_ctx": params.get("context_length"),
+        "weight_bytes": gguf.quantization_summary()["tensor_data_bytes"],
+    }
+
+
+def load_shape(path: str) -> dict:
+    """Shape from a .gguf, a config.json, or a directory containing config.json"""
+    if path.lower().endswith(".gguf"):
+        from yi_tools.gguf import GGUFFile
+
+        with GGUFFile(path) as gguf:
+            return shape_from_gguf(gguf)
+    if os.path.isdir(path):
+        path = os.path.join(path, "config.json")
+    with open(path, "r") as f:
+        return shape_from_config(json.load(f))
+
+
+def param_count(shape: dict) -> int:
+    """Decoder-only transformer parameters (gated MLP, norms; biases ignored)"""
+    hidden, head_dim = shape["hidden"], shape["head_dim"]
+    attention = hidden * head_dim * (2 * shape["heads"] + 2 * shape["kv_heads"])
+    mlp = 3 * hidden * shape["intermediate"]
+    embeddings = shape["vocab"] * hidden * (1 if shape["tie_embeddings"] else 2)
+    return embeddings + shape["layers"] * (attention + mlp + 2 * hidden) + hidden
+
+
+def weight_bytes(shape: dict) -> int:
+    if shape.get("weight_bytes"):
+        return shape["weight_bytes"]
+    return int(param_count(shape) * WEIGHT_DTYPE_BYTES.get(shape.get("weight_dtype"), 4))
+
+
+def kv_bytes_per_token(shape: dict, kv_dtype: str = "fp16") -> float:
+    """K and V bytes one token adds across all layers"""
+    if kv_dtype not in KV_DTYPE_BYTES:
+        raise ValueError(f"unknown KV dtype {kv_dtype!r} (known: {', '.join(KV_DTYPE_BYTES)})")
+    per_head = shape["head_dim"] * KV_DTYPE_BYTES[kv_dtype]
+    if kv_dtype == "int8":
+        per_head += KV_INT8_GROUP_BYTES
+    return 2 * shape["layers"] * shape["kv_heads"] * per_head
+
+
+def logits_bytes(shape: dict, rows: int = 1) -> int:
+    return shape["vocab"] * LOGITS_BYTES * rows
+
+
+def activation_bytes(shape: dict, batch_tokens: int, ctx: int) -> int:
+    """Peak live activations of one layer for a prefill batch attending to ctx"""
+    per_token = (2 * shape["hidden"] + 2 * shape["intermediate"]
+                 + (shape["heads"] + 2 * shape["kv_heads"]) * shape["head_dim"])
+    scores = shape["heads"] * batch_tokens * ctx
+    return ACTIVATION_BYTES * (batch_tokens * per_token + scores)
+
+
+def estimate(
+    shape: dict,
+    ctx: int,
+    kv_dtype: str = "fp16",
+    runtime: str = "llama.cpp",
+    batch_tokens: int = None,
+    weights: int = None,
+    overhead_mb: float = LEGACY["overhead_mb"],
+    cache_len: int = None,
+) -> dict:
+    """MB per component and required_ram_mb for one context length"""
+    mb = 1024 ** 2
+    batch = min(ctx, batch_tokens or DEFAULT_BATCH_TOKENS)
+    rows = 1 if runtime == "llama.cpp" else batch
+    cache_len = cache_len or ctx
+    parts = {
+        "weights_mb": (weights if weights is not None else weight_bytes(shape)) / mb,
+        "kv_mb": kv_bytes_per_token(shape, kv_dtype) * cache_len / mb,
+        "logits_mb": logits_bytes(shape, rows) / mb,
+        "activation_mb": activation_bytes(shape, batch, cache_len) / mb,
+        "overhead_mb": overhead_mb,
+    }
+    result = {"ctx": ctx, **{k: round(v, 1) for k, v in parts.items()}}
+    result["required_ram_mb"] = round(sum(parts.values()))
+    return result
+
+
+def preset_table(
+    shape: dict,
+    presets: dict = None,
+    kv_dtype: str = "fp16",
+    runtime: str = "llama.cpp",
+    weights: int = None,
+    overhead_mb: float = LEGACY["overhead_mb"],
+    cache_len: int = None,
+    batch_tokens: int = None,
+) -> dict:
+    """
+    The `memory_estimate` manifest block
+
+    Returns:
+        Dict with the shape, kv_dtype, kv_bytes_per_token, logits/weight
+        bytes and `presets` {name: estimate(...)} for FULL/SAFE/GUARD
+    """
+    presets = presets or load_presets()
+    weights = weights if weights is not None else weight_bytes(shape)
+    table = {
+        "shape": {k: v for k, v in shape.items() if k != "weight_bytes"},
+        "runtime": runtime,
+        "kv_dtype": kv_dtype,
+        "kv_bytes_per_token": round(kv_bytes_per_token(shape, kv_dtype), 2),
+        "logits_bytes_per_row": logits_bytes(shape),
+        "weight_bytes": weights,
+        "presets": {
+            name: estimate(shape, preset["ctx"], kv_dtype, runtime, batch_tokens, weights, overhead_mb, cache_len)
+            for name, preset in presets.items()
+        },
+    }
+    if cache_len:
+        table["static_cache_len"] = cache_len
+    return table
+
+
+def manifest_estimate(
+    manifest: dict, shape: dict, runtime: str, weights: int = None, kv_dtype: str = "fp16"
+) -> dict:
+    """preset_table for a manifest being written: its presets, calibrated overhead and KV cache"""
+    kv_cache = manifest.get("kv_cache") or {}
+    static = kv_cache.get("static")
+    return preset_table(
+        shape,
+        load_presets(manifest),
+        kv_dtype,
+        runtime,
+        weights,
+        coefficients_for(manifest, runtime)["overhead_mb"],
+        kv_cache.get("max_cache_len") if static else None,
+        kv_cache.get("tokens_per_step") if static else None,
+    )
+
+
+def print_table(table: dict, indent: str = ""):
+    print(f"{indent}{'preset':<6} {'ctx':>5} {'weights':>9} {'kv':>8} {'logits':>7} {'activ':>7} "
+          f"{'overhead':>8} {'required':>9}")
+    for name, row in table["presets"].items():
+        print(f"{indent}{name:<6} {row['ctx']:>5} {row['weights_mb']:>9.1f} {row['kv_mb']:>8.1f} "
+              f"{row['logits_mb']:>7.1f} {row['activation_mb']:>7.1f} {row['overhead_mb']:>8.1f} "
+              f"{row['required_ram_mb']:>7} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analytic KV-cache / activation / weight memory per preset")
+    parser.add_argument("model", help="model.gguf, config.json, or a directory with config.json")
+    parser.add_argument("--kv-dtype", default="fp16", choices=sorted(KV_DTYPE_BYTES), help="KV cache dtype (default: fp16)")
+    parser.add_argument("--runtime", default=None, help="llama.cpp, onnxruntime or executorch (default: from file type)")
+    parser.add_argument("--weight-bytes", type=int, help="Artifact weight bytes (default: GGUF tensors or params x dtype)")
+    parser.add_argument("--manifest", help="Manifest with presets / calibrated overhead (default: manifest.json next to model)")
+    parser.add_argument("--update-manifest", action="store_true", help="Write memory_estimate into the manifest")
+    parser.add_argument("--json-output", help="Path to save JSON results (optional)")
+    args = parser.parse_args()
+
+    try:
+        shape = load_shape(args.model)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"ERROR: cannot read model shape from {args.model}: {e}")
+        sys.exit(2)
+    runtime = args.runtime or ("llama.cpp" if shape["source"] == "gguf" else "executorch")
+
+    model_dir = args.model if os.path.isdir(args.model) else os.path.dirname(os.path.abspath(args.model))
+    manifest_path = args.manifest or os.path.join(model_dir, "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+
+    table = manifest_estimate(manifest, shape, runtime, args.weight_bytes, args.kv_dtype)
+    print(f"{shape['architecture']}: {shape['layers']} layers, {shape['heads']} heads / {shape['kv_heads']} KV heads "
+          f"x {shape['head_dim']}, hidden {shape['hidden']}, vocab {shape['vocab']}")
+    print(f"KV cache ({args.kv_dtype}): {table['kv_bytes_per_token']:,.0f} bytes/token; "
+          f"logits {table['logits_bytes_per_row']:,} bytes/row; weights {table['weight_bytes'] / 1024 ** 2:.1f} MB "
+          f"({runtime})")
+    print()
+    print_table(table, indent="  ")
+
+    if args.update_manifest:
+        if not manifest:
+            print(f"\nERROR: no manifest at {manifest_path}")
+            sys.exit(2)
+        manifest["memory_estimate"] = table
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nmemory_estimate written to {manifest_path}")
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(table, f, indent=2)
+        print(f"\nResults saved to: {args.json_output}")
+
+
+if __name__ == "__main__":
+    main()
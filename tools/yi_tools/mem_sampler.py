@@ -0,0 +1,174 @@
+"""
+Native Process Memory Sampler
+Background RSS/PSS timeline for the benchmark harnesses (Linux /proc)
+
+tracemalloc only sees Python allocations; model weights, KV caches and
+runtime arenas live in native memory. This sampler reads the kernel's view
+of the whole process on a background thread:
+
+- /proc/self/smaps_rollup: Rss, Pss, Anonymous, Pss_Anon, Pss_File
+- /proc/self/status (fallback): VmRSS, RssAnon, RssFile (no PSS)
+
+file_mb is file-backed resident memory - mmap'd weights (.gguf/.pte/.ort)
+that the kernel can drop and re-read; anon_mb is heap / KV cache / arenas.
+Callers label phases (load, prefill, decode) with mark(); a sample is taken
+on every phase change so short phases are never missed. The kernel's VmHWM
+is read at stop() to catch spikes between samples.
+
+Usage:
+    sampler = MemorySampler(interval_ms=10).start()
+    sampler.mark("load"); ...; sampler.mark("decode"); ...
+    report = sampler.stop()   # peaks, per-phase peaks, timeline
+"""
+
+import os
+import threading
+import time
+
+SMAPS_ROLLUP = "/proc/self/smaps_rollup"
+STATUS = "/proc/self/status"
+DEFAULT_INTERVAL_MS = 10.0
+
+# Timeline columns (values in MB; pss is None with the status fallback)
+FIELDS = ("rss_mb", "pss_mb", "anon_mb", "file_mb")
+
+_ROLLUP_KEYS = {"Rss": "rss_mb", "Pss": "pss_mb", "Anonymous": "anon_mb", "Pss_Anon": "pss_anon_mb",
+                "Pss_File": "pss_file_mb"}
+_STATUS_KEYS = {"VmRSS": "rss_mb", "RssAnon": "anon_mb", "RssFile": "file_mb", "VmHWM": "hwm_mb",
+                "VmLck": "locked_mb"}
+
+
+def _read_kb(path: str, keys: dict) -> dict:
+    values = {}
+    with open(path, "r") as f:
+        for line in f:
+            name, _, rest = line.partition(":")
+            if name in keys:
+                values[keys[name]] = int(rest.split()[0]) / 1024
+    return values
+
+
+def read_smaps_rollup(path: str = SMAPS_ROLLUP) -> dict:
+    """RSS/PSS/anonymous/file-backed MB from smaps_rollup (file = Rss - Anonymous)"""
+    values = _read_kb(path, _ROLLUP_KEYS)
+    values["file_mb"] = values["rss_mb"] - values.get("anon_mb", 0.0)
+    return values
+
+
+def read_status(path: str = STATUS) -> dict:
+    """RSS/anonymous/file-backed/mlocked MB and the high-water mark from /proc/self/status"""
+    values = _read_kb(path, _STATUS_KEYS)
+    values["pss_mb"] = None
+    return values
+
+
+def detect_source() -> str:
+    """Best available source: smaps_rollup, status, or rusage (peak RSS only)"""
+    for source, reader in (("smaps_rollup", read_smaps_rollup), ("status", read_status)):
+        try:
+            reader()
+            return source
+        except (OSError, KeyError, ValueError, IndexError):
+            continue
+    return "rusage"
+
+
+def rusage_peak_mb() -> float:
+    """Process peak RSS from getrusage (KB on Linux, bytes on macOS), or None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 ** 2) if sys.platform == "darwin" else maxrss / 1024
+
+
+class MemorySampler:
+    """Samples process memory every `interval_ms` on a daemon thread"""
+
+    def __init__(self, interval_ms: float = DEFAULT_INTERVAL_MS, source: str = None):
+        self.interval_ms = interval_ms
+        self.source = source or detect_source()
+        self._reader = {"smaps_rollup": read_smaps_rollup, "status": read_status}.get(self.source)
+        self.phase = "idle"
+        self.timeline = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = None
+        self.report = None
+
+    def start(self) -> "MemorySampler":
+        self._start = time.perf_counter()
+        self.sample()
+        if self._reader:
+            self._thread = threading.Thread(target=self._loop, name="mem-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def _loop(self):
+        interval = self.interval_ms / 1000
+        while not self._stop.wait(interval):
+            self.sample()
+
+    def sample(self):
+        """Record one sample now, labelled with the current phase"""
+        if not self._reader:
+            return
+        try:
+            values = self._reader()
+        except OSError:
+            return
+        row = [round((time.perf_counter() - self._start) * 1000, 2), self.phase]
+        row += [round(values[f], 2) if values.get(f) is not None else None for f in FIELDS]
+        with self._lock:
+            self.timeline.append(row)
+
+    def mark(self, phase: str):
+        """Label following samples with `phase` (sampled immediately on change)"""
+        if phase != self.phase:
+            self.phase = phase
+            self.sample()
+
+    def stop(self) -> dict:
+        """Stop sampling and return the report (idempotent)"""
+        if self.report is not None:
+            return self.report
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.sample()
+
+        hwm_mb = None
+        if os.path.exists(STATUS):
+            try:
+                hwm_mb = read_status().get("hwm_mb")
+            except (OSError, ValueError, IndexError):
+                pass
+        if hwm_mb is None:
+            hwm_mb = rusage_peak_mb()
+
+        self.report = {
+            "source": self.source,
+            "interval_ms": self.interval_ms,
+            "samples": len(self.timeline),
+            "peaks": _peaks(self.timeline),
+            "phase_peaks": {
+                phase: _peaks([row for row in self.timeline if row[1] == phase])
+                for phase in dict.fromkeys(row[1] for row in self.timeline)
+            },
+            "hwm_mb": round(hwm_mb, 2) if hwm_mb is not None else None,
+            "columns": ["t_ms", "phase", *FIELDS],
+            "timeline": self.timeline,
+        }
+        return self.report
+
+
+def _peaks(rows: list) -> dict:
+    peaks = {}
+    for index, field in enumerate(FIELDS, start=2):
+        values = [row[index] for row in rows if row[index] is not None]
+        peaks[field] = max(values) if values else None
+    return peaks
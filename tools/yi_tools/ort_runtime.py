@@ -0,0 +1,356 @@
+"""
+ONNX Runtime Benchmark Engine
+Loads an .onnx/.ort model through onnxruntime and times prefill and decode
+
+Supported graph layouts (detected from the session's input names):
+- kv_cache:    optimum export with `past_key_values.*` inputs (what
+               export_onnx*.py emit); decode feeds one token plus the
+               previous `present.*` outputs
+- full_window: optimum export with use_cache=False; every decode step
+               re-runs the whole sequence,
+               padded to the exported width when the sequence axis is static
+
+input_ids / attention_mask / position_ids are filled in as the graph asks.
+
+sweep_session_options() benchmarks every combination of graph optimization
+level, intra/inter-op threads and execution mode; save_ort() writes the
+winner's optimized graph in ORT format so mobile load can skip runtime
+graph optimization. onnxruntime and numpy are imported only when a runner
+is created.
+"""
+
+import importlib
+import itertools
+import os
+import random
+import time
+
+from yi_tools.bench_stats import time_generation
+from yi_tools.lazy import is_available
+
+DEFAULT_VOCAB_SIZE = 32000
+
+# Option name -> onnxruntime.GraphOptimizationLevel member
+OPT_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+EXECUTION_MODES = {
+    "sequential": "ORT_SEQUENTIAL",
+    "parallel": "ORT_PARALLEL",
+}
+
+_NUMPY_TYPES = {
+    "tensor(int64)": "int64",
+    "tensor(int32)": "int32",
+    "tensor(float)": "float32",
+    "tensor(float16)": "float16",
+}
+
+
+class ORTUnavailable(RuntimeError):
+    """onnxruntime is not installed"""
+
+
+def runtime_available() -> bool:
+    return is_available("onnxruntime") and is_available("numpy")
+
+
+def default_thread_counts() -> list:
+    """1, 2, 4, ... up to the CPU count (always including the CPU count)"""
+    cpus = os.cpu_count() or 1
+    counts = [n for n in (1, 2, 4, 8) if n < cpus]
+    return counts + [cpus]
+
+
+def session_options(
+    opt_level: str = "all",
+    intra_op: int = 0,
+    inter_op: int = 0,
+    execution_mode: str = "sequential",
+    optimized_model_path: str = None,
+):
+    """onnxruntime.SessionOptions for one sweep point (0 threads = ORT default)"""
+    ort = importlib.import_module("onnxruntime")
+    options = ort.SessionOptions()
+    options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, OPT_LEVELS[opt_level])
+    options.execution_mode = getattr(ort.ExecutionMode, EXECUTION_MODES[execution_mode])
+    options.intra_op_num_threads = intra_op
+    options.inter_op_num_threads = inter_op
+    if optimized_model_path:
+        options.optimized_model_filepath = optimized_model_path
+        if optimized_model_path.endswith(".ort"):
+            options.add_session_config_entry("session.save_model_format", "ORT")
+    return options
+
+
+class ORTRunner:
+    """One onnxruntime InferenceSession plus greedy prefill/decode helpers"""
+
+    def __init__(
+        self,
+        model_path: str,
+        opt_level: str = "all",
+        intra_op: int = 0,
+        inter_op: int = 0,
+        execution_mode: str = "sequential",
+        optimized_model_path: str = None,
+    ):
+        if not runtime_available():
+            raise ORTUnavailable("ONNX Runtime not installed (pip install onnxruntime)")
+        self.ort = importlib.import_module("onnxruntime")
+        self.np = importlib.import_module("numpy")
+
+        self.model_path = model_path
+        self.config = {
+            "opt_level": opt_level,
+            "intra_op": intra_op,
+            "inter_op": inter_op,
+            "execution_mode": execution_mode,
+        }
+        options = session_options(opt_level, intra_op, inter_op, execution_mode, optimized_model_path)
+        start_time = time.perf_counter()
+        self.session = self.ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.load_ms = (time.perf_counter() - start_time) * 1000
+
+        self.inputs = {i.name: i for i in self.session.get_inputs()}
+        self.output_names = [o.name for o in self.session.get_outputs()]
+        if "input_ids" not in self.inputs:
+            raise ValueError(f"no input_ids input (inputs: {', '.join(self.inputs)})")
+        self.past_names = [n for n in self.inputs if n.startswith("past_key_values")]
+        self.layout = "kv_cache" if self.past_names else "full_window"
+
+        seq_dim = self.inputs["input_ids"].shape[-1]
+        self.window = seq_dim if isinstance(seq_dim, int) else None
+        vocab_dim = self.session.get_outputs()[0].shape[-1]
+        self.vocab_size = vocab_dim if isinstance(vocab_dim, int) else DEFAULT_VOCAB_SIZE
+        self.prefill_padded = False
+        self._ids = []
+        self._past = None
+
+    def describe(self) -> dict:
+        return {
+            "backend": "onnxruntime",
+            "onnxruntime": self.ort.__version__,
+            "layout": self.layout,
+            "inputs": list(self.inputs),
+            "window": self.window,
+            "vocab_size": self.vocab_size,
+            **self.config,
+            "load_ms": round(self.load_ms, 2),
+        }
+
+    # -- execution -------------------------------------------------------
+
+    def _array(self, name: str, values):
+        return self.np.asarray(values, dtype=_NUMPY_TYPES.get(self.inputs[name].type, "int64"))
+
+    def _empty_past(self, name: str):
+        meta = self.inputs[name]
+        dims = [d if isinstance(d, int) else 0 for d in meta.shape]
+        dims[0] = 1
+        return self.np.zeros(dims, dtype=_NUMPY_TYPES.get(meta.type, "float32"))
+
+    def _run(self, ids: list, start_pos: int, attended: int = None):
+        """One forward pass over `ids` placed at `start_pos`; returns logits"""
+        attended = attended if attended is not None else len(ids)
+        feeds = {"input_ids": self._array("input_ids", [ids])}
+        if "attention_mask" in self.inputs:
+            mask = [1] * (start_pos + attended) + [0] * (len(ids) - attended)
+            feeds["attention_mask"] = self._array("attention_mask", [mask])
+        if "position_ids" in self.inputs:
+            feeds["position_ids"] = self._array("position_ids", [list(range(start_pos, start_pos + len(ids)))])
+        for name in self.past_names:
+            if self._past is not None:
+                feeds[name] = self._past[name]
+            else:
+                feeds[name] = self._empty_past(name)
+        unknown = set(self.inputs) - set(feeds)
+        if unknown:
+            raise ValueError(f"unsupported graph inputs: {', '.join(sorted(unknown))}")
+
+        outputs = self.session.run(None, feeds)
+        if self.past_names:
+            present = [n for n in self.output_names if n.startswith("present")]
+            by_name = dict(zip(self.output_names, outputs))
+            self._past = {p: by_name[o] for p, o in zip(self.past_names, present)}
+        return outputs[0]
+
+    def _next_token(self, logits, index: int = -1) -> int:
+        if logits.ndim == 3:
+            logits = logits[0, index]
+        elif logits.ndim == 2:
+            logits = logits[-1]
+        return int(logits.argmax())
+
+    def prefill(self, ids: list) -> int:
+        """Run the prompt and return the first generated token id"""
+        self._past = None
+        if self.layout == "full_window":
+            self._ids = list(ids)
+            return self._window_step()
+        logits = self._run(list(ids), 0)
+        return self._next_token(logits, len(ids) - 1)
+
+    def decode(self, token: int, pos: int) -> int:
+        """Feed one token at position `pos` and return the next token id"""
+        if self.layout == "full_window":
+            self._ids.append(token)
+            return self._window_step()
+        return self._next_token(self._run([token], pos))
+
+    def _window_step(self) -> int:
+        if self.window:
+            ids = self._ids[-self.window:]
+            if len(ids) < self.window:
+                self.prefill_padded = True
+            padded = ids + [0] * (self.window - len(ids))
+            return self._next_token(self._run(padded, 0, attended=len(ids)), len(ids) - 1)
+        return self._next_token(self._run(self._ids, 0))
+
+    # -- benchmark -------------------------------------------------------
+
+    def synthetic_prompt(self, length: int, seed: int = 0) -> list:
+        rng = random.Random(seed)
+        return [rng.randrange(1, max(2, self.vocab_size)) for _ in range(length)]
+
+    def benchmark(
+        self,
+        prompt_ids: list = None,
+        prompt_tokens: int = 64,
+        decode_tokens: int = 32,
+        warmup: int = 2,
+        repeats: int = 5,
+        mark=None,
+    ) -> dict:
+        """
+        Warm up, then time prefill (TTFT) and the decode loop `repeats` times
+
+        Returns:
+            Same schema as PTERunner.benchmark (summaries + samples)
+        """
+        ids = list(prompt_ids) if prompt_ids else self.synthetic_prompt(prompt_tokens)
+        if self.window:
+            ids = ids[:max(1, self.window - 1)]
+
+        timings = time_generation(self.prefill, self.decode, ids, decode_tokens, warmup, repeats, mark)
+        return {
+            **self.describe(),
+            "prompt_tokens": len(ids),
+            "decode_tokens": decode_tokens,
+            "warmup": warmup,
+            "repeats": repeats,
+            "prefill_padded": self.prefill_padded,
+            **timings,
+        }
+
+
+def sweep_configs(
+    opt_levels: list = None,
+    intra_threads: list = None,
+    inter_threads: list = None,
+    execution_modes: list = None,
+) -> list:
+    """
+    Session-option grid; inter-op threads only vary in parallel mode
+    (the sequential executor never uses the inter-op pool)
+    """
+    opt_levels = opt_levels or list(OPT_LEVELS)
+    intra_threads = intra_threads or default_thread_counts()
+    inter_threads = inter_threads or [1, 2]
+    execution_modes = execution_modes or list(EXECUTION_MODES)
+
+    configs = []
+    for level, mode, intra in itertools.product(opt_levels, execution_modes, intra_threads):
+        for inter in (inter_threads if mode == "parallel" else [0]):
+            configs.append({"opt_level": level, "intra_op": intra, "inter_op": inter, "execution_mode": mode})
+    return configs
+
+
+def sweep_session_options(
+    model_path: str,
+    configs: list = None,
+    prompt_ids: list = None,
+    prompt_tokens: int = 64,
+    decode_tokens: int = 32,
+    warmup: int = 1,
+    repeats: int = 3,
+    progress=None,
+    mark=None,
+) -> dict:
+    """
+    Benchmark `model_path` under every session-option config
+
+    The best config has the highest decode tok/s p50 (ties: lowest TTFT).
+    A config that fails to load or run is kept with its error. `mark`
+    labels memory-sampler phases (load / prefill / decode).
+
+    Returns:
+        Dict with `rows` [{config..., load_ms, ttft_ms, prefill_tok_s,
+        tok_s, error}], `best` (row) and `best_benchmark` (full summary)
+    """
+    configs = configs or sweep_configs()
+    rows = []
+    best, best_benchmark = None, None
+    for index, config in enumerate(configs):
+        row = dict(config)
+        try:
+            if mark:
+                mark("load")
+            runner = ORTRunner(model_path, **config)
+            bench = runner.benchmark(prompt_ids, prompt_tokens, decode_tokens, warmup, repeats, mark)
+            decode = bench["decode_tok_s"]
+            row.update({
+                "load_ms": bench["load_ms"],
+                "ttft_ms": bench["ttft_ms"]["p50"],
+                "prefill_tok_s": bench["prefill_tok_s"]["p50"],
+                "tok_s": decode["p50"] if decode else None,
+                "error": None,
+            })
+            del runner
+        except Exception as e:
+            row.update({"load_ms": None, "ttft_ms": None, "prefill_tok_s": None, "tok_s": None, "error": str(e)})
+            bench = None
+        rows.append(row)
+        if progress:
+            progress(index + 1, len(configs), row)
+
+        if bench and _better(row, best):
+            best, best_benchmark = row, bench
+
+    return {"rows": rows, "best": best, "best_benchmark": best_benchmark}
+
+
+def _better(row: dict, best: dict) -> bool:
+    if best is None:
+        return True
+    key = lambda r: (r["tok_s"] or 0.0, -(r["ttft_ms"] or float("inf")))
+    return key(row) > key(best)
+
+
+def save_ort(model_path: str, output_path: str, config: dict, portable: bool = True) -> dict:
+    """
+    Save the graph as optimized under `config` in ORT format, then reload it
+
+    Levels above "extended" bake in host-specific kernels (NCHWc layouts),
+    so with `portable` the saved graph is capped at "extended" - the
+    artifact ships to phones, not to the machine that ran the sweep.
+
+    Returns:
+        Dict with output_path, size_bytes, opt_level and the ORT-format
+        load_ms (with graph optimization disabled, as on device)
+    """
+    options = {k: config[k] for k in ("opt_level", "intra_op", "inter_op", "execution_mode")}
+    if portable and options["opt_level"] == "all":
+        options["opt_level"] = "extended"
+    ORTRunner(model_path, optimized_model_path=output_path, **options)
+    reloaded = ORTRunner(output_path, **{**options, "opt_level": "disable"})
+    return {
+        "output_path": output_path,
+        "size_bytes": os.path.getsize(output_path),
+        "opt_level": options["opt_level"],
+        "load_ms": round(reloaded.load_ms, 2),
+        "portable": options["opt_level"] != "all",
+    }
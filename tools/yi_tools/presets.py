@@ -0,0 +1,30 @@
+"""
+Runtime Quality Presets
+FULL / SAFE / GUARD generation settings shared by the benchmarks
+
+Mirrors ModelPreset in app/admission/android.kt and PRESETS in
+tools/run_bench_cli.ts; a manifest's `recommended_presets` overrides these
+per model.
+"""
+
+PRESETS = {
+    "full": {"ctx": 1024, "max_new": 256, "top_p": 0.95, "temp": 0.70},
+    "safe": {"ctx": 512, "max_new": 128, "top_p": 0.90, "temp": 0.65},
+    "guard": {"ctx": 384, "max_new": 96, "top_p": 0.85, "temp": 0.60},
+}
+
+
+def load_presets(manifest: dict = None) -> dict:
+    """Default presets updated with the manifest's recommended_presets"""
+    presets = {name: dict(values) for name, values in PRESETS.items()}
+    for name, values in ((manifest or {}).get("recommended_presets") or {}).items():
+        presets[name.lower()] = {**presets.get(name.lower(), {}), **values}
+    return presets
+
+
+def get_preset(name: str, manifest: dict = None) -> dict:
+    presets = load_presets(manifest)
+    key = name.lower()
+    if key not in presets:
+        raise KeyError(f"unknown preset {name!r} (known: {', '.join(presets)})")
+    return {"name": key, **presets[key]}
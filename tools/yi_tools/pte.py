@@ -0,0 +1,309 @@
+"""
+ExecuTorch .pte Reader (zero-copy)
+Parses the Program flatbuffer of a .pte file directly from an mmap
+
+Layout (executorch/schema/program.fbs, exir/_serialize/_program.py):
+    [0:4]    root table offset (uint32)
+    [4:8]    file identifier, e.g. b"ET12"
+    [8:..]   extended header: b"eh00", length u32, program_size u64,
+             segment_base_offset u64[, segment_data_size u64]
+    ...      Program flatbuffer (execution plans, delegate refs, segment table)
+    [segment_base_offset:]  segments (delegate blobs, constant data)
+
+Only the flatbuffer metadata is decoded. Delegate blobs and segments are
+reported as absolute (offset, size) spans, so memory use is independent of
+model size and payload pages are never touched.
+"""
+
+import mmap
+import os
+import struct
+
+from yi_tools.flatbuf import FlatbufferError, file_identifier, root_table
+
+EXTENDED_HEADER_OFFSET = 8
+EXTENDED_HEADER_MAGIC = b"eh00"
+EXPECTED_IDENTIFIER_PREFIX = b"ET"
+
+# DataLocation enum
+LOCATION_INLINE = 0
+LOCATION_SEGMENT = 1
+LOCATION_NAMES = {LOCATION_INLINE: "INLINE", LOCATION_SEGMENT: "SEGMENT"}
+
+# Field indices (declaration order in program.fbs)
+PROGRAM_VERSION, PROGRAM_EXECUTION_PLAN, PROGRAM_CONSTANT_BUFFER, PROGRAM_DELEGATE_DATA, \
+    PROGRAM_SEGMENTS, PROGRAM_CONSTANT_SEGMENT, PROGRAM_MUTABLE_DATA_SEGMENTS, PROGRAM_NAMED_DATA = range(8)
+PLAN_NAME, PLAN_CONTAINER_META, PLAN_VALUES, PLAN_INPUTS, PLAN_OUTPUTS, PLAN_CHAINS, \
+    PLAN_OPERATORS, PLAN_DELEGATES, PLAN_NON_CONST_BUFFER_SIZES = range(9)
+DELEGATE_ID, DELEGATE_PROCESSED, DELEGATE_COMPILE_SPECS = range(3)
+DATA_REF_LOCATION, DATA_REF_INDEX = range(2)
+OPERATOR_NAME, OPERATOR_OVERLOAD = range(2)
+SEGMENT_OFFSET, SEGMENT_SIZE = range(2)
+SUBSEGMENT_INDEX, SUBSEGMENT_OFFSETS = range(2)
+INLINE_DATA = 0
+NAMED_DATA_KEY, NAMED_DATA_SEGMENT_INDEX = range(2)
+EVALUE_VAL_TYPE, EVALUE_VAL = range(2)
+EVALUE_TENSOR = 5  # KernelTypes union member
+TENSOR_SCALAR_TYPE, TENSOR_STORAGE_OFFSET, TENSOR_SIZES, TENSOR_DIM_ORDER, TENSOR_REQUIRES_GRAD, \
+    TENSOR_DATA_BUFFER_IDX, TENSOR_ALLOCATION_INFO, TENSOR_LAYOUT, TENSOR_SHAPE_DYNAMISM, \
+    TENSOR_EXTRA_INFO = range(10)
+EXTRA_INFO_FQN = 1
+
+# ScalarType enum (c10 numbering) -> (name, bits per element)
+SCALAR_TYPES = {
+    0: ("uint8", 8),
+    1: ("int8", 8),
+    2: ("int16", 16),
+    3: ("int32", 32),
+    4: ("int64", 64),
+    5: ("fp16", 16),
+    6: ("fp32", 32),
+    7: ("fp64", 64),
+    11: ("bool", 8),
+    12: ("qint8", 8),
+    13: ("quint8", 8),
+    14: ("qint32", 32),
+    15: ("bf16", 16),
+    16: ("quint4x2", 4),
+    17: ("quint2x4", 2),
+    22: ("bits16", 16),
+    27: ("uint16", 16),
+}
+
+
+class PTEFormatError(ValueError):
+    """File is not a well-formed ExecuTorch program"""
+
+
+class PTEFile:
+    """
+    Memory-mapped, read-only view of an ExecuTorch .pte program
+
+    Usage:
+        with PTEFile(path) as pte:
+            print(pte.summary())
+    """
+
+    def __init__(self, pte_path: str):
+        self.path = str(pte_path)
+        self._file = open(self.path, "rb")
+        self.size_bytes = os.fstat(self._file.fileno()).st_size
+        if self.size_bytes < 8:
+            self._file.close()
+            raise PTEFormatError(f"File too small to be a .pte ({self.size_bytes} bytes)")
+        self.buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self.identifier = file_identifier(self.buf)
+            if not self.identifier.startswith(EXPECTED_IDENTIFIER_PREFIX):
+                raise PTEFormatError(
+                    f"Bad file identifier {self.identifier!r} (expected {EXPECTED_IDENTIFIER_PREFIX!r}xx)"
+                )
+            self.header = self._parse_extended_header()
+            self.program = root_table(self.buf)
+        except FlatbufferError as e:
+            self.close()
+            raise PTEFormatError(f"Corrupt program flatbuffer: {e}") from e
+        except PTEFormatError:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.buf.closed:
+            self.buf.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _parse_extended_header(self):
+        """Extended header dict, or None for headerless (legacy) programs"""
+        start = EXTENDED_HEADER_OFFSET
+        if self.size_bytes < start + 8 or self.buf[start:start + 4] != EXTENDED_HEADER_MAGIC:
+            return None
+        length = struct.unpack_from("<I", self.buf, start + 4)[0]
+        if length < 24 or start + length > self.size_bytes:
+            raise PTEFormatError(f"Extended header length {length} is invalid")
+        program_size, segment_base_offset = struct.unpack_from("<QQ", self.buf, start + 8)
+        header = {
+            "magic": EXTENDED_HEADER_MAGIC.decode(),
+            "length": length,
+            "program_size": program_size,
+            "segment_base_offset": segment_base_offset,
+            "segment_data_size": None,
+        }
+        if length >= 32:
+            header["segment_data_size"] = struct.unpack_from("<Q", self.buf, start + 24)[0]
+        if program_size > self.size_bytes:
+            raise PTEFormatError(
+                f"program_size {program_size:,} exceeds file size {self.size_bytes:,} (truncated file?)"
+            )
+        if segment_base_offset and segment_base_offset > self.size_bytes:
+            raise PTEFormatError(
+                f"segment_base_offset {segment_base_offset:,} exceeds file size {self.size_bytes:,}"
+            )
+        return header
+
+    @property
+    def version(self) -> int:
+        return self.program.scalar(PROGRAM_VERSION, "I")
+
+    @property
+    def segment_base_offset(self) -> int:
+        return self.header["segment_base_offset"] if self.header else 0
+
+    def segments(self) -> list:
+        """Segment table with absolute file offsets"""
+        base = self.segment_base_offset
+        result = []
+        for i, seg in enumerate(self.program.table_vector(PROGRAM_SEGMENTS)):
+            offset = seg.scalar(SEGMENT_OFFSET, "Q")
+            size = seg.scalar(SEGMENT_SIZE, "Q")
+            result.append({"index": i, "offset": base + offset, "size": size})
+        return result
+
+    def inline_delegate_span(self, index: int):
+        """(offset, size) of backend_delegate_data[index] inside the flatbuffer"""
+        entries = self.program.table_vector(PROGRAM_DELEGATE_DATA)
+        if not 0 <= index < len(entries):
+            raise PTEFormatError(f"Inline delegate index {index} out of range ({len(entries)} entries)")
+        start, count = entries[index].vector_span(INLINE_DATA, 1)
+        return (start or 0), count
+
+    def data_span(self, location: int, index: int):
+        """Absolute (offset, size) of a BackendDelegateDataReference payload"""
+        if location == LOCATION_INLINE:
+            return self.inline_delegate_span(index)
+        if location == LOCATION_SEGMENT:
+            segments = self.program.table_vector(PROGRAM_SEGMENTS)
+            if not 0 <= index < len(segments):
+                raise PTEFormatError(f"Segment index {index} out of range ({len(segments)} segments)")
+            seg = segments[index]
+            return self.segment_base_offset + seg.scalar(SEGMENT_OFFSET, "Q"), seg.scalar(SEGMENT_SIZE, "Q")
+        raise PTEFormatError(f"Unknown DataLocation {location}")
+
+    def execution_plans(self) -> list:
+        """Per-method metadata: counts, operator names and delegate blob spans"""
+        plans = []
+        for plan in self.program.table_vector(PROGRAM_EXECUTION_PLAN):
+            delegates = []
+            for delegate in plan.table_vector(PLAN_DELEGATES):
+                processed = delegate.table(DELEGATE_PROCESSED)
+                location = processed.scalar(DATA_REF_LOCATION, "B") if processed else None
+                index = processed.scalar(DATA_REF_INDEX, "I") if processed else None
+                offset, size = self.data_span(location, index) if processed else (None, 0)
+                delegates.append({
+                    "id": delegate.string(DELEGATE_ID, ""),
+                    "location": LOCATION_NAMES.get(location, str(location)),
+                    "index": index,
+                    "offset": offset,
+                    "size": size,
+                    "num_compile_specs": delegate.vector_len(DELEGATE_COMPILE_SPECS),
+                })
+            plans.append({
+                "name": plan.string(PLAN_NAME, ""),
+                "num_values": plan.vector_len(PLAN_VALUES),
+                "num_inputs": plan.vector_len(PLAN_INPUTS),
+                "num_outputs": plan.vector_len(PLAN_OUTPUTS),
+                "num_chains": plan.vector_len(PLAN_CHAINS),
+                "operators": [op.string(OPERATOR_NAME, "") for op in plan.table_vector(PLAN_OPERATORS)],
+                "delegates": delegates,
+            })
+        return plans
+
+    def named_data_sizes(self) -> dict:
+        """{key: bytes} for the program's named data map (weights shared by delegates)"""
+        segments = self.segments()
+        sizes = {}
+        for entry in self.program.table_vector(PROGRAM_NAMED_DATA):
+            index = entry.scalar(NAMED_DATA_SEGMENT_INDEX, "I")
+            if 0 <= index < len(segments):
+                sizes[entry.string(NAMED_DATA_KEY, "")] = segments[index]["size"]
+        return sizes
+
+    def constant_tensors(self) -> list:
+        """
+        Non-delegated constant tensors referenced by the execution plans
+
+        A tensor is constant when data_buffer_idx > 0 and it has no
+        allocation_info (planned memory). Byte length comes from the
+        constant_segment offsets or the inline constant_buffer when present,
+        otherwise from shape x element size.
+        """
+        constant_segment = self.program.table(PROGRAM_CONSTANT_SEGMENT)
+        segment_offsets = constant_segment.scalar_vector(SUBSEGMENT_OFFSETS, "Q") if constant_segment else ()
+        constant_buffers = self.program.table_vector(PROGRAM_CONSTANT_BUFFER)
+
+        tensors = []
+        seen = set()
+        for plan in self.program.table_vector(PROGRAM_EXECUTION_PLAN):
+            plan_name = plan.string(PLAN_NAME, "")
+            for value_index, evalue in enumerate(plan.table_vector(PLAN_VALUES)):
+                if evalue.scalar(EVALUE_VAL_TYPE, "B") != EVALUE_TENSOR:
+                    continue
+                tensor = evalue.table(EVALUE_VAL)
+                if tensor is None or tensor.has(TENSOR_ALLOCATION_INFO):
+                    continue
+                buffer_idx = tensor.scalar(TENSOR_DATA_BUFFER_IDX, "I")
+                if buffer_idx == 0 or buffer_idx in seen:
+                    continue  # 0 = no constant data; methods may share constants
+                seen.add(buffer_idx)
+
+                dtype, bits = SCALAR_TYPES.get(tensor.scalar(TENSOR_SCALAR_TYPE, "b"), ("unknown", 0))
+                shape = tuple(tensor.scalar_vector(TENSOR_SIZES, "i"))
+                numel = 1
+                for dim in shape:
+                    numel *= dim
+
+                if buffer_idx + 1 < len(segment_offsets):
+                    nbytes = segment_offsets[buffer_idx + 1] - segment_offsets[buffer_idx]
+                elif buffer_idx < len(constant_buffers):
+                    nbytes = constant_buffers[buffer_idx].vector_len(0)
+                else:
+                    nbytes = 0
+                if not nbytes:
+                    nbytes = (numel * bits + 7) // 8
+
+                extra = tensor.table(TENSOR_EXTRA_INFO)
+                tensors.append({
+                    "name": extra.string(EXTRA_INFO_FQN) if extra else None,
+                    "plan": plan_name,
+                    "value_index": value_index,
+                    "dtype": dtype,
+                    "bits": bits,
+                    "shape": shape,
+                    "numel": numel,
+                    "nbytes": nbytes,
+                })
+        return tensors
+
+    def validate_spans(self) -> list:
+        """Problems with segment/delegate spans that fall outside the file"""
+        problems = []
+        for seg in self.segments():
+            if seg["offset"] + seg["size"] > self.size_bytes:
+                problems.append(
+                    f"segment {seg['index']} [{seg['offset']:,} +{seg['size']:,}] exceeds file size "
+                    f"{self.size_bytes:,}"
+                )
+        return problems
+
+    def summary(self) -> dict:
+        plans = self.execution_plans()
+        return {
+            "file_identifier": self.identifier.decode("ascii", errors="replace"),
+            "program_version": self.version,
+            "extended_header": self.header,
+            "size_bytes": self.size_bytes,
+            "num_execution_plans": len(plans),
+            "num_delegates": sum(len(p["delegates"]) for p in plans),
+            "num_segments": self.program.vector_len(PROGRAM_SEGMENTS),
+            "num_constant_buffers": self.program.vector_len(PROGRAM_CONSTANT_BUFFER),
+            "has_constant_segment": self.program.has(PROGRAM_CONSTANT_SEGMENT),
+            "execution_plans": plans,
+            "segments": self.segments(),
+        }
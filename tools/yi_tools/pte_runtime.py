@@ -0,0 +1,293 @@
+"""
+ExecuTorch Runtime Benchmark Engine
+Loads a .pte through the ExecuTorch pybindings and times prefill and decode
+
+Supported program layouts (detected from method names / input metadata):
+- prefill_decode: separate `prefill` and `decode` methods, each taking
+  (tokens[1, n], input_pos[1]) and sharing the KV cache (export_pte.py;
+  prompts longer than the prefill width run as consecutive chunks)
+- kv_cache:       `forward(tokens[1, n], input_pos[1])` with an internal KV cache
+                  (the exporters' static-KV mode, yi_tools.static_kv, n = 1)
+- full_window:    `forward(tokens[1, S])` without a cache; every decode step
+                  re-runs the whole fixed window (STATIC_KV_CACHE = False)
+
+The width read from the metadata is the upper bound of a dynamic token axis
+or the one fixed width. Inputs are first run unpadded; a program that
+rejects the shorter shape is padded to the width from then on, and one that
+accepts it (dynamic_tokens) also gets its last prompt chunk unpadded.
+
+TTFT is prefill plus selecting the first token (greedy argmax). Decode tok/s
+is measured per repeat over the remaining tokens, and every program call is
+timed per role (prefill / decode method) so the two methods are reported
+separately. torch and the pybindings are imported only when a PTERunner is
+created.
+
+Programs are loaded through the executorch.runtime Program API when it is
+available: its host-only methods share one set of memory arenas, so a
+prefill_decode program's methods read and write the same KV-cache buffers
+(exported with share_mutable_buffers). The legacy pybindings Module gives
+every method its own arenas and is only a fallback. The quantized kernel
+library is registered when installed, so programs with an INT8 embedding
+table (quantized_decomposed::embedding_byte, yi_tools.quantize) load.
+"""
+
+import importlib
+import random
+import time
+
+from yi_tools.bench_stats import summarize, time_generation
+from yi_tools.lazy import is_available
+
+PYBINDINGS_MODULE = "executorch.extension.pybindings.portable_lib"
+RUNTIME_MODULE = "executorch.runtime"
+QUANTIZED_KERNELS_MODULE = "executorch.kernels.quantized"
+DEFAULT_VOCAB_SIZE = 32000
+
+
+class RuntimeUnavailable(RuntimeError):
+    """ExecuTorch pybindings (or torch) are not installed"""
+
+
+def runtime_available() -> bool:
+    return is_available("torch") and is_available("executorch")
+
+
+class PTERunner:
+    """One loaded ExecuTorch program plus greedy prefill/decode helpers"""
+
+    def __init__(self, pte_path: str, from_buffer: bool = False):
+        if not runtime_available():
+            raise RuntimeUnavailable("ExecuTorch runtime not installed (pip install executorch)")
+        try:
+            portable_lib = importlib.import_module(PYBINDINGS_MODULE)
+        except ImportError as e:
+            raise RuntimeUnavailable(f"ExecuTorch pybindings unavailable: {e}")
+        import torch
+
+        try:
+            runtime = importlib.import_module(RUNTIME_MODULE).Runtime.get()
+        except (ImportError, AttributeError):
+            runtime = None
+        try:
+            importlib.import_module(QUANTIZED_KERNELS_MODULE)
+        except ImportError:
+            pass  # fp32 / fully delegated programs do not need it
+
+        self.torch = torch
+        self.pte_path = pte_path
+        self.program = self.module = None
+        self._methods = {}
+        start_time = time.perf_counter()
+        if from_buffer:
+            # Read the whole program into memory instead of mmap'ing it; the
+            # module points into the buffer, so it must outlive the module
+            with open(pte_path, "rb") as f:
+                self._buffer = f.read()
+        if runtime is not None:
+            self.program = runtime.load_program(self._buffer if from_buffer else pte_path)
+            # Load every method up front, as the legacy Module does
+            self._methods = {name: self.program.load_method(name) for name in self.program.method_names}
+        elif from_buffer:
+            self.module = portable_lib._load_for_executorch_from_buffer(self._buffer)
+        else:
+            self.module = portable_lib._load_for_executorch(pte_path)
+        self.load_ms = (time.perf_counter() - start_time) * 1000
+
+        self.methods = self._method_names()
+        if "prefill" in self.methods and "decode" in self.methods:
+            self.layout = "prefill_decode"
+            self.prefill_method, self.decode_method = "prefill", "decode"
+        else:
+            self.prefill_method = self.decode_method = "forward"
+            self.layout = "kv_cache" if len(self._input_sizes("forward")) >= 2 else "full_window"
+
+        sizes = self._input_sizes(self.prefill_method)
+        self.window = sizes[0][-1] if sizes and sizes[0] else None
+        self.vocab_size = self._vocab_size()
+        self.prefill_padded = False
+        self.dynamic_tokens = False  # a shorter-than-window call has succeeded
+        self._window_ids = []
+        self.call_ms = {"prefill": [], "decode": []}
+
+    def _method_names(self) -> list:
+        if self.program is not None:
+            return sorted(self._methods)
+        try:
+            return sorted(self.module.method_names())
+        except AttributeError:  # older pybindings
+            return ["forward"]
+
+    def _method_meta(self, method: str):
+        if self.program is not None:
+            meta = self._methods[method].metadata
+            return meta() if callable(meta) else meta
+        return self.module.method_meta(method)
+
+    def _input_sizes(self, method: str) -> list:
+        try:
+            meta = self._method_meta(method)
+            return [tuple(meta.input_tensor_meta(i).sizes()) for i in range(meta.num_inputs())]
+        except (AttributeError, KeyError, RuntimeError):
+            return []
+
+    def _vocab_size(self) -> int:
+        try:
+            meta = self._method_meta(self.prefill_method)
+            return tuple(meta.output_tensor_meta(0).sizes())[-1]
+        except (AttributeError, KeyError, RuntimeError, IndexError):
+            return DEFAULT_VOCAB_SIZE
+
+    def describe(self) -> dict:
+        return {
+            "layout": self.layout,
+            "methods": self.methods,
+            "window": self.window,
+            "dynamic_tokens": self.dynamic_tokens,
+            "vocab_size": self.vocab_size,
+            "load_ms": round(self.load_ms, 2),
+        }
+
+    # -- execution -------------------------------------------------------
+
+    def _run(self, method: str, inputs: list, role: str = "prefill"):
+        start_time = time.perf_counter()
+        if self.program is not None:
+            outputs = self._methods[method].execute(inputs)
+        elif method == "forward":
+            outputs = self.module.forward(inputs)
+        else:
+            outputs = self.module.run_method(method, inputs)
+        self.call_ms[role].append((time.perf_counter() - start_time) * 1000)
+        return outputs
+
+    def _next_token(self, logits, index: int = -1) -> int:
+        if logits.dim() == 3:
+            logits = logits[0, index]
+        elif logits.dim() == 2:
+            logits = logits[-1]
+        return int(self.torch.argmax(logits).item())
+
+    def _tokens(self, ids: list):
+        return self.torch.tensor([ids], dtype=self.torch.long)
+
+    def _pos(self, pos: int):
+        return self.torch.tensor([pos], dtype=self.torch.long)
+
+    def prefill(self, ids: list) -> int:
+        """Run the prompt and return the first generated token id"""
+        if self.layout == "full_window":
+            self._window_ids = list(ids[-self.window:])
+            return self._window_step()
+
+        if self.window == 1:
+            # Decode-shaped program: feed the prompt token by token
+            token = None
+            for pos, token_id in enumerate(ids):
+                outputs = self._run(self.prefill_method, [self._tokens([token_id]), self._pos(pos)])
+                token = self._next_token(outputs[0])
+            return token
+
+        if self.window and len(ids) > self.window:
+            return self._prefill_chunked(ids)
+        return self._next_token(*self._run_tokens(self.prefill_method, ids, 0))
+
+    def _run_tokens(self, method: str, ids: list, pos: int = None, role: str = "prefill"):
+        """
+        Run `ids` unpadded, or padded to the window once the program has
+        rejected a shorter shape
+
+        Returns:
+            (logits, index of the last real token)
+        """
+        def inputs(tokens):
+            return [self._tokens(tokens)] + ([] if pos is None else [self._pos(pos)])
+
+        if not self.prefill_padded:
+            try:
+                outputs = self._run(method, inputs(ids), role)
+                if self.window and len(ids) < self.window:
+                    self.dynamic_tokens = True
+                return outputs[0], len(ids) - 1
+            except RuntimeError:
+                # Static token axis: pad to the exported width from now on
+                if not self.window:
+                    raise
+                self.prefill_padded = True
+        padded = list(ids) + [0] * (self.window - len(ids))
+        return self._run(method, inputs(padded), role)[0], len(ids) - 1
+
+    def _prefill_chunked(self, ids: list) -> int:
+        """Prompt longer than the prefill width: consecutive full-width chunks"""
+        start = 0
+        while start < len(ids):
+            end = min(start + self.window, len(ids))
+            if not self.dynamic_tokens:
+                # Re-run the tail of the previous chunk instead of padding the
+                # last one: rewriting those cache slots is idempotent, padding
+                # could write past the end of the cache
+                start = end - self.window
+            outputs = self._run(self.prefill_method, [self._tokens(ids[start:end]), self._pos(start)])
+            start = end
+        return self._next_token(outputs[0], -1)
+
+    def decode(self, token: int, pos: int) -> int:
+        """Feed one token at position `pos` and return the next token id"""
+        if self.layout == "full_window":
+            self._window_ids = (self._window_ids + [token])[-self.window:]
+            return self._window_step("decode")
+        outputs = self._run(self.decode_method, [self._tokens([token]), self._pos(pos)], "decode")
+        return self._next_token(outputs[0])
+
+    def _window_step(self, role: str = "prefill") -> int:
+        return self._next_token(*self._run_tokens("forward", self._window_ids, role=role))
+
+    # -- benchmark -------------------------------------------------------
+
+    def synthetic_prompt(self, length: int, seed: int = 0) -> list:
+        rng = random.Random(seed)
+        return [rng.randrange(1, max(2, self.vocab_size)) for _ in range(length)]
+
+    def benchmark(
+        self,
+        prompt_ids: list = None,
+        prompt_tokens: int = 64,
+        decode_tokens: int = 32,
+        warmup: int = 2,
+        repeats: int = 5,
+        mark=None,
+    ) -> dict:
+        """
+        Warm up, then time prefill (TTFT) and the decode loop `repeats` times
+
+        Returns:
+            Dict with per-run samples and summaries (p50/p90/p99, variance)
+            for ttft_ms, prefill_tok_s, decode_tok_s and decode_token_ms,
+            plus `method_ms`: per-call latency of the prefill and decode
+            methods and the prefill calls one prompt takes
+        """
+        ids = list(prompt_ids) if prompt_ids else self.synthetic_prompt(prompt_tokens)
+        if self.window and self.layout == "full_window":
+            ids = ids[:max(1, self.window - 1)]
+
+        self.call_ms = {"prefill": [], "decode": []}
+        timings = time_generation(self.prefill, self.decode, ids, decode_tokens, warmup, repeats, mark)
+        return {
+            **self.describe(),
+            "prompt_tokens": len(ids),
+            "decode_tokens": decode_tokens,
+            "warmup": warmup,
+            "repeats": repeats,
+            "prefill_padded": self.prefill_padded,
+            "method_ms": self._method_summary(warmup + repeats, warmup),
+            **timings,
+        }
+
+    def _method_summary(self, runs: int, warmup: int) -> dict:
+        """Per-call summaries, dropping the warmup runs' calls (every run makes the same calls)"""
+        summary = {}
+        for role, samples in self.call_ms.items():
+            per_run = len(samples) // runs if runs else 0
+            stats = summarize(samples[warmup * per_run:])
+            method = self.prefill_method if role == "prefill" else self.decode_method
+            summary[role] = {"method": method, "calls_per_run": per_run, **stats} if stats else None
+        return summary
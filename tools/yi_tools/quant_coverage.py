@@ -0,0 +1,152 @@
+"""
+Exact Quantization Coverage from PTE Constant Tables
+Enumerates every constant tensor in a .pte (program constants and weights
+inside XNNPACK delegate payloads) by dtype, shape and byte length, then
+reports low-bit coverage by parameter count and by bytes.
+
+Everything is read through PTEFile's mmap; tensor data is never loaded, so
+a 1.5 GB program is indexed in well under a second.
+"""
+
+import re
+
+from yi_tools.flatbuf import FlatbufferError
+from yi_tools import xnnpack
+
+# Integer weight types of 8 bits or fewer count as "INT8 covered"
+QUANTIZED_DTYPES = {
+    "int8", "uint8", "qint8", "quint8", "qcint8", "qdint8", "qpint8",
+    "qcint4", "qbint4", "quint4x2", "quint2x4",
+}
+FLOAT_DTYPES = {"fp32", "fp16", "bf16", "fp64", "pfp32"}
+
+_LAYER_RE = re.compile(r"(?:^|\.)(?:layers|h|blocks)\.(\d+)(?:\.|$)")
+
+
+def enumerate_constant_tensors(pte) -> dict:
+    """
+    All constant tensors in an open PTEFile
+
+    Returns:
+        Dict with `tensors` (each tagged with a `group` label: "program" or
+        "<method>/delegate[i]") and `unparsed_delegates` for blobs whose
+        backend payload could not be decoded.
+    """
+    tensors = []
+    for tensor in pte.constant_tensors():
+        tensor["group"] = "program"
+        tensors.append(tensor)
+
+    named_sizes = pte.named_data_sizes()
+    seen_named = set()
+    unparsed = []
+    for plan in pte.execution_plans():
+        for i, delegate in enumerate(plan["delegates"]):
+            label = f"{plan['name'] or 'method'}/delegate[{i}]"
+            if delegate["id"] not in xnnpack.XNNPACK_DELEGATE_IDS or not delegate["size"]:
+                unparsed.append({"group": label, "id": delegate["id"], "size": delegate["size"]})
+                continue
+            try:
+                blob_tensors = xnnpack.constant_tensors(pte.buf, delegate["offset"], delegate["size"], named_sizes)
+            except FlatbufferError as e:
+                unparsed.append({"group": label, "id": delegate["id"], "size": delegate["size"], "error": str(e)})
+                continue
+            for tensor in blob_tensors:
+                # Weights in the named data map may be shared across methods
+                key = tensor.get("named_key")
+                if key:
+                    if key in seen_named:
+                        continue
+                    seen_named.add(key)
+                tensor["group"] = label
+                tensor["name"] = None
+                tensors.append(tensor)
+
+    return {"tensors": tensors, "unparsed_delegates": unparsed}
+
+
+def layer_of(tensor: dict) -> str:
+    """Layer bucket: transformer block index from the FQN, else owning module or group"""
+    name = tensor.get("name")
+    if name:
+        match = _LAYER_RE.search(name)
+        if match:
+            return f"layer.{int(match.group(1))}"
+        return name.rsplit(".", 1)[0] if "." in name else name
+    return tensor["group"]
+
+
+def _bucket():
+    return {"tensors": 0, "params": 0, "bytes": 0, "quantized_params": 0, "quantized_bytes": 0}
+
+
+def _add(bucket: dict, tensor: dict, quantized: bool):
+    bucket["tensors"] += 1
+    bucket["params"] += tensor["numel"]
+    bucket["bytes"] += tensor["nbytes"]
+    if quantized:
+        bucket["quantized_params"] += tensor["numel"]
+        bucket["quantized_bytes"] += tensor["nbytes"]
+
+
+def _ratio(num: int, den: int):
+    return round(num / den, 6) if den else None
+
+
+def coverage_report(tensors: list) -> dict:
+    """
+    Coverage of <=8-bit integer weights by parameter count and by bytes
+
+    Returns:
+        Dict with totals, by_params, by_bytes, by_dtype, per_layer and
+        fp_leftovers (float constants, largest first).
+    """
+    total = _bucket()
+    by_dtype = {}
+    layers = {}
+    leftovers = []
+
+    for tensor in tensors:
+        quantized = tensor["dtype"] in QUANTIZED_DTYPES
+        _add(total, tensor, quantized)
+        dtype_bucket = by_dtype.setdefault(tensor["dtype"], {"tensors": 0, "params": 0, "bytes": 0})
+        dtype_bucket["tensors"] += 1
+        dtype_bucket["params"] += tensor["numel"]
+        dtype_bucket["bytes"] += tensor["nbytes"]
+        _add(layers.setdefault(layer_of(tensor), _bucket()), tensor, quantized)
+        if tensor["dtype"] in FLOAT_DTYPES:
+            leftovers.append({
+                "name": tensor.get("name"),
+                "group": tensor["group"],
+                "dtype": tensor["dtype"],
+                "shape": list(tensor["shape"]),
+                "params": tensor["numel"],
+                "bytes": tensor["nbytes"],
+            })
+
+    per_layer = []
+    for layer, bucket in layers.items():
+        bucket["layer"] = layer
+        bucket["coverage_by_params"] = _ratio(bucket["quantized_params"], bucket["params"])
+        bucket["coverage_by_bytes"] = _ratio(bucket["quantized_bytes"], bucket["bytes"])
+        per_layer.append(bucket)
+    per_layer.sort(key=_layer_sort_key)
+    leftovers.sort(key=lambda t: t["params"], reverse=True)
+
+    return {
+        "num_tensors": total["tensors"],
+        "total_params": total["params"],
+        "total_bytes": total["bytes"],
+        "quantized_params": total["quantized_params"],
+        "quantized_bytes": total["quantized_bytes"],
+        "by_params": _ratio(total["quantized_params"], total["params"]),
+        "by_bytes": _ratio(total["quantized_bytes"], total["bytes"]),
+        "by_dtype": by_dtype,
+        "per_layer": per_layer,
+        "fp_leftovers": leftovers,
+    }
+
+
+def _layer_sort_key(bucket: dict):
+    match = re.fullmatch(r"layer\.(\d+)", bucket["layer"])
+    return (0, int(match.group(1)), "") if match else (1, 0, bucket["layer"])
@@ -0,0 +1,345 @@
+"""
+PT2E Weight Quantization
+INT8 / INT4 XNNPACK quantization for the ExecuTorch exports
+
+Schemes follow ExecuTorch's naming (8-bit dynamic activations, N-bit
+weights):
+
+    8da8w   per-channel INT8 linear weights via the PT2E XNNPACKQuantizer
+    8da4w   4-bit groupwise linear weights, one scale per `group_size` input
+            channels, via torchao quantize_ on the eager model (the XNNPACK
+            quantizer has no groupwise spec)
+
+With either scheme the embedding table can be quantized per row to INT8
+(PT2E EmbeddingQuantizer); to_executorch fuses it into
+quantized_decomposed::embedding_byte when do_quant_fusion_and_const_prop is
+set. Activations are quantized per call inside the XNNPACK kernels, so no
+activation range is frozen at export. Calibration still runs real text - the
+scenario prompts in prompts/scenarios_10turn.md, rendered the way the app
+sends them - through every prepared method before convert_pt2e, so the
+observers see in-distribution inputs and a method that cannot run on them
+fails at export rather than on the device.
+
+Flow, per method of a (multi-method) program:
+
+    quantize_source(model)                  # 8da4w only
+    export -> prepare_pt2e -> calibrate -> convert_pt2e -> export
+    to_edge_transform_and_lower(..., partitioner=partitioners())
+
+PT2E quantizes a graph holding the fp32 weights. The streamed export
+(yi_tools.weight_stream) never has them all at once, so it quantizes each
+layer eagerly as it is read instead: quantize_linears() for either scheme
+(torchao's per-channel INT8 form for 8da8w, lowered to the same XNNPACK
+kernels) and QuantizedEmbedding for the table.
+
+torchao and executorch are imported only when a model is quantized.
+"""
+
+import torch
+from torch import nn
+
+from yi_tools.conversation_bench import DEFAULT_SCENARIOS, SYSTEM_PROMPTS, parse_scenarios
+
+SCHEMES = ("8da8w", "8da4w")
+DEFAULT_SCHEME = "8da8w"
+DEFAULT_GROUP_SIZE = 128
+DEFAULT_CALIBRATION_TOKENS = 128  # per scenario and method
+PT2E_FLOW = "pt2e+xnnpack"  # manifest quantization_config.flow
+
+
+def _check_scheme(scheme: str):
+    if scheme not in SCHEMES:
+        raise ValueError(f"unknown quantization scheme {scheme!r} (expected one of: {', '.join(SCHEMES)})")
+
+
+def label(scheme: str, group_size: int = DEFAULT_GROUP_SIZE) -> str:
+    """The manifest's `quantization` string, e.g. "INT4 (8da4w, group 128)" """
+    _check_scheme(scheme)
+    if scheme == "8da4w":
+        return f"INT4 (8da4w, group {group_size})"
+    return "INT8 (8da8w)"
+
+
+def register_quantized_ops():
+    """
+    Register the quantized_decomposed embedding ops with torch
+
+    The op schemas come from exir's quant patterns (needed to fuse
+    dequantize + embedding into embedding_byte), the kernels from the
+    quantized AOT library, which the pybindings also need to run them.
+    """
+    import executorch.exir.passes._quant_patterns_and_replacements  # noqa: F401
+    import executorch.kernels.quantized  # noqa: F401
+
+
+def quantize_source(model: nn.Module, scheme: str, group_size: int = DEFAULT_GROUP_SIZE) -> nn.Module:
+    """
+    Eager-model transform applied before torch.export
+
+    8da4w swaps every nn.Linear whose input width splits into whole groups
+    for torchao's dynamic-activation / 4-bit groupwise-weight form, which
+    the XNNPACK partitioner lowers to its blockwise INT4 kernels. 8da8w
+    quantizes in the graph instead, so the model is returned unchanged.
+    """
+    _check_scheme(scheme)
+    if scheme != "8da4w":
+        return model
+    return quantize_linears(model, scheme, group_size)
+
+
+def quantize_linears(module: nn.Module, scheme: str, group_size: int = DEFAULT_GROUP_SIZE) -> nn.Module:
+    """
+    torchao dynamic-activation quantization of the nn.Linear layers in `module`
+
+    8da4w: 4-bit groupwise weights (linears whose input width splits into
+    whole groups); 8da8w: per-channel INT8 weights. Either lowers to the
+    XNNPACK dynamically quantized kernels. `module` may be a single layer,
+    or a bare nn.Linear.
+    """
+    _check_scheme(scheme)
+    from torchao.quantization import Int8DynamicActivationIntxWeightConfig, PerAxis, PerGroup, quantize_
+
+    if scheme == "8da4w":
+        config = Int8DynamicActivationIntxWeightConfig(weight_dtype=torch.int4, weight_granularity=PerGroup(group_size))
+        filter_fn = lambda child, fqn: isinstance(child, nn.Linear) and child.in_features % group_size == 0
+    else:
+        config = Int8DynamicActivationIntxWeightConfig(weight_dtype=torch.int8, weight_granularity=PerAxis(0))
+        filter_fn = lambda child, fqn: isinstance(child, nn.Linear)
+    quantize_(module, config, filter_fn=filter_fn)
+    return module
+
+
+def quantize_linear_blocks(blocks, scheme: str, group_size: int = DEFAULT_GROUP_SIZE) -> torch.Tensor:
+    """
+    quantize_linears() weight of a linear given as fp row blocks
+
+    Both schemes scale each output row on its own, so quantizing blocks of
+    rows and concatenating them gives the tensor quantize_linears() makes
+    from the whole weight, without the whole fp32 weight (and its
+    quantization temporaries) in memory - for a vocab-sized lm_head.
+    """
+    parts = []
+    for rows in blocks:
+        with torch.device("meta"):
+            block = nn.Linear(rows.shape[1], rows.shape[0], bias=False)
+        block.weight = nn.Parameter(rows, requires_grad=False)
+        parts.append(quantize_linears(block, scheme, group_size).weight)
+    first = parts[0]
+    if not hasattr(first, "qdata"):  # width not a whole number of groups: left fp
+        return torch.cat(parts)
+    return type(first)(
+        torch.cat([part.qdata for part in parts]),
+        torch.cat([part.scale for part in parts]),
+        torch.cat([part.zero_point for part in parts]),
+        first.target_dtype,
+        first.block_size,
+        first.dtype,
+        first.activation_quantization,
+    )
+
+
+def quantize_rows(weight: torch.Tensor) -> tuple:
+    """Symmetric INT8 per row: (int8 [rows, cols], fp32 scales [rows])"""
+    weight = weight.float()
+    scales = (weight.abs().amax(dim=1) / 127).clamp(min=torch.finfo(torch.float32).eps)
+    quantized = torch.round(weight / scales[:, None]).clamp(-128, 127).to(torch.int8)
+    return quantized, scales
+
+
+class QuantizedEmbedding(nn.Module):
+    """
+    INT8 per-row embedding table, looked up with
+    quantized_decomposed::embedding_byte (what PT2E's EmbeddingQuantizer
+    fuses into), so the table is never fp32 in the graph
+
+    `output_scale` carries a scaled embedding's multiplier (Gemma's
+    embed_scale) over from the module it replaces.
+    """
+
+    def __init__(self, num_embeddings: int, embedding_dim: int, output_scale: torch.Tensor = None):
+        super().__init__()
+        register_quantized_ops()
+        self.num_embeddings = num_embeddings
+        self.embedding_dim = embedding_dim
+        self.register_buffer("weight", torch.empty((num_embeddings, embedding_dim), dtype=torch.int8))
+        self.register_buffer("scales", torch.empty(num_embeddings, dtype=torch.float32))
+        if output_scale is not None:
+            output_scale = output_scale.detach().to(torch.float32).clone()
+        self.register_buffer("output_scale", output_scale, persistent=False)
+
+    def load_rows(self, start: int, rows: torch.Tensor):
+        """Quantize fp rows [start, start + len(rows)) of the table into place"""
+        quantized, scales = quantize_rows(rows)
+        self.weight[start:start + len(rows)] = quantized
+        self.scales[start:start + len(rows)] = scales
+
+    def forward(self, indices):
+        embeds = torch.ops.quantized_decomposed.embedding_byte.dtype(
+            self.weight, self.scales, None, -128, 127, indices, dtype=torch.float32
+        )
+        if self.output_scale is not None:
+            embeds = embeds * self.output_scale
+        return embeds
+
+
+def pt2e_quantizer(scheme: str, embeddings: bool = True):
+    """
+    prepare_pt2e quantizer for a scheme
+
+    Returns:
+        ComposableQuantizer (embedding table and/or 8da8w linears), or None
+        when the graph has nothing left to annotate (8da4w, no embeddings)
+    """
+    _check_scheme(scheme)
+    quantizers = []
+    if embeddings:
+        from torchao.quantization.pt2e.quantizer.embedding_quantizer import EmbeddingQuantizer
+
+        register_quantized_ops()
+        quantizers.append(EmbeddingQuantizer())
+    if scheme == "8da8w":
+        from executorch.backends.xnnpack.quantizer.xnnpack_quantizer import (
+            XNNPACKQuantizer,
+            get_symmetric_quantization_config,
+        )
+
+        linear_config = get_symmetric_quantization_config(is_per_channel=True, is_dynamic=True)
+        quantizers.append(XNNPACKQuantizer().set_global(linear_config))
+    if not quantizers:
+        return None
+    from torchao.quantization.pt2e.quantizer import ComposableQuantizer
+
+    return ComposableQuantizer(quantizers)
+
+
+def partitioners() -> list:
+    """
+    XNNPACK partitioners for a quantized program: the dynamically quantized
+    linears first, then everything else. In a single pass the partitioner
+    can build cyclic partitions once the token axis is dynamic.
+    """
+    from executorch.backends.xnnpack.partition.xnnpack_partitioner import (
+        XnnpackDynamicallyQuantizedPartitioner,
+        XnnpackPartitioner,
+    )
+
+    return [XnnpackDynamicallyQuantizedPartitioner(), XnnpackPartitioner()]
+
+
+def calibration_samples(
+    tokenizer,
+    path: str = DEFAULT_SCENARIOS,
+    max_tokens: int = DEFAULT_CALIBRATION_TOKENS,
+) -> list:
+    """
+    Token ids per scenario: the app's system prompt and every user turn
+
+    Rendered with the tokenizer's chat template when it has one, otherwise
+    as "Role: text" lines (TokenizerSession's format). Each sample is cut to
+    max_tokens.
+    """
+    samples = []
+    for scenario in parse_scenarios(path):
+        messages = [{"role": "system", "content": SYSTEM_PROMPTS[scenario["language"]]}]
+        messages += [{"role": "user", "content": turn} for turn in scenario["turns"]]
+        if getattr(tokenizer, "chat_template", None):
+            text = tokenizer.apply_chat_template(messages, tokenize=False)
+        else:
+            text = "".join(f"{m['role'].capitalize()}: {m['content']}\n" for m in messages)
+        samples.append(tokenizer(text, add_special_tokens=False)["input_ids"][:max_tokens])
+    return samples
+
+
+def prompt_calibrator(samples: list):
+    """
+    Calibration hook for quantize_methods()
+
+    Feeds every sample through a prepared method in windows of the method's
+    own token width (a trailing partial window is dropped). Static-KV
+    methods `(tokens, input_pos)` start each sample at position 0, so the
+    cache is overwritten rather than overrun; stateless `(tokens,)` methods
+    see every window on its own.
+    """
+
+    def calibrate(method: str, module, example_inputs: tuple):
+        width = example_inputs[0].shape[1]
+        for ids in samples:
+            for start in range(0, len(ids) - width + 1, width):
+                tokens = torch.tensor([ids[start:start + width]], dtype=torch.long)
+                if len(example_inputs) > 1:
+                    module(tokens, torch.tensor([start], dtype=torch.long))
+                else:
+                    module(tokens)
+
+    return calibrate
+
+
+def quantize_methods(
+    exported: dict,
+    quantizer,
+    calibrate=None,
+    strict: bool = True,
+    dynamic_shapes: dict = None,
+) -> dict:
+    """
+    prepare_pt2e -> calibrate -> convert_pt2e every method, then re-export
+
+    Args:
+        exported: {method: ExportedProgram}, e.g. static_kv.export_methods()
+        quantizer: pt2e_quantizer() result; None returns `exported` as is
+        calibrate: optional hook `calibrate(method, prepared_module, example_inputs)`
+        strict: torch.export mode for the re-export (strict for HF models)
+        dynamic_shapes: {method: dynamic_shapes} the methods were first
+            exported with (static_kv.dynamic_shapes()); re-applied so the
+            quantized graph keeps its dynamic axes
+
+    Returns:
+        {method: ExportedProgram} with the weights stored quantized. Each
+        method quantizes the same weights to the same bytes, so a
+        multi-method program still serializes them once.
+    """
+    if quantizer is None:
+        return exported
+    from torch.export import export
+    from torchao.quantization.pt2e.quantize_pt2e import convert_pt2e, prepare_pt2e
+
+    dynamic_shapes = dynamic_shapes or {}
+    quantized = {}
+    with torch.no_grad():
+        for method, program in exported.items():
+            args, kwargs = program.example_inputs
+            prepared = prepare_pt2e(program.module(), quantizer)
+            if calibrate is not None:
+                calibrate(method, prepared, args)
+            quantized[method] = export(
+                convert_pt2e(prepared), args, kwargs, dynamic_shapes=dynamic_shapes.get(method), strict=strict
+            )
+    return quantized
+
+
+def manifest_entry(
+    scheme: str,
+    group_size: int = DEFAULT_GROUP_SIZE,
+    embeddings: bool = True,
+    calibration_samples: int = 0,
+    flow: str = PT2E_FLOW,
+) -> dict:
+    """
+    The manifest's `quantization_config` block
+
+    `calibration` is None outside the PT2E flow (the streamed export
+    quantizes eagerly and never calibrates).
+    """
+    _check_scheme(scheme)
+    calibration = None
+    if flow == PT2E_FLOW:
+        calibration = {"source": "prompts/scenarios_10turn.md", "samples": calibration_samples}
+    return {
+        "scheme": scheme,
+        "flow": flow,
+        "activations": "int8 dynamic",
+        "linear": "int4 groupwise" if scheme == "8da4w" else "int8 per-channel",
+        "group_size": group_size if scheme == "8da4w" else None,
+        "embedding": "int8 per-row" if embeddings else "fp32",
+        "calibration": calibration,
+    }
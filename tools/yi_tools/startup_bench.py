@@ -0,0 +1,147 @@
+"""
+CLI Startup-Time Benchmark
+Guards the structural checks against import-time regressions
+
+Each command is started in a fresh interpreter (`python -m yi_tools <cmd>
+--help`) several times; the median wall time must stay under the budget
+(default 100 ms). A second probe imports each command's module and fails
+if any heavy backend (torch, executorch, ...) ended up in sys.modules.
+Commands flagged as needing a runtime are only timed, not gated.
+
+Usage:
+    python -m yi_tools startup [--runs 7] [--budget-ms 100] [--json-output out.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from yi_tools.cli import COMMANDS, TOOLS_DIR
+from yi_tools.lazy import HEAVY_BACKENDS
+
+DEFAULT_BUDGET_MS = 100.0
+DEFAULT_RUNS = 7
+
+_PROBE = (
+    "import sys; sys.path.insert(0, {tools!r}); "
+    "from yi_tools.cli import resolve; resolve({command!r}); "
+    "print(','.join(m for m in {heavy!r} if m in sys.modules))"
+)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = TOOLS_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def time_command(command: str, runs: int = DEFAULT_RUNS) -> list:
+    """Wall times (ms) of `python -m yi_tools <command> --help` in fresh processes"""
+    cmd = [sys.executable, "-m", "yi_tools", command, "--help"]
+    env = _env()
+    subprocess.run(cmd, capture_output=True, env=env)  # warm the page cache / pyc
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, capture_output=True, env=env)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def heavy_imports(command: str) -> list:
+    """Heavy backends imported just by loading the command's module"""
+    code = _PROBE.format(tools=TOOLS_DIR, command=command, heavy=HEAVY_BACKENDS)
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=_env())
+    if proc.returncode != 0:
+        raise RuntimeError(f"{command}: import failed\n{proc.stderr.strip()}")
+    return [m for m in proc.stdout.strip().split(",") if m]
+
+
+def baseline_ms(runs: int = DEFAULT_RUNS) -> float:
+    """Median start-up of a bare interpreter, for context"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], capture_output=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def run_benchmark(commands: list = None, runs: int = DEFAULT_RUNS, budget_ms: float = DEFAULT_BUDGET_MS) -> dict:
+    commands = commands or list(COMMANDS)
+    result = {
+        "python": sys.version.split()[0],
+        "budget_ms": budget_ms,
+        "runs": runs,
+        "interpreter_ms": round(baseline_ms(runs), 1),
+        "commands": {},
+        "status": "PASS",
+    }
+    for command in commands:
+        gated = not COMMANDS[command][3]
+        times = time_command(command, runs)
+        heavy = heavy_imports(command)
+        median = statistics.median(times)
+        failures = []
+        if gated and median > budget_ms:
+            failures.append(f"median {median:.1f} ms > {budget_ms:.0f} ms")
+        if heavy:
+            failures.append(f"imports {', '.join(heavy)} at startup")
+        result["commands"][command] = {
+            "median_ms": round(median, 1),
+            "min_ms": round(min(times), 1),
+            "max_ms": round(max(times), 1),
+            "gated": gated,
+            "heavy_imports": heavy,
+            "status": "FAIL" if failures else "PASS",
+            "failures": failures,
+        }
+        if failures:
+            result["status"] = "FAIL"
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark yi_tools command startup time")
+    parser.add_argument("commands", nargs="*", help=f"Commands (default: all of {', '.join(COMMANDS)})")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help=f"Runs per command (default: {DEFAULT_RUNS})")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help=f"Median startup budget for structural commands (default: {DEFAULT_BUDGET_MS:.0f})"
+    )
+    parser.add_argument("--json-output", help="Path to save JSON results (optional)")
+    args = parser.parse_args()
+    unknown = [c for c in args.commands if c not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown commands: {', '.join(unknown)}")
+
+    result = run_benchmark(args.commands, args.runs, args.budget_ms)
+
+    print("=" * 70)
+    print(f"STARTUP BENCHMARK (budget {args.budget_ms:.0f} ms, {args.runs} runs, "
+          f"bare interpreter {result['interpreter_ms']:.1f} ms)")
+    print("=" * 70)
+    width = max(len(name) for name in COMMANDS)
+    for command, stats in result["commands"].items():
+        note = "; ".join(stats["failures"]) or ("" if stats["gated"] else "not gated (loads a runtime)")
+        print(f"  {stats['status']:<5} {command:<{width}} median {stats['median_ms']:>7.1f} ms  "
+              f"[{stats['min_ms']:.1f}-{stats['max_ms']:.1f}]  {note}")
+    print(f"\n  Status: {result['status']}")
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults saved to: {args.json_output}")
+
+    sys.exit(0 if result["status"] == "PASS" else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Static KV-Cache Export
+Single-token decode programs for HuggingFace causal LMs
+
+The stateless exports trace `model(input_ids)`, so every generated token
+re-runs attention over the whole prefix. Here the model is wrapped with a
+transformers StaticCache (HybridCache for sliding-window models such as
+Gemma 3) whose K/V tensors are registered as mutable buffers sized to one
+preset's ctx, and exported with the calling convention PTERunner reads as
+the `kv_cache` layout:
+
+    forward(tokens[1, 1], input_pos[1]) -> logits[1, 1, V]
+
+Each decode step is one token attending to the cache, so decode tok/s is
+flat in conversation length. ExecuTorch serializes only the buffers' shape
+and dtype, and the runtime allocates them (max_cache_len x layers x kv_heads
+x head_dim x 2) at load.
+
+With a prefill chunk the program has two methods traced from the same
+module (PTERunner's `prefill_decode` layout):
+
+    prefill(tokens[1, 1..chunk], input_pos[1]) -> logits[1, 1..chunk, V]
+    decode(tokens[1, 1], input_pos[1])         -> logits[1, 1, V]
+
+Their constants are the same tensors, so weights are serialized once, and
+executorch_config() plans the cache buffers into one arena both methods
+read and write. Without one, `forward` is the decode step and the prompt
+is fed a token at a time.
+
+The prefill token axis is dynamic (torch.export Dim, 1..chunk): a 30-token
+turn runs 30 positions instead of being padded to the chunk. The memory
+planner sizes activations and logits for the upper bound, so the bound is
+the chunk - capped at the cache length, the preset's ctx - rather than the
+whole ctx; longer prompts are fed chunk by chunk. check_bounds() and
+undelegated_ops() verify the lowered program at those bounds.
+
+transformers is imported only when a model is wrapped.
+"""
+
+import torch
+from torch import nn
+
+from yi_tools.presets import get_preset
+
+DEFAULT_PRESET = "full"
+DEFAULT_PREFILL_CHUNK = 128
+TYPICAL_TURN_TOKENS = 40  # most user turns are shorter
+
+
+def cache_len_for(preset: str = DEFAULT_PRESET, manifest: dict = None) -> int:
+    """KV-cache length for a preset: its ctx (FULL by default, so every preset fits)"""
+    return get_preset(preset, manifest)["ctx"]
+
+
+class StaticKVDecoder(nn.Module):
+    """`forward(tokens, input_pos) -> logits` over a transformers static cache"""
+
+    def __init__(self, model, max_cache_len: int):
+        super().__init__()
+        from transformers.integrations.executorch import TorchExportableModuleForDecoderOnlyLM
+
+        model.generation_config.use_cache = True
+        model.generation_config.cache_implementation = "static"
+        model.generation_config.cache_config = {"batch_size": 1, "max_cache_len": max_cache_len}
+        # The outer wrapper only picks Static vs Hybrid cache; its forward
+        # drops cache_position, so call the cache-owning module directly
+        self.decoder = TorchExportableModuleForDecoderOnlyLM(
+            model, batch_size=1, max_cache_len=max_cache_len
+        ).model
+        self.max_cache_len = max_cache_len
+
+    def forward(self, tokens, input_pos):
+        return self.decoder(input_ids=tokens, cache_position=input_pos)
+
+
+def example_inputs(tokens: int) -> tuple:
+    return (torch.zeros((1, tokens), dtype=torch.long), torch.tensor([0], dtype=torch.long))
+
+
+def sequence_dim(max_tokens: int):
+    """torch.export Dim for a token axis taking 1..max_tokens"""
+    from torch.export import Dim
+
+    return Dim("tokens", min=1, max=max_tokens)
+
+
+def dynamic_shapes(prefill_chunk: int = None) -> dict:
+    """
+    {method: dynamic_shapes} for export_methods() programs
+
+    Only prefill has a dynamic axis; decode is always one token. Passed
+    again when a method is re-exported (yi_tools.quantize).
+    """
+    if not prefill_chunk or prefill_chunk < 2:
+        return {}
+    return {"prefill": ({1: sequence_dim(prefill_chunk)}, None)}
+
+
+def export_methods(
+    decoder: nn.Module,
+    prefill_chunk: int = None,
+    strict: bool = True,
+    dynamic: bool = True,
+) -> dict:
+    """
+    torch.export `decoder(tokens, input_pos)` once per method
+
+    Args:
+        prefill_chunk: tokens per prefill call (the upper bound when dynamic)
+        dynamic: prefill takes 1..prefill_chunk tokens; False pins it to exactly prefill_chunk
+
+    Returns:
+        {"forward": decode} or, with prefill_chunk, {"prefill": ..., "decode": ...}
+        - a dict to_edge / to_edge_transform_and_lower take as a multi-method program
+    """
+    from torch.export import export
+
+    shapes = dynamic_shapes(prefill_chunk) if dynamic else {}
+    with torch.no_grad():
+        decode = export(decoder, example_inputs(1), strict=strict)
+        if not prefill_chunk:
+            return {"forward": decode}
+        prefill = export(decoder, example_inputs(prefill_chunk), dynamic_shapes=shapes.get("prefill"), strict=strict)
+        return {"prefill": prefill, "decode": decode}
+
+
+def export_static_kv(model, max_cache_len: int, prefill_chunk: int = None, dynamic: bool = True) -> dict:
+    """
+    torch.export a HuggingFace causal LM over a static KV cache
+
+    Returns:
+        export_methods() dict; every graph mutates the key/value cache buffers
+    """
+    if prefill_chunk and prefill_chunk > max_cache_len:
+        raise ValueError(f"prefill chunk {prefill_chunk} exceeds the {max_cache_len}-token cache")
+    decoder = StaticKVDecoder(model, max_cache_len).eval()
+    # strict (dynamo) tracing keeps the cache tensors as mutated buffers;
+    # non-strict lifts them to constants and lowering fails
+    return export_methods(decoder, prefill_chunk, strict=True, dynamic=dynamic)
+
+
+def executorch_config(**overrides):
+    """
+    ExecutorchBackendConfig with the KV-cache buffers shared across methods
+
+    Returns a fresh config each call: the memory planning pass keeps
+    per-program state.
+    """
+    from executorch.exir import ExecutorchBackendConfig
+    from executorch.exir.passes import MemoryPlanningPass
+
+    return ExecutorchBackendConfig(
+        memory_planning_pass=MemoryPlanningPass(alloc_graph_input=False, share_mutable_buffers=True),
+        emit_mutable_buffer_names=True,
+        **overrides,
+    )
+
+
+# Ops that must run inside a backend delegate for the program to be fast
+COMPUTE_OPS = ("aten.mm", "aten.bmm", "aten.addmm", "aten.linear", "aten.convolution", "aten.matmul")
+
+
+def undelegated_ops(program) -> dict:
+    """
+    Matmul-class ops left on portable kernels, per method
+
+    Args:
+        program: EdgeProgramManager or ExecutorchProgramManager after lowering
+
+    Returns:
+        {method: {op: count}}; empty dicts mean everything heavy is delegated
+    """
+    found = {}
+    for method in sorted(program.methods):
+        ops = {}
+        for node in program.exported_program(method).graph.nodes:
+            name = str(node.target)
+            if node.op == "call_function" and name.startswith(COMPUTE_OPS):
+                ops[name] = ops.get(name, 0) + 1
+        found[method] = ops
+    return found
+
+
+def token_bounds(max_tokens: int) -> list:
+    """Both ends of a 1..max_tokens axis plus a typical user turn"""
+    return sorted({1, min(max_tokens, TYPICAL_TURN_TOKENS), max_tokens})
+
+
+def bound_lengths(prefill_chunk: int = None) -> dict:
+    """{method: token counts to check} for an export_methods() program"""
+    if not prefill_chunk:
+        return {"forward": [1]}
+    return {"prefill": token_bounds(prefill_chunk), "decode": [1]}
+
+
+def check_bounds(buffer, lengths: dict) -> list:
+    """
+    Run a serialized program at each token count, from position 0
+
+    Args:
+        buffer: .pte bytes (ExecutorchProgramManager.buffer)
+        lengths: {method: [tokens, ...]}, e.g. bound_lengths(); methods
+            taking only tokens (stateless exports) get no input_pos
+
+    Returns:
+        [{method, tokens, ok, logits_shape, ms, error}] - ok when the call
+        succeeds and returns one logits row per input token
+    """
+    import time
+
+    from executorch.runtime import Runtime
+
+    program = Runtime.get().load_program(buffer)
+    rows = []
+    for method, counts in lengths.items():
+        loaded = program.load_method(method)
+        meta = loaded.metadata
+        with_pos = (meta() if callable(meta) else meta).num_inputs() > 1
+        for tokens in counts:
+            row = {"method": method, "tokens": tokens, "ok": False, "logits_shape": None, "ms": None, "error": None}
+            inputs = [torch.ones((1, tokens), dtype=torch.long)]
+            if with_pos:
+                inputs.append(torch.tensor([0], dtype=torch.long))
+            start_time = time.perf_counter()
+            try:
+                logits = loaded.execute(inputs)[0]
+                row["ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+                row["logits_shape"] = list(logits.shape)
+                row["ok"] = logits.dim() == 3 and logits.shape[1] == tokens
+            except RuntimeError as e:
+                row["error"] = str(e)
+            rows.append(row)
+    return rows
+
+
+def manifest_entry(
+    max_cache_len: int,
+    preset: str = DEFAULT_PRESET,
+    prefill_chunk: int = None,
+    dynamic: bool = True,
+) -> dict:
+    """The manifest's `kv_cache` block for a static-cache program"""
+    if prefill_chunk:
+        tokens = f"1..{prefill_chunk}" if dynamic and prefill_chunk > 1 else f"{prefill_chunk}"
+        methods = {
+            "prefill": f"prefill(tokens[1, {tokens}], input_pos[1]) -> logits[1, {tokens}, V]",
+            "decode": "decode(tokens[1, 1], input_pos[1]) -> logits[1, 1, V]",
+        }
+    else:
+        methods = {"forward": "forward(tokens[1, 1], input_pos[1]) -> logits[1, 1, V]"}
+    return {
+        "layout": "prefill_decode" if prefill_chunk else "kv_cache",
+        "static": True,
+        "methods": methods,
+        "max_cache_len": max_cache_len,
+        "sized_for_preset": preset,
+        "prefill_chunk": prefill_chunk,
+        "prefill_dynamic": bool(dynamic and prefill_chunk and prefill_chunk > 1),
+        "tokens_per_step": prefill_chunk or 1,
+    }
@@ -0,0 +1,386 @@
+"""
+Thread-Count and CPU-Affinity Sweep
+Derives per-topology thread presets from measured prefill and decode rates
+
+Prefill is compute-bound and usually scales with cores; decode is
+memory-bound and often peaks earlier - on big.LITTLE parts, spilling onto
+the little cores can halve it. For every candidate CPU set (all cores,
+each capacity tier from the fastest down, one thread per physical core on
+SMT hosts) and thread count, the process is pinned with sched_setaffinity,
+the runtime is created inside the pinned region (so its worker threads
+inherit the mask) and prefill / decode are timed separately.
+
+The recommendation per phase is the fewest threads within --tolerance of
+the best rate (fewer threads = less heat and contention on a phone). It is
+keyed by a topology string such as "4c@1024+4c@512" (CPU count @ sysfs
+cpu_capacity per tier) or "8c-smt", and can be written into the manifest's
+recommended_presets.<preset>.threads.
+
+Backends: llama.cpp (n_threads / n_threads_batch), ONNX Runtime
+(intra_op_num_threads) and ExecuTorch (the pybindings' threadpool).
+
+Usage:
+    python -m yi_tools threads model.gguf [--threads 1,2,4] [--preset safe]
+        [--manifest manifest.json --update-manifest] [--json-output out.json]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+from yi_tools.lazy import is_available
+
+DEFAULT_TOLERANCE = 0.03
+CPU_SYSFS = "/sys/devices/system/cpu"
+
+
+def parse_cpu_list(text: str) -> list:
+    """'0-3,6' -> [0, 1, 2, 3, 6]"""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        low, _, high = part.partition("-")
+        cpus.extend(range(int(low), int(high or low) + 1))
+    return cpus
+
+
+def format_cpu_list(cpus: list) -> str:
+    """[0, 1, 2, 3, 6] -> '0-3,6'"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(f"{a}-{b}" if a != b else f"{a}" for a, b in ranges)
+
+
+def _read(path: str) -> str:
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def allowed_cpus() -> list:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_topology(cpus: list = None) -> dict:
+    """
+    Capacity tiers and SMT siblings of the CPUs this process may run on
+
+    Tiers come from sysfs cpu_capacity (falling back to cpufreq max
+    frequency); hosts without either are a single tier.
+    """
+    cpus = cpus or allowed_cpus()
+    capacity, siblings = {}, {}
+    for cpu in cpus:
+        base = os.path.join(CPU_SYSFS, f"cpu{cpu}")
+        value = _read(os.path.join(base, "cpu_capacity")) or _read(os.path.join(base, "cpufreq", "cpuinfo_max_freq"))
+        capacity[cpu] = int(value) if value and value.isdigit() else None
+        sibling_list = _read(os.path.join(base, "topology", "thread_siblings_list"))
+        siblings[cpu] = tuple(c for c in parse_cpu_list(sibling_list) if c in cpus) if sibling_list else (cpu,)
+
+    tiers = {}
+    for cpu in cpus:
+        tiers.setdefault(capacity[cpu], []).append(cpu)
+    clusters = [{"cpus": tiers[c], "capacity": c}
+                for c in sorted(tiers, key=lambda c: -(c or 0))]
+    cores = sorted({min(s) for s in siblings.values()})
+    smt = len(cores) < len(cpus)
+
+    if len(clusters) == 1:
+        key = f"{len(cpus)}c"
+    else:
+        key = "+".join(f"{len(c['cpus'])}c@{c['capacity']}" for c in clusters)
+    return {
+        "key": key + ("-smt" if smt else ""),
+        "cpus": cpus,
+        "clusters": clusters,
+        "physical_cores": cores,
+        "smt": smt,
+    }
+
+
+def cpu_sets(topology: dict) -> dict:
+    """Candidate affinity masks: all, fastest tiers cumulatively, physical cores"""
+    sets = {"all": topology["cpus"]}
+    clusters = topology["clusters"]
+    for index in range(1, len(clusters)):
+        name = "big" if index == 1 else f"big+{index - 1}"
+        sets[name] = sorted(c for cluster in clusters[:index] for c in cluster["cpus"])
+    if topology["smt"]:
+        sets["physical"] = topology["physical_cores"]
+
+    unique = {}
+    for name, cpus in sets.items():
+        if cpus not in unique.values():
+            unique[name] = cpus
+    return unique
+
+
+def default_thread_counts(limit: int) -> list:
+    counts = [n for n in (1, 2, 3, 4, 6, 8, 12, 16) if n < limit]
+    return counts + [limit]
+
+
+@contextlib.contextmanager
+def pinned(cpus: list):
+    """Restrict the calling thread (and threads it creates) to `cpus`"""
+    if not hasattr(os, "sched_setaffinity"):
+        yield False
+        return
+    previous = os.sched_getaffinity(0)
+    os.sched_setaffinity(0, cpus)
+    try:
+        yield True
+    finally:
+        os.sched_setaffinity(0, previous)
+
+
+def backend_for(model_path: str) -> str:
+    ext = os.path.splitext(model_path.lower())[1]
+    return {".gguf": "llama.cpp", ".onnx": "onnxruntime", ".ort": "onnxruntime"}.get(ext, "executorch")
+
+
+def measure(
+    backend: str,
+    model_path: str,
+    threads: int,
+    prompt_tokens: int = 64,
+    decode_tokens: int = 32,
+    warmup: int = 1,
+    repeats: int = 3,
+    n_ctx: int = 512,
+    language: str = "ko",
+) -> dict:
+    """Create the runtime with `threads` workers and time one prefill/decode benchmark"""
+    if backend == "llama.cpp":
+        from yi_tools.gguf_runtime import GGUFRunner
+
+        runner = GGUFRunner(model_path, n_ctx=n_ctx, n_threads=threads, n_threads_batch=threads)
+        bench = runner.benchmark_languages([language], max_new_tokens=decode_tokens, warmup=warmup, repeats=repeats)
+        detail = next(iter(bench["details"].values()))
+        return {
+            "prefill_tok_s": detail["prompt_eval_speed"]["p50"] if detail["prompt_eval_speed"] else None,
+            "decode_tok_s": detail["tokens_per_second"]["p50"] if detail["tokens_per_second"] else None,
+            "ttft_ms": detail["ttft_ms"]["p50"],
+        }
+
+    if backend == "onnxruntime":
+        from yi_tools.ort_runtime import ORTRunner
+
+        runner = ORTRunner(model_path, intra_op=threads)
+    else:
+        from yi_tools.pte_runtime import PYBINDINGS_MODULE, PTERunner
+
+        runner = PTERunner(model_path)
+        portable_lib = sys.modules[PYBINDINGS_MODULE]
+        if not hasattr(portable_lib, "_unsafe_reset_threadpool"):
+            raise RuntimeError("ExecuTorch pybindings cannot resize the threadpool")
+        portable_lib._unsafe_reset_threadpool(threads)
+    bench = runner.benchmark(prompt_tokens=prompt_tokens, decode_tokens=decode_tokens, warmup=warmup, repeats=repeats)
+    return {
+        "prefill_tok_s": bench["prefill_tok_s"]["p50"],
+        "decode_tok_s": bench["decode_tok_s"]["p50"] if bench["decode_tok_s"] else None,
+        "ttft_ms": bench["ttft_ms"]["p50"],
+    }
+
+
+def recommend(rows: list, metric: str, tolerance: float = DEFAULT_TOLERANCE) -> dict:
+    """Fewest threads (then smallest CPU set) within `tolerance` of the best `metric`"""
+    valid = [r for r in rows if r.get(metric)]
+    if not valid:
+        return None
+    best = max(r[metric] for r in valid)
+    eligible = [r for r in valid if r[metric] >= best * (1 - tolerance)]
+    pick = min(eligible, key=lambda r: (r["threads"], len(r["cpus"]), -r[metric]))
+    return {
+        "threads": pick["threads"],
+        "cpuset": pick["cpuset"],
+        "cpus": format_cpu_list(pick["cpus"]),
+        "tok_s": pick[metric],
+        "best_tok_s": best,
+    }
+
+
+def run_sweep(
+    model_path: str,
+    thread_counts: list = None,
+    prompt_tokens: int = 64,
+    decode_tokens: int = 32,
+    warmup: int = 1,
+    repeats: int = 3,
+    n_ctx: int = 512,
+    tolerance: float = DEFAULT_TOLERANCE,
+    progress=None,
+) -> dict:
+    """
+    Sweep CPU sets x thread counts for one model
+
+    Returns:
+        Dict with topology, rows [{cpuset, cpus, threads, prefill_tok_s,
+        decode_tok_s, ttft_ms, error}] and `recommended` {prefill, decode}
+    """
+    backend = backend_for(model_path)
+    topology = cpu_topology()
+    points = []
+    for name, cpus in cpu_sets(topology).items():
+        counts = thread_counts or default_thread_counts(len(cpus))
+        points += [(name, cpus, n) for n in counts if n <= len(cpus)]
+
+    rows = []
+    for index, (name, cpus, threads) in enumerate(points):
+        row = {"cpuset": name, "cpus": cpus, "threads": threads}
+        try:
+            with pinned(cpus):
+                row.update(measure(backend, model_path, threads, prompt_tokens, decode_tokens, warmup, repeats, n_ctx))
+            row["error"] = None
+        except Exception as e:
+            row.update({"prefill_tok_s": None, "decode_tok_s": None, "ttft_ms": None, "error": str(e)})
+        rows.append(row)
+        if progress:
+            progress(index + 1, len(points), row)
+
+    return {
+        "model": model_path,
+        "backend": backend,
+        "topology": topology,
+        "affinity": hasattr(os, "sched_setaffinity"),
+        "tolerance": tolerance,
+        "rows": rows,
+        "recommended": {
+            "prefill": recommend(rows, "prefill_tok_s", tolerance),
+            "decode": recommend(rows, "decode_tok_s", tolerance),
+        },
+    }
+
+
+def preset_entry(sweep: dict) -> dict:
+    """The manifest value stored under recommended_presets.<preset>.threads.<topology>"""
+    prefill, decode = sweep["recommended"]["prefill"], sweep["recommended"]["decode"]
+    return {
+        "prefill_threads": prefill["threads"] if prefill else None,
+        "decode_threads": decode["threads"] if decode else None,
+        "prefill_cpus": prefill["cpus"] if prefill else None,
+        "decode_cpus": decode["cpus"] if decode else None,
+        "measured_prefill_tok_s": prefill["tok_s"] if prefill else None,
+        "measured_decode_tok_s": decode["tok_s"] if decode else None,
+    }
+
+
+def update_manifest(manifest_path: str, presets: list, sweep: dict) -> list:
+    """Write the recommendation into each preset's `threads` table; returns presets written"""
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    written = []
+    for preset in presets:
+        entry = manifest.get("recommended_presets", {}).get(preset)
+        if entry is None:
+            continue
+        entry.setdefault("threads", {})[sweep["topology"]["key"]] = preset_entry(sweep)
+        written.append(preset)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    return written
+
+
+def print_sweep(sweep: dict, indent: str = "    "):
+    topology = sweep["topology"]
+    print(f"{indent}Topology: {topology['key']} (cpus {format_cpu_list(topology['cpus'])}, "
+          f"{len(topology['physical_cores'])} physical cores)")
+    print(f"{indent}{'cpuset':<10} {'cpus':<12} {'threads':>7} {'prefill tok/s':>14} {'decode tok/s':>13} "
+          f"{'ttft_ms':>9}")
+    for row in sweep["rows"]:
+        if row["error"]:
+            print(f"{indent}{row['cpuset']:<10} {format_cpu_list(row['cpus']):<12} {row['threads']:>7}  "
+                  f"ERROR: {row['error']}")
+            continue
+        print(f"{indent}{row['cpuset']:<10} {format_cpu_list(row['cpus']):<12} {row['threads']:>7} "
+              f"{row['prefill_tok_s'] or 0:>14.1f} {row['decode_tok_s'] or 0:>13.1f} {row['ttft_ms']:>9.2f}")
+    for phase, pick in sweep["recommended"].items():
+        if pick:
+            print(f"{indent}Recommended {phase}: {pick['threads']} threads on {pick['cpuset']} ({pick['cpus']}) "
+                  f"-> {pick['tok_s']:.1f} tok/s (best {pick['best_tok_s']:.1f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep thread counts and CPU affinity for prefill and decode")
+    parser.add_argument("model", help="Path to .gguf, .onnx/.ort or .pte")
+    parser.add_argument("--threads", help="Comma-separated thread counts (default: 1,2,3,4,6,... up to each CPU set)")
+    parser.add_argument("--prompt-tokens", type=int, default=64, help="Prompt length for .pte/.onnx (default: 64)")
+    parser.add_argument("--decode-tokens", type=int, default=32, help="Tokens generated per run (default: 32)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed warmup runs (default: 1)")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per point (default: 3)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Prefer fewer threads within this fraction of the best rate (default: 0.03)")
+    parser.add_argument("--manifest", help="Manifest with recommended_presets (default: manifest.json next to model)")
+    parser.add_argument("--preset", action="append",
+                        help="Preset(s) whose ctx is used and which receive the table (default: safe)")
+    parser.add_argument("--update-manifest", action="store_true", help="Write the table into the manifest")
+    parser.add_argument("--json-output", help="Path to save JSON results (optional)")
+    args = parser.parse_args()
+
+    backend = backend_for(args.model)
+    package = {"llama.cpp": "llama_cpp", "onnxruntime": "onnxruntime", "executorch": "executorch"}[backend]
+    if not is_available(package):
+        print(f"{backend} runtime not installed - thread sweep needs it")
+        sys.exit(2)
+
+    manifest_path = args.manifest or os.path.join(os.path.dirname(os.path.abspath(args.model)), "manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    presets = args.preset or ["safe"]
+    n_ctx = manifest.get("recommended_presets", {}).get(presets[0], {}).get("ctx") \
+        or manifest.get("context_length", 512)
+
+    print("=" * 70)
+    print(f"THREAD / AFFINITY SWEEP: {args.model} ({backend}, n_ctx={n_ctx})")
+    print("=" * 70)
+
+    def progress(done, total, row):
+        rate = "ERROR" if row["error"] else f"prefill {row['prefill_tok_s'] or 0:.1f} / decode {row['decode_tok_s'] or 0:.1f} tok/s"
+        print(f"  [{done:>2}/{total}] {row['cpuset']:<10} threads={row['threads']:<3} {rate}")
+
+    sweep = run_sweep(
+        args.model,
+        [int(n) for n in args.threads.split(",")] if args.threads else None,
+        prompt_tokens=args.prompt_tokens,
+        decode_tokens=args.decode_tokens,
+        warmup=args.warmup,
+        repeats=args.repeats,
+        n_ctx=n_ctx,
+        tolerance=args.tolerance,
+        progress=progress,
+    )
+    print()
+    print_sweep(sweep, indent="  ")
+
+    if args.update_manifest:
+        if not manifest:
+            print(f"\nERROR: no manifest at {manifest_path}")
+            sys.exit(2)
+        written = update_manifest(manifest_path, presets, sweep)
+        print(f"\nThread table for {sweep['topology']['key']} written to {manifest_path} "
+              f"(presets: {', '.join(written) or 'none'})")
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(sweep, f, indent=2)
+        print(f"\nResults saved to: {args.json_output}")
+
+    sys.exit(0 if sweep["recommended"]["decode"] else 1)
+
+
+if __name__ == "__main__":
+    main()
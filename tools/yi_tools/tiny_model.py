@@ -0,0 +1,257 @@
+"""
+Tiny Causal LM for Offline Runtime Tests
+Generates a small random-weight decoder and exports it to .pte or .onnx
+
+No downloads or tokenizer: a few-hundred-KB program with the same calling
+convention as the real exports (`forward(tokens[1, 1..S]) -> logits[1, 1..S, V]`),
+so the KPI harness and benchmark engine can be exercised anywhere torch and
+executorch are installed. Lowered to XNNPACK when the backend is available,
+otherwise left on portable kernels. The .onnx variant takes `input_ids`
+with a dynamic sequence axis, like the optimum use_cache=False exports.
+With --kv-cache the .pte is a single-token decode program over static K/V
+buffers (`forward(tokens[1, 1], input_pos[1])`, the yi_tools.static_kv
+layout); --prefill-chunk N adds a `prefill` method taking 1..N tokens,
+sharing weights and cache with `decode`. --static-shapes pins the token axis
+to exactly S / N, as older exports did. --quantize 8da8w|8da4w runs the exporters'
+PT2E quantization stage (yi_tools.quantize) with random-token calibration.
+
+Usage:
+    python -m yi_tools.tiny_model out.pte [--seq-len 32] [--vocab 256] [--no-xnnpack]
+    python -m yi_tools.tiny_model out.pte --kv-cache 1024 [--prefill-chunk 32]
+    python -m yi_tools.tiny_model out.pte --quantize 8da4w [--group-size 32]
+    python -m yi_tools.tiny_model out.onnx
+"""
+
+import argparse
+import os
+
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+
+class TinyBlock(nn.Module):
+    def __init__(self, dim: int, heads: int, cache_len: int = None):
+        super().__init__()
+        self.heads = heads
+        if cache_len:
+            shape = (1, heads, cache_len, dim // heads)
+            self.register_buffer("k_cache", torch.zeros(shape), persistent=False)
+            self.register_buffer("v_cache", torch.zeros(shape), persistent=False)
+        self.norm1 = nn.LayerNorm(dim)
+        self.qkv = nn.Linear(dim, 3 * dim, bias=False)
+        self.proj = nn.Linear(dim, dim, bias=False)
+        self.norm2 = nn.LayerNorm(dim)
+        self.up = nn.Linear(dim, 4 * dim, bias=False)
+        self.down = nn.Linear(4 * dim, dim, bias=False)
+
+    def forward(self, x, positions=None):
+        batch, seq, dim = x.shape
+        q, k, v = self.qkv(self.norm1(x)).split(dim, dim=-1)
+        q, k, v = (t.view(batch, seq, self.heads, dim // self.heads).transpose(1, 2) for t in (q, k, v))
+        if positions is None:
+            attn = F.scaled_dot_product_attention(q, k, v, is_causal=True)
+        else:
+            self.k_cache.index_copy_(2, positions, k)
+            self.v_cache.index_copy_(2, positions, v)
+            slots = torch.arange(self.k_cache.shape[2], dtype=positions.dtype)
+            mask = slots.unsqueeze(0) <= positions.unsqueeze(1)
+            attn = F.scaled_dot_product_attention(q, self.k_cache, self.v_cache, attn_mask=mask)
+        x = x + self.proj(attn.transpose(1, 2).reshape(batch, seq, dim))
+        return x + self.down(F.silu(self.up(self.norm2(x))))
+
+
+class TinyCausalLM(nn.Module):
+    def __init__(self, vocab_size: int = 256, dim: int = 64, layers: int = 2, heads: int = 4, cache_len: int = None):
+        super().__init__()
+        self.embed = nn.Embedding(vocab_size, dim)
+        self.layers = nn.ModuleList(TinyBlock(dim, heads, cache_len) for _ in range(layers))
+        self.norm = nn.LayerNorm(dim)
+        self.lm_head = nn.Linear(dim, vocab_size, bias=False)
+
+    def forward(self, tokens, input_pos=None):
+        positions = None
+        if input_pos is not None:
+            positions = input_pos + torch.arange(tokens.shape[1], dtype=input_pos.dtype)
+        x = self.embed(tokens)
+        for layer in self.layers:
+            x = layer(x, positions)
+        return self.lm_head(self.norm(x))
+
+
+def export_tiny_pte(
+    output_path: str,
+    seq_len: int = 32,
+    vocab_size: int = 256,
+    dim: int = 64,
+    layers: int = 2,
+    seed: int = 0,
+    xnnpack: bool = True,
+    kv_cache_len: int = None,
+    prefill_chunk: int = None,
+    quantize: str = None,
+    group_size: int = 32,
+    dynamic: bool = True,
+) -> dict:
+    """
+    Export a random-weight TinyCausalLM to `output_path`
+
+    With kv_cache_len the program is a single-token decode step over static
+    K/V buffers of that length (seq_len is ignored); prefill_chunk adds a
+    `prefill` method of that width next to `decode`. quantize ("8da8w" or
+    "8da4w") quantizes the linears and the embedding table, calibrating on
+    random tokens. dynamic (default) exports the token axis as 1..seq_len
+    (1..prefill_chunk), so shorter inputs run unpadded.
+
+    Returns:
+        Dict with output_path, size_bytes, seq_len, vocab_size, backend,
+        kv_cache_len, prefill_chunk, quantization and dynamic
+    """
+    from torch.export import export
+
+    if quantize and not xnnpack:
+        raise ValueError("quantized programs need the XNNPACK delegate")
+    torch.manual_seed(seed)
+    model = TinyCausalLM(vocab_size, dim, layers, cache_len=kv_cache_len).eval()
+    if quantize:
+        from yi_tools import quantize as quant
+
+        model = quant.quantize_source(model, quantize, group_size)
+    config_overrides = {"do_quant_fusion_and_const_prop": True} if quantize else {}
+    config = None
+    from yi_tools import static_kv
+
+    if kv_cache_len:
+        seq_len = prefill_chunk or 1
+        exported = static_kv.export_methods(model, prefill_chunk, strict=False, dynamic=dynamic)
+        shapes = static_kv.dynamic_shapes(prefill_chunk) if dynamic else {}
+        config = static_kv.executorch_config(**config_overrides)
+    else:
+        example = (torch.randint(0, vocab_size, (1, seq_len), dtype=torch.long),)
+        shapes = {"forward": ({1: static_kv.sequence_dim(seq_len)},)} if dynamic and seq_len > 1 else {}
+        with torch.no_grad():
+            exported = {"forward": export(model, example, dynamic_shapes=shapes.get("forward"), strict=False)}
+        if config_overrides:
+            from executorch.exir import ExecutorchBackendConfig
+
+            config = ExecutorchBackendConfig(**config_overrides)
+    if quantize:
+        samples = torch.randint(1, vocab_size, (4, max(64, seq_len))).tolist()
+        exported = quant.quantize_methods(
+            exported, quant.pt2e_quantizer(quantize), quant.prompt_calibrator(samples), strict=False,
+            dynamic_shapes=shapes,
+        )
+
+    backend = "portable"
+    program = None
+    if xnnpack:
+        try:
+            from executorch.backends.xnnpack.partition.xnnpack_partitioner import XnnpackPartitioner
+            from executorch.exir import to_edge_transform_and_lower
+
+            partitioner = quant.partitioners() if quantize else [XnnpackPartitioner()]
+            program = to_edge_transform_and_lower(exported, partitioner=partitioner).to_executorch(config)
+            backend = "xnnpack"
+        except ImportError:
+            program = None
+    if program is None:
+        from executorch.exir import to_edge
+
+        program = to_edge(exported).to_executorch(config)
+
+    with open(output_path, "wb") as f:
+        program.write_to_file(f)
+    return {
+        "output_path": output_path,
+        "size_bytes": os.path.getsize(output_path),
+        "seq_len": seq_len,
+        "vocab_size": vocab_size,
+        "backend": backend,
+        "kv_cache_len": kv_cache_len,
+        "prefill_chunk": prefill_chunk,
+        "quantization": quant.label(quantize, group_size) if quantize else None,
+        "dynamic": bool(shapes),
+    }
+
+
+def export_tiny_onnx(
+    output_path: str,
+    seq_len: int = 32,
+    vocab_size: int = 256,
+    dim: int = 64,
+    layers: int = 2,
+    seed: int = 0,
+) -> dict:
+    """
+    Export a random-weight TinyCausalLM to ONNX (`input_ids` -> `logits`)
+
+    Returns:
+        Dict with output_path, size_bytes, seq_len, vocab_size and backend
+    """
+    torch.manual_seed(seed)
+    model = TinyCausalLM(vocab_size, dim, layers).eval()
+    example = torch.randint(0, vocab_size, (1, seq_len), dtype=torch.long)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (example,),
+            output_path,
+            input_names=["input_ids"],
+            output_names=["logits"],
+            dynamic_axes={"input_ids": {0: "batch_size", 1: "sequence_length"},
+                          "logits": {0: "batch_size", 1: "sequence_length"}},
+            opset_version=17,
+            dynamo=False,
+        )
+    return {
+        "output_path": output_path,
+        "size_bytes": os.path.getsize(output_path),
+        "seq_len": seq_len,
+        "vocab_size": vocab_size,
+        "backend": "onnx",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a tiny random-weight causal LM to .pte or .onnx")
+    parser.add_argument("output", help="Output .pte or .onnx path")
+    parser.add_argument("--seq-len", type=int, default=32, help="Exported sequence length (default: 32)")
+    parser.add_argument("--vocab", type=int, default=256, help="Vocabulary size (default: 256)")
+    parser.add_argument("--no-xnnpack", action="store_true", help="Keep portable kernels (no delegate)")
+    parser.add_argument("--kv-cache", type=int, metavar="CTX",
+                        help="Static KV-cache decode program with a CTX-token cache (.pte only)")
+    parser.add_argument("--prefill-chunk", type=int, metavar="N",
+                        help="With --kv-cache: add a prefill method taking N tokens")
+    parser.add_argument("--quantize", choices=("8da8w", "8da4w"),
+                        help="PT2E-quantize linears and the embedding table (.pte only)")
+    parser.add_argument("--group-size", type=int, default=32,
+                        help="With --quantize 8da4w: input channels per weight scale (default: 32)")
+    parser.add_argument("--static-shapes", action="store_true",
+                        help="Fixed token axis (exactly --seq-len / --prefill-chunk tokens per call)")
+    args = parser.parse_args()
+    if args.prefill_chunk and not args.kv_cache:
+        parser.error("--prefill-chunk requires --kv-cache")
+    if args.quantize and args.no_xnnpack:
+        parser.error("--quantize needs the XNNPACK delegate (no portable kernels for dynamic quantization)")
+
+    if args.output.endswith(".onnx"):
+        if args.kv_cache:
+            parser.error("--kv-cache applies to .pte output only")
+        if args.quantize:
+            parser.error("--quantize applies to .pte output only")
+        info = export_tiny_onnx(args.output, seq_len=args.seq_len, vocab_size=args.vocab)
+    else:
+        info = export_tiny_pte(args.output, seq_len=args.seq_len, vocab_size=args.vocab,
+                               xnnpack=not args.no_xnnpack, kv_cache_len=args.kv_cache,
+                               prefill_chunk=args.prefill_chunk, quantize=args.quantize,
+                               group_size=args.group_size, dynamic=not args.static_shapes)
+    kv = f", kv_cache={info['kv_cache_len']}" if info.get("kv_cache_len") else ""
+    kv += f", prefill_chunk={info['prefill_chunk']}" if info.get("prefill_chunk") else ""
+    kv += f", {info['quantization']}" if info.get("quantization") else ""
+    kv += ", dynamic tokens" if info.get("dynamic") else ""
+    print(f"Wrote {info['output_path']} ({info['size_bytes']:,} bytes, {info['backend']}, "
+          f"seq_len={info['seq_len']}, vocab={info['vocab_size']}{kv})")
+
+
+if __name__ == "__main__":
+    main()
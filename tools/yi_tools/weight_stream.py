@@ -0,0 +1,243 @@
+"""
+Streamed Weight Loading
+Quantized HuggingFace causal LMs without a full fp32 copy in memory
+
+from_pretrained(torch_dtype=float32) materializes every weight in fp32
+before the export starts, and the PT2E flow then traces, quantizes and
+lowers on top of that copy: a 1B model peaks at several times its fp32
+size, which is what runs stock CI runners out of memory. Here the module
+tree is built with its parameters on the meta device and filled one unit
+at a time from the memory-mapped safetensors checkpoint:
+
+    for each decoder layer (then each remaining module):
+        map file -> read tensors -> fp32 -> quantize_linears() -> unmap
+
+so at most one layer's fp32 weights exist next to the already quantized
+ones. The vocab-sized tensors - the largest single ones - are read in
+blocks of VOCAB_BLOCK_ROWS rows: the embedding table straight into an INT8
+QuantizedEmbedding, the lm_head through quantize_linear_blocks() (a tied
+lm_head from the same checkpoint tensor, as its own linear). Each unit maps and unmaps the checkpoint, so the file pages it
+read are not left in the process RSS, and ends with release_freed_memory():
+glibc otherwise keeps each layer's freed fp32 temporaries in its arenas and
+RSS climbs by about a layer per unit.
+
+Non-persistent buffers (rotary inv_freq, Gemma's embed_scale) are not in
+the checkpoint; they are built on the CPU by the model's own initializer
+while every parameter is still meta.
+
+This relies on transformers APIs from the 5.x line (from_config(dtype=),
+named_non_persistent_buffers(), initialize_weights()); available() reports
+whether the installed version has them, so callers can fall back to
+from_pretrained.
+
+transformers, safetensors and torchao are imported only when a model is loaded.
+"""
+
+import json
+import os
+import re
+
+import torch
+from torch import nn
+
+from yi_tools import quantize
+
+VOCAB_BLOCK_ROWS = 2048
+FLOW = "streamed torchao+xnnpack"  # manifest quantization_config.flow
+
+_LAYER = re.compile(r"^(.*\.layers\.\d+)\.")
+
+
+def available() -> bool:
+    """True when the installed transformers can build a model on the meta device and re-init its buffers"""
+    try:
+        from transformers import PreTrainedModel
+    except ImportError:
+        return False
+    return all(hasattr(PreTrainedModel, name) for name in ("named_non_persistent_buffers", "initialize_weights"))
+
+
+def checkpoint_dir(model_id: str, revision: str = None) -> str:
+    """Local directory holding the config and safetensors files (downloaded to the HF cache if needed)"""
+    if os.path.isdir(model_id):
+        return model_id
+    from huggingface_hub import snapshot_download
+
+    return snapshot_download(model_id, revision=revision, allow_patterns=["*.json", "*.safetensors"])
+
+
+def tensor_files(path: str) -> dict:
+    """{tensor name: safetensors file} from the shard index or the single checkpoint file"""
+    index = os.path.join(path, "model.safetensors.index.json")
+    if os.path.exists(index):
+        with open(index, "r") as f:
+            weight_map = json.load(f)["weight_map"]
+        return {name: os.path.join(path, file) for name, file in weight_map.items()}
+    single = os.path.join(path, "model.safetensors")
+    if not os.path.exists(single):
+        raise FileNotFoundError(f"no safetensors checkpoint in {path}")
+    from safetensors import safe_open
+
+    with safe_open(single, framework="pt") as f:
+        return {name: single for name in f.keys()}
+
+
+def release_freed_memory():
+    """Return freed heap pages to the OS (glibc malloc_trim; a no-op elsewhere)"""
+    import ctypes
+    import ctypes.util
+
+    try:
+        ctypes.CDLL(ctypes.util.find_library("c")).malloc_trim(0)
+    except (OSError, AttributeError, TypeError):
+        pass
+
+
+def empty_model(config, dtype: torch.dtype = torch.float32) -> nn.Module:
+    """
+    AutoModelForCausalLM with every parameter on the meta device
+
+    Non-persistent buffers are moved to the CPU and filled by the model's
+    initializer (the same step from_pretrained takes after loading).
+    """
+    from transformers import AutoModelForCausalLM
+
+    with torch.device("meta"):
+        model = AutoModelForCausalLM.from_config(config, dtype=dtype)
+    for name, buffer in list(model.named_non_persistent_buffers()):
+        owner, _, leaf = name.rpartition(".")
+        model.get_submodule(owner)._buffers[leaf] = torch.empty_like(buffer, device="cpu")
+    model.initialize_weights()
+    return model.eval()
+
+
+def _units(model: nn.Module) -> dict:
+    """
+    {unit: [tensor name, ...]} in module order, for every meta parameter or
+    persistent buffer: one unit per decoder layer, else the owning module.
+    Tied parameters are listed under every name they have.
+    """
+    names = [name for name, param in model.named_parameters(remove_duplicate=False) if param.is_meta]
+    names += [name for name, buffer in model.named_buffers() if buffer.is_meta]
+    units = {}
+    for name in names:
+        match = _LAYER.match(name)
+        units.setdefault(match.group(1) if match else name.rpartition(".")[0], []).append(name)
+    return units
+
+
+def _source(name: str, files: dict, tied: dict) -> str:
+    if name in files:
+        return name
+    if tied.get(name) in files:
+        return tied[name]
+    raise KeyError(f"{name} is not in the checkpoint")
+
+
+def _set_tensor(model: nn.Module, name: str, value: torch.Tensor):
+    owner, _, leaf = name.rpartition(".")
+    module = model.get_submodule(owner)
+    if leaf in module._parameters:
+        module._parameters[leaf] = nn.Parameter(value, requires_grad=False)
+    else:
+        module._buffers[leaf] = value
+
+
+def _read(names: list, files: dict, tied: dict, dtype: torch.dtype) -> dict:
+    """{name: tensor} for one unit, each checkpoint file mapped only while it is read"""
+    from safetensors import safe_open
+
+    sources = {name: _source(name, files, tied) for name in names}
+    tensors = {}
+    for path in dict.fromkeys(files[source] for source in sources.values()):
+        with safe_open(path, framework="pt") as f:
+            for name, source in sources.items():
+                if files[source] == path:
+                    tensors[name] = f.get_tensor(source).to(dtype)
+    return tensors
+
+
+def _row_blocks(path: str, source: str, block_rows: int, dtype: torch.dtype):
+    """Yield a 2-D checkpoint tensor `block_rows` rows at a time, mapped only while it is read"""
+    from safetensors import safe_open
+
+    with safe_open(path, framework="pt") as f:
+        rows = f.get_slice(source)
+        total = rows.get_shape()[0]
+        for start in range(0, total, block_rows):
+            yield rows[start:start + block_rows].to(dtype)
+
+
+def _stream_embedding(embedding: nn.Embedding, blocks) -> nn.Module:
+    """QuantizedEmbedding filled block by block"""
+    quantized = quantize.QuantizedEmbedding(
+        embedding.num_embeddings, embedding.embedding_dim, getattr(embedding, "embed_scale", None)
+    )
+    start = 0
+    for rows in blocks:
+        quantized.load_rows(start, rows)
+        start += len(rows)
+    return quantized
+
+
+def load_quantized(
+    model_id: str,
+    scheme: str = quantize.DEFAULT_SCHEME,
+    group_size: int = quantize.DEFAULT_GROUP_SIZE,
+    embeddings: bool = True,
+    dtype: torch.dtype = torch.float32,
+    block_rows: int = VOCAB_BLOCK_ROWS,
+    progress=None,
+) -> nn.Module:
+    """
+    Build a causal LM and stream its weights in, quantizing as they arrive
+
+    Args:
+        model_id: hub id or local directory with a safetensors checkpoint
+        scheme: quantize.SCHEMES entry, applied to every linear with quantize_linears()
+        embeddings: INT8 per-row input embedding table (fp32 when False)
+        dtype: compute dtype the checkpoint is upcast to before quantizing
+        block_rows: rows per read of the embedding table and lm_head
+        progress: optional callback `progress(unit, done, total)`
+
+    Returns:
+        eval-mode model ready for torch.export; unquantized tensors (norms,
+        biases) are `dtype`
+    """
+    from transformers import AutoConfig
+
+    path = checkpoint_dir(model_id)
+    files = tensor_files(path)
+    model = empty_model(AutoConfig.from_pretrained(path), dtype)
+
+    modules = {module: name for name, module in model.named_modules()}
+    input_embeddings = model.get_input_embeddings()
+    output_embeddings = model.get_output_embeddings()
+    embedding_name = modules[input_embeddings]
+    output_name = modules.get(output_embeddings)
+    # lm_head.weight of a tied checkpoint is stored once, as the embedding
+    tied = {f"{output_name}.weight": f"{embedding_name}.weight"} if output_name else {}
+
+    units = _units(model)
+    for done, (unit, names) in enumerate(units.items(), start=1):
+        if unit == embedding_name and embeddings:
+            source = _source(f"{embedding_name}.weight", files, tied)
+            blocks = _row_blocks(files[source], source, block_rows, dtype)
+            model.set_input_embeddings(_stream_embedding(input_embeddings, blocks))
+        elif unit == output_name and names == [f"{output_name}.weight"]:
+            source = _source(names[0], files, tied)
+            blocks = _row_blocks(files[source], source, block_rows, dtype)
+            weight = quantize.quantize_linear_blocks(blocks, scheme, group_size)
+            output_embeddings.weight = nn.Parameter(weight, requires_grad=False)
+        else:
+            for name, tensor in _read(names, files, tied, dtype).items():
+                _set_tensor(model, name, tensor)
+            quantize.quantize_linears(model.get_submodule(unit), scheme, group_size)
+        release_freed_memory()
+        if progress is not None:
+            progress(unit, done, len(units))
+
+    left = [name for name, tensor in (*model.named_parameters(), *model.named_buffers()) if tensor.is_meta]
+    if left:
+        raise RuntimeError(f"tensors not loaded from the checkpoint: {', '.join(left)}")
+    return model
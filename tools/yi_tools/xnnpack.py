@@ -0,0 +1,143 @@
+"""
+XNNPACK Delegate Payload Reader (zero-copy)
+Decodes the XNNGraph flatbuffer embedded in an ExecuTorch XnnpackBackend blob
+
+Blob layout (backends/xnnpack/serialization/xnnpack_graph_serialize.py):
+    [0:4]    reserved (zeros)
+    [4:8]    magic b"XH00"
+    [8:10]   header length u16
+    [10:14]  flatbuffer offset u32
+    [14:18]  flatbuffer size u32
+    [18:22]  constant data offset u32
+    [22:30]  constant data size u64
+
+Older blobs carry the bare flatbuffer (identifier b"XN0x" at [4:8]).
+Only tensor metadata is decoded; weight bytes are never read.
+"""
+
+import struct
+
+from yi_tools.flatbuf import FlatbufferError, root_table
+
+XNNPACK_DELEGATE_IDS = ("XnnpackBackend",)
+HEADER_MAGIC = b"XH00"
+FLATBUFFER_IDENTIFIER_PREFIX = b"XN"
+
+# XNNDatatype enum -> (name, bits per element)
+XNN_DATATYPES = {
+    0: ("invalid", 0),
+    1: ("fp32", 32),
+    2: ("fp16", 16),
+    3: ("qint8", 8),
+    4: ("quint8", 8),
+    5: ("qint32", 32),
+    6: ("qcint8", 8),
+    7: ("qcint32", 32),
+    8: ("qcint4", 4),
+    9: ("qdint8", 8),
+    10: ("qbint4", 4),
+    11: ("qpint8", 8),
+    12: ("int32", 32),
+    13: ("pfp32", 32),
+    14: ("bf16", 16),
+}
+
+# Field indices (schema.fbs)
+GRAPH_VERSION, GRAPH_XNODES, GRAPH_XVALUES, GRAPH_NUM_EXTERNS, GRAPH_INPUT_IDS, GRAPH_OUTPUT_IDS, \
+    GRAPH_CONSTANT_BUFFER, GRAPH_MEM_BUFFER_SIZES, GRAPH_CONSTANT_DATA = range(9)
+XVALUE_UNION_TYPE, XVALUE_UNION = range(2)
+XVALUE_TENSOR, XVALUE_QUANTIZED_TENSOR = 1, 2
+TENSOR_DATATYPE, TENSOR_NUM_DIMS, TENSOR_DIMS, TENSOR_CONSTANT_BUFFER_IDX = range(4)
+QTENSOR_TENSOR_VALUE = 0
+CONSTANT_DATA_OFFSET, CONSTANT_DATA_SIZE, CONSTANT_DATA_NAMED_KEY = range(3)
+BUFFER_STORAGE = 0
+
+
+def parse_header(buf, offset: int, size: int):
+    """XNNPACK header dict (absolute offsets), or None for headerless blobs"""
+    if size < 30 or buf[offset + 4:offset + 8] != HEADER_MAGIC:
+        return None
+    header_len, fb_offset, fb_size, const_offset = struct.unpack_from("<HIII", buf, offset + 8)
+    const_size = struct.unpack_from("<Q", buf, offset + 22)[0]
+    if fb_offset + fb_size > size or const_offset + const_size > size:
+        raise FlatbufferError(f"XNNPACK header spans exceed blob of {size} bytes")
+    return {
+        "header_length": header_len,
+        "flatbuffer_offset": offset + fb_offset,
+        "flatbuffer_size": fb_size,
+        "constant_data_offset": offset + const_offset,
+        "constant_data_size": const_size,
+    }
+
+
+def constant_tensors(buf, offset: int, size: int, named_sizes: dict = None) -> list:
+    """
+    Constant (weight) tensors of one XNNPACK blob
+
+    Args:
+        buf: Buffer holding the blob (e.g. the .pte mmap)
+        offset: Absolute blob offset inside buf
+        size: Blob size in bytes
+        named_sizes: {named_key: bytes} for weights stored in the program's
+            named data map instead of the blob
+
+    Returns:
+        List of dicts: value_id, dtype, bits, shape, numel, nbytes, named_key
+    """
+    header = parse_header(buf, offset, size)
+    fb_offset = header["flatbuffer_offset"] if header else offset
+    if bytes(buf[fb_offset + 4:fb_offset + 6]) != FLATBUFFER_IDENTIFIER_PREFIX:
+        raise FlatbufferError("XNNPACK blob has no XNNGraph flatbuffer")
+
+    graph = root_table(buf, fb_offset)
+    constant_data = graph.table_vector(GRAPH_CONSTANT_DATA)
+    constant_buffer = graph.table_vector(GRAPH_CONSTANT_BUFFER)
+    named_sizes = named_sizes or {}
+
+    tensors = []
+    for value_id, xvalue in enumerate(graph.table_vector(GRAPH_XVALUES)):
+        kind = xvalue.scalar(XVALUE_UNION_TYPE, "B")
+        tensor = xvalue.table(XVALUE_UNION)
+        if tensor is None:
+            continue
+        if kind == XVALUE_QUANTIZED_TENSOR:
+            tensor = tensor.table(QTENSOR_TENSOR_VALUE)
+        elif kind != XVALUE_TENSOR:
+            continue
+        if tensor is None:
+            continue
+
+        buffer_idx = tensor.scalar(TENSOR_CONSTANT_BUFFER_IDX, "I")
+        if buffer_idx == 0:
+            continue  # 0 is reserved for non-constant values
+
+        dtype, bits = XNN_DATATYPES.get(tensor.scalar(TENSOR_DATATYPE, "h"), ("unknown", 0))
+        shape = tuple(tensor.scalar_vector(TENSOR_DIMS, "I"))
+        numel = 1
+        for dim in shape:
+            numel *= dim
+
+        nbytes = None
+        named_key = None
+        if buffer_idx < len(constant_data):
+            entry = constant_data[buffer_idx]
+            named_key = entry.string(CONSTANT_DATA_NAMED_KEY)
+            if named_key:
+                nbytes = named_sizes.get(named_key)
+            else:
+                nbytes = entry.scalar(CONSTANT_DATA_SIZE, "Q")
+        elif buffer_idx < len(constant_buffer):
+            nbytes = constant_buffer[buffer_idx].vector_len(BUFFER_STORAGE)
+        if not nbytes:
+            nbytes = (numel * bits + 7) // 8
+
+        tensors.append({
+            "value_id": value_id,
+            "dtype": dtype,
+            "bits": bits,
+            "shape": shape,
+            "numel": numel,
+            "nbytes": nbytes,
+            "named_key": named_key,
+        })
+    return tensors